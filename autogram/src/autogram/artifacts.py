@@ -0,0 +1,120 @@
+"""Content-addressed store for rendered videos.
+
+Renders are keyed by a hash of the normalized prompt, the model and the
+generation parameters, so re-running a crew or demo with an unchanged
+script reuses the existing MP4 instead of paying for another render.
+Metadata lives in SQLite next to the files, and the least recently used
+videos are evicted once the store exceeds its size budget.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from autogram.cache import cache_dir
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def artifact_key(prompt: str, model: str, params: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "model": model, "params": params or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def place_file(src: str, dest: str) -> None:
+    """Make `dest` a copy of `src`, hard-linking when both are on one filesystem."""
+    if os.path.abspath(src) == os.path.abspath(dest):
+        return
+    # Renaming over a hard link to the same file is a no-op that leaves tmp behind.
+    if os.path.exists(dest) and os.path.samefile(src, dest):
+        return
+    tmp = dest + ".part"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copyfile(src, tmp)
+    os.replace(tmp, dest)
+
+
+class VideoArtifactStore:
+    """Rendered MP4s indexed by `artifact_key`, capped at `max_bytes` total."""
+
+    def __init__(self, root: Optional[str | os.PathLike] = None, max_bytes: Optional[int] = None):
+        self.root = Path(root) if root else cache_dir() / 'videos'
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('VEO_CACHE_MAX_BYTES', 5 * 1024 ** 3)
+        )
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / 'index.sqlite3'), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                " key TEXT PRIMARY KEY,"
+                " path TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL,"
+                " prompt TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " params TEXT NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return metadata (including `path`) for a stored video, or None."""
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT path, size, created, prompt, model, params FROM artifacts WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            path, size, created, prompt, model, params = row
+            if not os.path.exists(path):
+                self._conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE artifacts SET accessed = ? WHERE key = ?", (time.time(), key))
+        return {
+            "key": key, "path": path, "size": size, "created": created,
+            "prompt": prompt, "model": model, "params": json.loads(params),
+        }
+
+    def put(self, key: str, src: str, prompt: str, model: str, params: Optional[dict] = None) -> str:
+        """Copy `src` into the store under `key` and return the stored path."""
+        dest = str(self.root / f"{key}.mp4")
+        place_file(src, dest)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO artifacts (key, path, size, created, accessed, prompt, model, params)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, dest, os.path.getsize(dest), now, now, prompt, model, json.dumps(params or {}, sort_keys=True)),
+            )
+        self.evict()
+        return dest
+
+    def evict(self) -> None:
+        """Delete least recently used videos until the store fits in `max_bytes`."""
+        with self._lock, self._conn:
+            rows = self._conn.execute("SELECT key, path, size FROM artifacts ORDER BY accessed DESC").fetchall()
+            # The most recent video is always kept, even if it alone exceeds the budget.
+            total = rows[0][2] if rows else 0
+            for key, path, size in rows[1:]:
+                total += size
+                if total > self.max_bytes:
+                    self._conn.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                    if os.path.exists(path):
+                        os.remove(path)
@@ -0,0 +1 @@
+"""Benchmarks for autogram. Run modules with `python -m autogram.bench.<name>`."""
@@ -0,0 +1,488 @@
+"""Local stand-ins for every external service the pipeline talks to.
+
+One threaded HTTP server answers with the request and response shapes the
+real clients use:
+
+- Serper:     POST /search
+- OpenAI:     POST /v1/chat/completions
+- Google Veo: POST /v1beta/models/{model}:predictLongRunning,
+              GET  /v1beta/operations/{id}, GET /files/{id}
+- Cloudinary: POST /v1_1/{cloud}/video/upload (chunked or not),
+              GET/HEAD /res/{cloud}/video/upload/{public_id}.mp4
+- Graph API:  POST /graph/{ig_user}/media, GET /graph/{creation_id},
+              POST /graph/{ig_user}/media_publish
+- Web pages:  GET /pages/{query}/{n}, the article each search result links to
+
+Each service has a `ServiceProfile` with latency, jitter and an error rate;
+a failing request gets the profile's status code (429 responses include
+Retry-After). Veo operations finish `render_seconds` after submission and
+Instagram containers report Finished `processing_seconds` after creation,
+so polling loops behave as they do against the real APIs. Streamed chat
+completions send one word per event, `token_seconds` apart.
+
+`FakeServices.env()` returns the environment variables that point the
+tools at the server.
+"""
+from __future__ import annotations
+
+import ast
+import json
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+@dataclass
+class ServiceProfile:
+    latency: float = 0.05
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+
+
+def default_profiles() -> dict[str, ServiceProfile]:
+    """Latencies roughly matching what the real services answer with."""
+    return {
+        "serper": ServiceProfile(latency=0.4, jitter=0.15),
+        "openai": ServiceProfile(latency=1.2, jitter=0.5),
+        "veo": ServiceProfile(latency=0.15, jitter=0.05),
+        "cloudinary": ServiceProfile(latency=0.3, jitter=0.1),
+        "graph": ServiceProfile(latency=0.2, jitter=0.08),
+        "pages": ServiceProfile(latency=0.5, jitter=0.3),
+    }
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _full_box(kind: bytes, payload: bytes, version: int = 0) -> bytes:
+    return _box(kind, struct.pack(">I", version << 24) + payload)
+
+
+def fake_mp4(size: int = 256 * 1024, chunks: int = 8, samples_per_chunk: int = 3) -> bytes:
+    """An MP4-shaped file of about `size` bytes with `moov` after `mdat`, as Veo returns it.
+
+    Not playable, but the box layout and a complete sample table (one video
+    track with real `stco` chunk offsets) are, so post-processing such as
+    faststart and concatenation has something to do.
+    """
+    ftyp = _box(b"ftyp", b"isom" + struct.pack(">I", 0x200) + b"isomiso2mp41")
+    samples = chunks * samples_per_chunk
+    sample_size = max(1, (size - len(ftyp) - 8) // samples)
+    payload = (bytes(range(256)) * (sample_size * samples // 256 + 1))[:sample_size * samples]
+    chunk_size = sample_size * samples_per_chunk
+    offsets = [len(ftyp) + 8 + i * chunk_size for i in range(chunks)]
+
+    timescale, delta = 12800, 512  # 25 fps
+    duration = samples * delta
+    stbl = _box(b"stbl", b"".join([
+        _full_box(b"stsd", struct.pack(">I", 1) + _box(b"avc1", bytes(78))),
+        _full_box(b"stts", struct.pack(">III", 1, samples, delta)),
+        _full_box(b"stss", struct.pack(">II", 1, 1)),
+        _full_box(b"stsc", struct.pack(">IIII", 1, 1, samples_per_chunk, 1)),
+        _full_box(b"stsz", struct.pack(">II", sample_size, samples)),
+        _full_box(b"stco", struct.pack(f">I{chunks}I", chunks, *offsets)),
+    ]))
+    mdia = _box(b"mdia", b"".join([
+        _full_box(b"mdhd", struct.pack(">IIIIHH", 0, 0, timescale, duration, 0x55C4, 0)),
+        _full_box(b"hdlr", struct.pack(">I4s12x", 0, b"vide") + b"VideoHandler\0"),
+        _box(b"minf", stbl),
+    ]))
+    movie_duration = duration * 1000 // timescale
+    trak = _box(b"trak", _full_box(b"tkhd", struct.pack(">IIII", 0, 0, 1, 0) + struct.pack(">I", movie_duration)
+                                   + bytes(60), version=0) + mdia)
+    mvhd = _full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, movie_duration) + bytes(80))
+    return ftyp + _box(b"mdat", payload) + _box(b"moov", mvhd + trak)
+
+
+@dataclass
+class FakeServices:
+    """Fake Serper/OpenAI/Veo/Cloudinary/Graph server on 127.0.0.1.
+
+    Use as a context manager, or call `start()` and `stop()`.
+    """
+
+    profiles: dict[str, ServiceProfile] = field(default_factory=default_profiles)
+    render_seconds: float = 5.0
+    render_jitter: float = 1.0
+    token_seconds: float = 0.0
+    processing_seconds: float = 2.0
+    video_size: int = 256 * 1024
+    seed: Optional[int] = None
+    port: int = 0
+
+    def __post_init__(self):
+        self.requests: dict[str, int] = defaultdict(int)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._operations: dict[str, float] = {}
+        self._containers: dict[str, float] = {}
+        self._video = fake_mp4(self.video_size)
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServices":
+        services = self
+
+        class Handler(_Handler):
+            fake = services
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def env(self) -> dict[str, str]:
+        """Environment variables that route every tool to this server, with dummy credentials."""
+        return {
+            "SERPER_URL": f"{self.url}/search",
+            "SERPER_API_KEY": "fake-serper-key",
+            "OPENAI_API_KEY": "fake-openai-key",
+            "OPENAI_BASE_URL": f"{self.url}/v1",
+            "OPENAI_API_BASE": f"{self.url}/v1",
+            "VEO_KEY": "fake-veo-key",
+            "GOOGLE_VEO_API_KEY": "fake-veo-key",
+            "VEO_BASE_URL": self.url,
+            "CLOUDINARY_CLOUD_NAME": "fake-cloud",
+            "CLOUDINARY_API_KEY": "fake-cloudinary-key",
+            "CLOUDINARY_API_SECRET": "fake-cloudinary-secret",
+            "CLOUDINARY_UPLOAD_PREFIX": self.url,
+            "GRAPH_API_BASE": f"{self.url}/graph",
+            "IG_USER_ID": "1784000000000000",
+            "IG_PAGE_ACCESS_TOKEN": "fake-graph-token",
+        }
+
+    # -- behaviour shared by the handlers --
+
+    def delay(self, service: str) -> Optional[int]:
+        """Sleep for the service's latency; return an error status to inject, if any."""
+        profile = self.profiles.get(service) or ServiceProfile()
+        with self._lock:
+            self.requests[service] += 1
+            wait = max(0.0, profile.latency + self._rng.uniform(-profile.jitter, profile.jitter))
+            failed = self._rng.random() < profile.error_rate
+            if failed:
+                self.errors[service] += 1
+        time.sleep(wait)
+        return profile.error_status if failed else None
+
+    def new_operation(self) -> str:
+        name = f"models/fake-veo/operations/{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            jitter = self._rng.uniform(-self.render_jitter, self.render_jitter)
+            self._operations[name] = time.monotonic() + max(0.0, self.render_seconds + jitter)
+        return name
+
+    def operation_done(self, name: str) -> Optional[bool]:
+        ready_at = self._operations.get(name)
+        return None if ready_at is None else time.monotonic() >= ready_at
+
+    def new_container(self) -> str:
+        container = str(uuid.uuid4().int)[:17]
+        with self._lock:
+            self._containers[container] = time.monotonic() + self.processing_seconds
+        return container
+
+    def container_status(self, container: str) -> Optional[str]:
+        ready_at = self._containers.get(container)
+        if ready_at is None:
+            return None
+        if time.monotonic() >= ready_at:
+            return "Finished: Media has been uploaded and it is complete."
+        return "In Progress: Media is still being processed."
+
+
+_WORDS = re.compile(r"[A-Za-z]{4,}")
+_TOOL = re.compile(r"Tool Name: (\S+)\nTool Arguments: (\{.*?\})\nTool Description", re.S)
+
+# Tools the fake model calls (first match wins) before answering, so crew
+# runs exercise the same services as the demo flow. SerperDevTool is left
+# out because its endpoint is not configurable.
+TOOL_PREFERENCE = ("web_collector", "web_multi_collector", "summarizer", "veo_tool", "formatter")
+
+
+def _tool_call(prompt: str, fact: str) -> Optional[str]:
+    """A ReAct-style Action for the first preferred tool offered in `prompt`, if any."""
+    offered = {}
+    for name, args in _TOOL.findall(prompt):
+        try:
+            offered[name] = ast.literal_eval(args)
+        except (ValueError, SyntaxError):
+            continue
+    for name in TOOL_PREFERENCE:
+        if name not in offered:
+            continue
+        arguments = {}
+        for arg, spec in offered[name].items():
+            kind = str(spec.get("type", "")) if isinstance(spec, dict) else ""
+            if arg == "queries":
+                arguments[arg] = [fact[:60]]
+            elif arg in ("query", "text", "prompt"):
+                arguments[arg] = fact
+            elif arg == "num_results" or kind == "int":
+                arguments[arg] = 3
+        return f"Thought: I should use the {name} tool\nAction: {name}\nAction Input: {json.dumps(arguments)}"
+    return None
+
+
+def _completion_text(messages: list[dict]) -> str:
+    """A deterministic answer built from the prompt, in the shape the agents expect."""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+    words = _WORDS.findall(prompt[-400:])[:12]
+    fact = (
+        "Sleep spindles during non-REM sleep help consolidate newly learned motor skills "
+        f"({' '.join(words) or 'neuroscience'})."
+    )
+    if "Final Answer" in prompt:
+        # Call one tool on the first turn (system + task message), then answer.
+        if len(messages) <= 2:
+            action = _tool_call(prompt, fact)
+            if action:
+                return action
+        return f"Thought: I now can give a great answer\nFinal Answer: {fact}"
+    return fact
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake: FakeServices
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload=None, body: bytes = b"", content_type: str = "application/json",
+              headers: Optional[dict] = None) -> None:
+        if payload is not None:
+            body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _fail(self, status: int) -> None:
+        headers = {"Retry-After": "1"} if status == 429 else None
+        self._send(status, {"error": {"code": status, "message": "injected failure"}}, headers=headers)
+
+    def _route(self):
+        path = urlsplit(self.path).path
+        if path == "/search":
+            return "serper", self._serper
+        if path.endswith("/chat/completions"):
+            return "openai", self._openai
+        if ":predictLongRunning" in path:
+            return "veo", self._veo_submit
+        if "/operations/" in path:
+            return "veo", self._veo_poll
+        if path.startswith("/files/"):
+            return "veo", self._veo_file
+        if path.startswith("/v1_1/"):
+            return "cloudinary", self._cloudinary
+        if path.startswith("/res/"):
+            return "cloudinary", self._cloudinary_asset
+        if path.startswith("/graph/"):
+            return "graph", self._graph
+        if path.startswith("/pages/"):
+            return "pages", self._page
+        return None, None
+
+    def _dispatch(self):
+        body = self._body()
+        service, handler = self._route()
+        if handler is None:
+            self._send(404, {"error": {"message": f"no fake for {self.command} {self.path}"}})
+            return
+        status = self.fake.delay(service)
+        if status is not None:
+            self._fail(status)
+            return
+        handler(body)
+
+    do_GET = do_HEAD = do_POST = _dispatch
+
+    # -- services --
+
+    def _serper(self, body: bytes) -> None:
+        request = json.loads(body or b"{}")
+        query = request.get("q", "")
+        organic = [
+            {
+                "title": f"{query} — result {i}",
+                "link": f"{self.fake.url}/pages/{re.sub(r'[^a-z0-9]+', '-', query.lower())}/{i}",
+                "snippet": f"Study {i} on {query}: researchers report measurable effects on memory and attention.",
+                "position": i,
+            }
+            for i in range(1, int(request.get("num", 3)) + 1)
+        ]
+        self._send(200, {"searchParameters": {"q": query}, "organic": organic})
+
+    def _page(self, body: bytes) -> None:
+        """A news-style article page wrapped in the usual navigation, scripts and footer."""
+        _, _, slug, n = urlsplit(self.path).path.split("/", 3)
+        topic = slug.replace("-", " ")
+        paragraphs = "".join(
+            f"<p>Paragraph {j} of study {n} on {topic}: participants were tested before and after the "
+            f"intervention, and the <a href='/ref/{j}'>measured effect</a> on memory held across sessions.</p>"
+            for j in range(1, 13)
+        )
+        html = (
+            f"<!doctype html><html><head><title>{topic.title()} | Study {n}</title>"
+            f"<script>{'var tracking = 1;' * 2000}</script><style>{'p { margin: 0 }' * 500}</style></head>"
+            "<body><header><nav>" + "".join(f"<a href='/s/{k}'>Section {k}</a>" for k in range(40)) + "</nav></header>"
+            "<div class='cookie-banner'>We use cookies to give you the best experience on this site.</div>"
+            f"<main><article><h1>Study {n}: {topic}</h1>{paragraphs}"
+            "<div class='share-bar'>Share this article on every social network you use today</div></article></main>"
+            "<aside>" + "".join(f"<p>Related story number {k} about something else entirely</p>" for k in range(20))
+            + "</aside><footer>Copyright 2026 Example Media. All rights reserved worldwide.</footer></body></html>"
+        )
+        self._send(200, body=html.encode(), content_type="text/html; charset=utf-8")
+
+    def _openai(self, body: bytes) -> None:
+        request = json.loads(body or b"{}")
+        text = _completion_text(request.get("messages", []))
+        if request.get("stream"):
+            return self._openai_stream(request, text)
+        prompt_tokens = len(body) // 4
+        completion_tokens = len(text) // 4
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    def _openai_stream(self, request: dict, text: str) -> None:
+        """Server-sent events, one word per chunk, `token_seconds` apart."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "gpt-4o-mini")}
+        pieces = [{"role": "assistant", "content": ""}] + [{"content": w} for w in re.findall(r"\S+\s*", text)]
+        for i, delta in enumerate(pieces):
+            if i > 1 and self.fake.token_seconds:
+                time.sleep(self.fake.token_seconds)
+            event = dict(base, choices=[{"index": 0, "delta": delta, "finish_reason": None}])
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+        done = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode())
+
+    def _veo_submit(self, body: bytes) -> None:
+        self._send(200, {"name": self.fake.new_operation()})
+
+    def _veo_poll(self, body: bytes) -> None:
+        name = urlsplit(self.path).path.split("/v1beta/", 1)[-1]
+        done = self.fake.operation_done(name)
+        if done is None:
+            self._send(404, {"error": {"code": 404, "message": f"operation {name} not found"}})
+        elif not done:
+            self._send(200, {"name": name})
+        else:
+            video = {"uri": f"{self.fake.url}/files/{name.rsplit('/', 1)[-1]}:download?alt=media", "mimeType": "video/mp4"}
+            self._send(200, {
+                "name": name,
+                "done": True,
+                "response": {"generateVideoResponse": {"generatedSamples": [{"video": video}]}},
+            })
+
+    def _veo_file(self, body: bytes) -> None:
+        data = self.fake._video
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if not match:
+            self._send(200, body=data, content_type="video/mp4", headers={"Accept-Ranges": "bytes"})
+            return
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else len(data) - 1
+        if start >= len(data):
+            self._send(416, body=b"", headers={"Content-Range": f"bytes */{len(data)}"})
+            return
+        self._send(206, body=data[start:end + 1], content_type="video/mp4",
+                   headers={"Content-Range": f"bytes {start}-{end}/{len(data)}"})
+
+    def _cloudinary(self, body: bytes) -> None:
+        cloud = urlsplit(self.path).path.split("/")[2]
+        content_range = self.headers.get("Content-Range") or ""
+        match = re.match(r"bytes (\d+)-(\d+)/(\d+)", content_range)
+        if match and int(match.group(2)) + 1 < int(match.group(3)):
+            # Intermediate chunk of a chunked upload.
+            self._send(200, {"done": False, "bytes": len(body)})
+            return
+        fields = re.findall(rb'name="([^"]+)"\r\n\r\n([^\r]*)', body)
+        public_id = next((value.decode() for name, value in fields if name == b"public_id"), uuid.uuid4().hex[:20])
+        self._send(200, {
+            "public_id": public_id,
+            "resource_type": "video",
+            "bytes": int(match.group(3)) if match else len(body),
+            "secure_url": f"{self.fake.url}/res/{cloud}/video/upload/{public_id}.mp4",
+        })
+
+    def _cloudinary_asset(self, body: bytes) -> None:
+        self._send(200, body=self.fake._video, content_type="video/mp4")
+
+    def _graph(self, body: bytes) -> None:
+        parts = urlsplit(self.path)
+        segments = parts.path.strip("/").split("/")[1:]
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        if self.command == "POST" and segments[-1:] == ["media"]:
+            if not params.get("video_url"):
+                self._send(400, {"error": {"message": "video_url is required"}})
+                return
+            self._send(200, {"id": self.fake.new_container()})
+        elif self.command == "POST" and segments[-1:] == ["media_publish"]:
+            if not (self.fake.container_status(params.get("creation_id", "")) or "").startswith("Finished"):
+                self._send(400, {"error": {"message": "Media ID is not available", "code": 9007}})
+                return
+            self._send(200, {"id": str(uuid.uuid4().int)[:17]})
+        elif self.command == "GET" and len(segments) == 1:
+            status = self.fake.container_status(segments[0])
+            if status is None:
+                self._send(400, {"error": {"message": f"Unsupported get request: {segments[0]}"}})
+                return
+            self._send(200, {"status": status, "id": segments[0]})
+        else:
+            self._send(404, {"error": {"message": f"no fake for {self.command} {parts.path}"}})
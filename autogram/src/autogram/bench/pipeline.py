@@ -0,0 +1,210 @@
+"""End-to-end benchmark against local fake services (no network needed).
+
+Starts `autogram.bench.fakes.FakeServices`, points every tool at it and runs
+N topics through one or both flows with a fixed number in flight at once:
+
+- demo: the run_demo.py steps (collect -> summarize -> format -> render,
+  plus publish with --publish), one topic per worker thread
+- crew: `Autogram().crew().kickoff()` per topic
+
+Reports throughput, per-topic p50/p95/p99 latency and the per-stage
+breakdown from the trace. Caches live in a temporary directory so every
+run starts cold unless --warm is given.
+
+Usage: python -m autogram.bench.pipeline [--flow demo|crew|both] [--topics N] [--concurrency C]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Optional
+
+from autogram.bench.fakes import FakeServices, ServiceProfile, default_profiles
+
+
+TOPICS = [
+    "sleep and memory consolidation",
+    "dopamine and motivation",
+    "exercise and neurogenesis",
+    "cold exposure and norepinephrine",
+    "meditation and the default mode network",
+    "caffeine and adenosine",
+    "light exposure and circadian rhythm",
+    "fasting and ketones in the brain",
+]
+
+
+def topics(n: int) -> list[str]:
+    return [TOPICS[i % len(TOPICS)] + (f" #{i // len(TOPICS) + 1}" if i >= len(TOPICS) else "") for i in range(n)]
+
+
+def demo_runner(out_dir: Path, publish: bool) -> Callable[[dict], dict]:
+    """Run the campaign stages for one topic back to back, like run_demo.py does."""
+    from autogram.campaign import build_stages
+
+    stages = build_stages(out_dir, publish=publish)
+
+    def run(item: dict) -> dict:
+        for stage in stages:
+            item = stage.fn(item)
+        return item
+
+    return run
+
+
+def crew_runner(out_dir: Path, publish: bool) -> Callable[[dict], dict]:
+    from autogram.crew import Autogram
+
+    def run(item: dict) -> dict:
+        result = Autogram().crew().kickoff(inputs={"current_year": time.strftime("%Y"), "topic": item["topic"]})
+        item["output"] = str(result)
+        return item
+
+    return run
+
+
+def run_flow(name: str, runner: Callable[[dict], dict], topic_list: list[str], concurrency: int) -> dict:
+    from autogram import tracing
+    from autogram.campaign import slugify
+
+    def one(item: dict) -> dict:
+        tracing.set_topic(item["topic"])
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"bench.{name}"):
+                runner(item)
+        except Exception as e:
+            item["error"] = f"{type(e).__name__}: {e}"
+        item["latency"] = time.perf_counter() - start
+        return item
+
+    items = [{"index": i, "topic": t, "slug": f"{i:03d}-{slugify(t)}"} for i, t in enumerate(topic_list, 1)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix=name) as pool:
+        results = list(pool.map(one, items))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(item["latency"] for item in results if not item.get("error"))
+    return {
+        "flow": name,
+        "topics": len(results),
+        "failed": sum(1 for item in results if item.get("error")),
+        "errors": [item["error"] for item in results if item.get("error")],
+        "wall": wall,
+        "per_min": len(latencies) / wall * 60 if wall else 0.0,
+        "p50": tracing.percentile(latencies, 50),
+        "p95": tracing.percentile(latencies, 95),
+        "p99": tracing.percentile(latencies, 99),
+        "max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def print_summary(summary: dict, concurrency: int) -> None:
+    print(
+        f"[bench] {summary['flow']}: {summary['topics']} topics, concurrency {concurrency}, "
+        f"{summary['failed']} failed, wall {summary['wall']:.2f}s, {summary['per_min']:.1f} topics/min"
+    )
+    print(
+        f"[bench]   topic latency p50={summary['p50']:.2f}s p95={summary['p95']:.2f}s "
+        f"p99={summary['p99']:.2f}s max={summary['max']:.2f}s"
+    )
+    for error in summary["errors"][:5]:
+        print(f"[bench]   error: {error}")
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(prog="python -m autogram.bench.pipeline", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--flow", choices=("demo", "crew", "both"), default="demo")
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--publish", action="store_true", help="also upload to the fake Cloudinary and Graph API")
+    parser.add_argument("--render-seconds", type=float, default=3.0, help="how long a fake Veo render takes")
+    parser.add_argument("--processing-seconds", type=float, default=1.0, help="how long fake Instagram processing takes")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="multiply every service latency by this")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=500, help="status code for injected errors (e.g. 429)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--warm", action="store_true", help="keep the normal cache directory instead of a fresh one")
+    parser.add_argument("--stages", action="store_true", help="print the per-stage latency table")
+    args = parser.parse_args(argv)
+
+    profiles = default_profiles()
+    for name, profile in profiles.items():
+        profiles[name] = ServiceProfile(
+            latency=profile.latency * args.latency_scale,
+            jitter=profile.jitter * args.latency_scale,
+            error_rate=args.error_rate,
+            error_status=args.error_status,
+        )
+
+    work_dir = Path(tempfile.mkdtemp(prefix="autogram-bench-"))
+    fakes = FakeServices(
+        profiles=profiles,
+        render_seconds=args.render_seconds,
+        render_jitter=args.render_seconds / 4,
+        processing_seconds=args.processing_seconds,
+        seed=args.seed,
+    ).start()
+
+    # Module-level settings (endpoints, cache paths) are read at import time,
+    # so the environment must be in place before the tools are imported.
+    os.environ.update(fakes.env())
+    os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+    os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    # Skips crewAI's first-run trace upload and its interactive prompt.
+    os.environ.setdefault("CREWAI_TESTING", "true")
+    # The fake LLM answers every topic with much the same fact.
+    os.environ.setdefault("FACT_DEDUPE", "false")
+    if not args.warm:
+        os.environ["AUTOGRAM_CACHE_DIR"] = str(work_dir / "cache")
+        (work_dir / "cache").mkdir()
+    trace_file = work_dir / "trace.jsonl"
+
+    from autogram import tracing
+
+    tracing.configure(str(trace_file))
+    run_id = tracing.set_run()
+
+    flows = ["demo", "crew"] if args.flow == "both" else [args.flow]
+    runners = {"demo": demo_runner, "crew": crew_runner}
+    summaries = []
+    cwd = os.getcwd()
+    try:
+        for flow in flows:
+            out_dir = work_dir / flow
+            out_dir.mkdir()
+            # The crew writes report.md and the video relative to the working directory.
+            os.chdir(out_dir)
+            print(f"[bench] {flow}: {args.topics} topics against {fakes.url} (run {run_id})")
+            summary = run_flow(flow, runners[flow](out_dir, args.publish), topics(args.topics), args.concurrency)
+            summaries.append(summary)
+            print_summary(summary, args.concurrency)
+    finally:
+        os.chdir(cwd)
+        tracing.configure(None)
+        fakes.stop()
+
+    requests = ", ".join(f"{name}={count}" for name, count in sorted(fakes.requests.items()))
+    print(f"[bench] requests served: {requests}")
+    if fakes.errors:
+        print("[bench] errors injected: " + ", ".join(f"{n}={c}" for n, c in sorted(fakes.errors.items())))
+    from autogram import ratelimit
+
+    for provider, s in sorted(ratelimit.stats().items()):
+        print(f"[bench] {provider}: throttled {s['throttled']:.2f}s in {s['throttles']} waits, "
+              f"{s['retries']} retries ({s['retry_wait']:.2f}s backing off)")
+    if args.stages:
+        tracing.main([str(trace_file), "--run", run_id])
+    print(f"[bench] trace: {trace_file}")
+    return summaries
+
+
+if __name__ == "__main__":
+    summaries = main()
+    sys.exit(1 if any(s["failed"] for s in summaries) else 0)
@@ -0,0 +1,89 @@
+"""Startup benchmark: import time of every console entry point.
+
+Reads `[project.scripts]` from pyproject.toml and, for each `module:function`
+entry, measures in a fresh interpreter how long it takes to import the module
+and resolve the function. Each entry is run several times and the median is
+reported, so OS file caching does not skew the first measurement.
+
+Usage: python -m autogram.bench.startup [--repeat N] [--detail]
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    import tomli as tomllib
+
+from autogram import root
+
+
+_PROBE = (
+    "import time, importlib\n"
+    "t = time.perf_counter()\n"
+    "getattr(importlib.import_module({module!r}), {attr!r})\n"
+    "print(time.perf_counter() - t)\n"
+)
+
+
+# Not console scripts, but on the path of every crew command.
+EXTRA_TARGETS = {"(crew)": "autogram.crew:Autogram"}
+
+
+def entry_points() -> dict[str, str]:
+    with open(root / "pyproject.toml", "rb") as f:
+        return tomllib.load(f)["project"].get("scripts", {})
+
+
+def measure(target: str, repeat: int = 5) -> list[float]:
+    module, _, attr = target.partition(":")
+    code = _PROBE.format(module=module, attr=attr)
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(module: str, top: int = 10) -> list[tuple[float, str]]:
+    """Return the `top` modules with the largest cumulative import time (from -X importtime)."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        rows.append((int(fields[1]) / 1e6, fields[2].strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure import time of each console entry point.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--detail", action="store_true", help="also list the slowest imports per module")
+    args = parser.parse_args(argv)
+
+    print(f"{'entry point':<12} {'target':<28} {'median':>8} {'min':>8} {'max':>8}")
+    modules = []
+    for name, target in {**entry_points(), **EXTRA_TARGETS}.items():
+        samples = measure(target, args.repeat)
+        print(f"{name:<12} {target:<28} {statistics.median(samples):7.3f}s {min(samples):7.3f}s {max(samples):7.3f}s")
+        module = target.partition(":")[0]
+        if module not in modules:
+            modules.append(module)
+
+    if args.detail:
+        for module in modules:
+            print(f"\nslowest imports under {module}:")
+            for seconds, name in slowest_imports(module):
+                print(f"  {seconds:7.3f}s  {name}")
+
+
+if __name__ == "__main__":
+    main()
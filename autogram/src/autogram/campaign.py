@@ -0,0 +1,257 @@
+"""Pipelined multi-topic campaign runner.
+
+Runs collect -> summarize -> format -> render -> publish for many topics
+at once. Stages are joined by bounded queues and each stage has its own
+worker threads, so topic N+1 is researched and summarized while topic N
+is still rendering. Per-stage throughput and queue depths are printed
+while the campaign runs and summarized at the end.
+
+Usage: autogram campaign topics.txt [--out DIR] [--no-publish] [--render-workers N]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import queue
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from autogram import tracing
+from autogram.prompts import build_fact_prompt, build_video_prompt
+
+
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[dict], dict]
+    workers: int = 1
+    queue_size: int = 4
+    processed: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    max_depth: int = 0
+    inbox: Optional[queue.Queue] = None
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.busy += seconds
+            if ok:
+                self.processed += 1
+            else:
+                self.failed += 1
+
+
+class Pipeline:
+    """Runs items through `stages` in order using one bounded queue per stage.
+
+    A stage function takes the item dict and returns it (possibly updated).
+    If it raises, the item skips the remaining stages and is returned with
+    its `error` set.
+    """
+
+    def __init__(self, stages: list[Stage], report_every: float = 30.0):
+        self.stages = stages
+        self.report_every = report_every
+        self.results: list[dict] = []
+        self._results_lock = threading.Lock()
+        for stage in stages:
+            stage.inbox = queue.Queue(maxsize=stage.queue_size)
+
+    def run(self, items: list[dict]) -> list[dict]:
+        self.started = time.monotonic()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            downstream = self.stages[index + 1] if index + 1 < len(self.stages) else None
+            for n in range(stage.workers):
+                t = threading.Thread(target=self._work, args=(stage, downstream), name=f"{stage.name}-{n}", daemon=True)
+                t.start()
+                threads.append((stage, t))
+
+        stop_reporting = threading.Event()
+        reporter = threading.Thread(target=self._report_loop, args=(stop_reporting,), daemon=True)
+        reporter.start()
+
+        for item in items:
+            self._put(self.stages[0], item)
+
+        # Shut stages down in order: once every worker of a stage has exited,
+        # nothing more can reach the next stage.
+        for index, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                stage.inbox.put(_DONE)
+            for owner, t in threads:
+                if owner is stage:
+                    t.join()
+
+        stop_reporting.set()
+        reporter.join()
+        self.report(final=True)
+        return self.results
+
+    def _put(self, stage: Stage, item: Any) -> None:
+        stage.inbox.put(item)
+        depth = stage.inbox.qsize()
+        with stage.lock:
+            stage.max_depth = max(stage.max_depth, depth)
+
+    def _work(self, stage: Stage, downstream: Optional[Stage]) -> None:
+        while True:
+            item = stage.inbox.get()
+            if item is _DONE:
+                return
+            start = time.monotonic()
+            tracing.set_topic(item.get("topic"))
+            try:
+                with tracing.span(f"stage.{stage.name}"):
+                    item = stage.fn(item)
+                ok = True
+            except Exception as e:
+                item["error"] = f"{stage.name}: {e}"
+                print(f"[campaign] {item.get('topic')!r} failed in {stage.name}: {e}")
+                ok = False
+            stage.record(time.monotonic() - start, ok)
+
+            if ok and downstream is not None:
+                self._put(downstream, item)
+            else:
+                with self._results_lock:
+                    self.results.append(item)
+
+    def _report_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self.report_every):
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        print(f"[campaign] {'final' if final else 'progress'} after {elapsed:.0f}s")
+        for stage in self.stages:
+            per_min = stage.processed / elapsed * 60
+            avg = stage.busy / max(stage.processed + stage.failed, 1)
+            print(
+                f"[campaign]   {stage.name:<10} done={stage.processed:<4} failed={stage.failed:<3} "
+                f"rate={per_min:6.2f}/min avg={avg:6.1f}s queue={stage.inbox.qsize()} (max {stage.max_depth}) "
+                f"workers={stage.workers}"
+            )
+        if final:
+            from autogram import ratelimit
+
+            for provider, s in sorted(ratelimit.stats().items()):
+                print(
+                    f"[campaign]   {provider:<10} throttled {s['throttled']:.1f}s ({s['throttles']} waits), "
+                    f"{s['retries']} retries ({s['retry_wait']:.1f}s backing off)"
+                )
+
+
+def slugify(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:60] or "topic"
+
+
+def build_stages(out_dir: Path, publish: bool = True, collect_workers: int = 4, llm_workers: int = 4,
+                 render_workers: int = 2, publish_workers: int = 1) -> list[Stage]:
+    """The standard campaign stages, sharing one instance of each tool across workers."""
+    from autogram.fact_index import novel_fact, record_fact
+    from autogram.tools.collector_tool import CollectorTool
+    from autogram.tools.formatter_tool import FormatterTool
+    from autogram.tools.summarizer_tool import SummarizerTool, compact_text
+    from autogram.tools.veo_tool import VeoTool
+
+    collector = CollectorTool()
+    summarizer = SummarizerTool()
+    formatter = FormatterTool()
+    veo = VeoTool()
+
+    def checked(value: str) -> str:
+        if isinstance(value, str) and value.startswith("ERROR"):
+            raise RuntimeError(value)
+        return value
+
+    def collect(item):
+        item["collected"] = checked(collector._run(query=item["topic"], num_results=3))
+        return item
+
+    def summarize(item):
+        research = compact_text(item["collected"], item["topic"])
+        item["script"] = checked(novel_fact(
+            lambda avoid: summarizer._run(text=build_fact_prompt(research, avoid), max_tokens=50)
+        ))
+        return item
+
+    def format_(item):
+        item["formatted"] = formatter._run(text=item["script"], style="markdown")
+        report = out_dir / f"{item['slug']}.md"
+        report.write_text(f"# Neuroscience Fact\n\n{item['formatted']}\n", encoding="utf-8")
+        item["report"] = str(report)
+        return item
+
+    def render(item):
+        item["video"] = checked(veo._run(prompt=build_video_prompt(item["script"]), output_file=str(out_dir / f"{item['slug']}.mp4")))
+        record_fact(item["script"], topic=item["topic"], video=item["video"])
+        return item
+
+    def publish_(item):
+        from autogram.instagram_utils import post_to_instagram
+        item["post_id"] = post_to_instagram(item["video"], item.get("caption") or "Neuroscience Facts")
+        return item
+
+    stages = [
+        Stage("collect", collect, workers=collect_workers),
+        Stage("summarize", summarize, workers=llm_workers),
+        Stage("format", format_, workers=1),
+        Stage("render", render, workers=render_workers),
+    ]
+    if publish:
+        stages.append(Stage("publish", publish_, workers=publish_workers))
+    return stages
+
+
+def read_topics(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(prog="autogram campaign", description="Run many topics through the pipeline.")
+    parser.add_argument("topics", help="text file with one topic per line")
+    parser.add_argument("--out", default="campaign_output", help="directory for reports and videos")
+    parser.add_argument("--no-publish", action="store_true", help="stop after rendering")
+    parser.add_argument("--collect-workers", type=int, default=4)
+    parser.add_argument("--llm-workers", type=int, default=4)
+    parser.add_argument("--render-workers", type=int, default=int(os.environ.get("VEO_MAX_CONCURRENT", 2)))
+    parser.add_argument("--publish-workers", type=int, default=1)
+    parser.add_argument("--report-every", type=float, default=30.0, help="seconds between progress reports")
+    args = parser.parse_args(argv)
+
+    topics = read_topics(args.topics)
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    items = []
+    for i, topic in enumerate(topics, 1):
+        items.append({"index": i, "topic": topic, "slug": f"{i:03d}-{slugify(topic)}"})
+
+    stages = build_stages(
+        out_dir,
+        publish=not args.no_publish,
+        collect_workers=args.collect_workers,
+        llm_workers=args.llm_workers,
+        render_workers=args.render_workers,
+        publish_workers=args.publish_workers,
+    )
+    run_id = tracing.set_run()
+    print(f"[campaign] run {run_id}: {len(items)} topics -> {out_dir}")
+    results = Pipeline(stages, report_every=args.report_every).run(items)
+    results.sort(key=lambda item: item["index"])
+
+    failed = [item for item in results if item.get("error")]
+    print(f"[campaign] finished: {len(results) - len(failed)} ok, {len(failed)} failed")
+    for item in failed:
+        print(f"[campaign]   {item['topic']}: {item['error']}")
+    return results
@@ -0,0 +1,449 @@
+"""Record and replay outbound HTTP calls.
+
+While a cassette is in use, every request made through `requests` (Serper,
+downloads, Graph) or `httpx` (OpenAI, litellm, google-genai) is looked up
+in one SQLite file by a hash of its method, URL, Range header and body.
+JSON bodies are compared with sorted keys, multipart boundaries are
+masked, and credentials (headers and `key`/`access_token` style query
+parameters) are neither hashed nor stored. Identical requests are numbered
+in the order each thread makes them, so a repeated prompt or a Veo status
+poll replays the same sequence of responses it got when it was recorded,
+however the run's threads happen to interleave. Response bodies are
+recorded as the caller reads them, so streamed downloads are not buffered
+in memory; they are zlib-compressed on the way through and stored once
+complete. A body the caller never finishes reading is not recorded.
+
+Modes:
+  auto    replay recorded calls, make and record the rest (default)
+  replay  never touch the network; an unrecorded call raises CassetteMiss
+  record  make every call live and overwrite what was recorded
+
+AUTOGRAM_CASSETTE is the cassette file ("true" picks
+.cache/cassettes/<command>.sqlite3) and AUTOGRAM_CASSETTE_MODE the mode.
+Transient failures (429s and 5xx) are not recorded. Requests to crewAI's
+telemetry hosts and AUTOGRAM_CASSETTE_IGNORE (comma-separated hosts) always
+go to the network.
+"""
+from __future__ import annotations
+
+import contextlib
+import hashlib
+import importlib
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from autogram.cache import cache_dir
+
+
+MODES = ("auto", "replay", "record")
+SECRET_PARAMS = frozenset({"key", "api_key", "apikey", "access_token", "client_secret", "appsecret_proof"})
+# Newer openai releases ship their own fork of httpx; litellm and google-genai use httpx itself.
+HTTPX_MODULES = ("httpx", "httpx2")
+IGNORED_HOSTS = frozenset({"telemetry.crewai.com", "app.crewai.com"})
+# Retrying these is ratelimit's job; a replay should see the response that finally succeeded.
+TRANSIENT_STATUSES = frozenset({408, 420, 429, 500, 502, 503, 504})
+# Hop-by-hop and per-client headers that must not be replayed as recorded.
+_DROP_HEADERS = frozenset({"set-cookie", "transfer-encoding", "connection", "keep-alive"})
+_BOUNDARY = re.compile(r"boundary=\"?([^\";]+)")
+
+
+class CassetteMiss(RuntimeError):
+    """A replay-only cassette has no recording for a request."""
+
+
+def _clean_url(url: str) -> str:
+    parts = urlsplit(url)
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in SECRET_PARAMS)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), ""))
+
+
+def _clean_body(body: bytes, content_type: str) -> bytes:
+    """`body` with JSON keys sorted and any multipart boundary masked."""
+    if not body:
+        return b""
+    if "json" in content_type:
+        try:
+            return json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        except ValueError:
+            return body
+    boundary = _BOUNDARY.search(content_type)
+    if boundary:
+        return body.replace(boundary.group(1).encode("latin-1"), b"BOUNDARY")
+    return body
+
+
+def request_key(method: str, url: str, body: bytes = b"", headers: Any = None) -> str:
+    headers = headers or {}
+    content_type = (headers.get("content-type") or "").lower()
+    digest = hashlib.sha256()
+    for part in (method.upper(), _clean_url(url), headers.get("range") or ""):
+        digest.update(part.encode("utf-8") + b"\0")
+    digest.update(_clean_body(body, content_type))
+    return digest.hexdigest()
+
+
+class _Body:
+    """A response body compressed as it is read, so a recording never holds the plain bytes."""
+
+    def __init__(self):
+        self.size = 0
+        self._zip = zlib.compressobj()
+        self._parts: list[bytes] = []
+
+    def add(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        self._parts.append(self._zip.compress(chunk))
+
+    def compressed(self) -> bytes:
+        return b"".join(self._parts) + self._zip.flush()
+
+
+class Cassette:
+    """Recorded responses in one SQLite file, shared by every thread of the run."""
+
+    def __init__(self, path: str | os.PathLike, mode: str = "auto"):
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode!r} (expected one of {', '.join(MODES)})")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.mode = mode
+        self.replayed = 0
+        self.recorded = 0
+        self.closed = False
+        self.ignored = {h.strip().lower() for h in os.environ.get("AUTOGRAM_CASSETTE_IGNORE", "").split(",")
+                        if h.strip()} | IGNORED_HOSTS
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT NOT NULL, seq INTEGER NOT NULL, method TEXT NOT NULL, url TEXT NOT NULL, "
+                "request BLOB NOT NULL, status INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL, "
+                "recorded REAL NOT NULL, PRIMARY KEY (key, seq)) WITHOUT ROWID"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self.closed = True
+            self._conn.close()
+
+    def _seen(self) -> Counter[str]:
+        """How often this thread has made each request so far."""
+        seen = getattr(self._local, "seen", None)
+        if seen is None:
+            seen = self._local.seen = Counter()
+        return seen
+
+    def _lookup(self, key: str, seq: int) -> Optional[tuple[int, list, bytes]]:
+        # Replay-only runs may repeat a call more often than the recording did (e.g. one
+        # more status poll); those get the last response recorded for it.
+        sql = "SELECT status, headers, body FROM responses WHERE key = ? AND seq "
+        sql += "<= ? ORDER BY seq DESC LIMIT 1" if self.mode == "replay" else "= ?"
+        with self._lock:
+            row = self._conn.execute(sql, (key, seq)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), zlib.decompress(row[2])
+
+    def _store(self, key: str, seq: int, method: str, url: str, request: bytes,
+               status: int, headers: list, body: _Body) -> None:
+        headers = [[k, v] for k, v in headers if k.lower() not in _DROP_HEADERS]
+        with self._lock:
+            if self.closed:
+                # The body was finished after the cassette's block ended.
+                return
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, seq, method, url, request, status, headers, body, recorded) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, seq, method.upper(), _clean_url(url), zlib.compress(request), status, json.dumps(headers),
+                     body.compressed(), time.time()),
+                )
+            self.recorded += 1
+
+    def begin(self, method: str, url: str, body: bytes, headers: Any) -> tuple[Optional[str], int, Any]:
+        """Number this request and look it up: (key, seq, recording or None).
+
+        A None key means the request is not taped at all. Raises CassetteMiss
+        in replay mode when there is nothing recorded for it.
+        """
+        if urlsplit(url).hostname in self.ignored:
+            return None, 0, None
+        key = request_key(method, url, body, headers)
+        seen = self._seen()
+        seq = seen[key]
+        seen[key] += 1
+        if self.mode == "record":
+            return key, seq, None
+        hit = self._lookup(key, seq)
+        if hit is not None:
+            with self._lock:
+                self.replayed += 1
+        elif self.mode == "replay":
+            raise CassetteMiss(f"{method.upper()} {_clean_url(url)} (call {seq + 1}) is not in {self.path}; "
+                               "record it with AUTOGRAM_CASSETTE_MODE=auto")
+        return key, seq, hit
+
+    def skip(self, key: Optional[str], status: int) -> bool:
+        """True if the live response to `key` is not to be recorded.
+
+        Must be called on the thread that made the request, before its body is read.
+        """
+        if key is None:
+            return True
+        if status in TRANSIENT_STATUSES:
+            # Let the retry that follows take this call's place in the sequence.
+            self._seen()[key] -= 1
+            return True
+        return False
+
+    def finish(self, key: str, seq: int, method: str, url: str, body: bytes,
+               status: int, headers: list, content: _Body) -> None:
+        """Record the live response to a request begin() found no recording for and skip() let through."""
+        self._store(key, seq, method, url, body, status, headers, content)
+
+
+_active: Optional[Cassette] = None
+_originals: dict[str, Any] = {}
+_install_lock = threading.Lock()
+
+
+def active() -> Optional[Cassette]:
+    return _active
+
+
+def replaying() -> bool:
+    """True while a replay-only cassette is in use, so no call will reach the network."""
+    return _active is not None and _active.mode == "replay"
+
+
+class _RecordingBody:
+    """Wraps a urllib3 response so its decoded body is handed to `done` once it has been read to the end."""
+
+    def __init__(self, raw: Any, done: Callable[[_Body], None]):
+        self._raw = raw
+        self._done = done
+        self._body = _Body()
+        self._finished = False
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._raw, name)
+        # Only offered when the urllib3 in use has it (pages checks with hasattr).
+        return self._tee(attr) if name == "read1" else attr
+
+    def _keep(self, chunk: bytes, decode_content: Optional[bool], last: bool) -> None:
+        if self._finished:
+            return
+        decoded = decode_content if decode_content is not None else getattr(self._raw, "decode_content", True)
+        if not decoded and self._raw.headers.get("Content-Encoding", "identity").lower() != "identity":
+            # Still compressed; recordings hold decoded bodies.
+            self._finished = True
+            return
+        self._body.add(chunk)
+        if last:
+            self._finished = True
+            self._done(self._body)
+
+    def _tee(self, read: Callable[..., bytes]) -> Callable[..., bytes]:
+        def tee(amt: Optional[int] = None, decode_content: Optional[bool] = None, **kwargs) -> bytes:
+            chunk = read(amt, decode_content=decode_content, **kwargs)
+            self._keep(chunk, decode_content, last=amt is None or (not chunk and amt != 0))
+            return chunk
+        return tee
+
+    def read(self, amt: Optional[int] = None, decode_content: Optional[bool] = None, **kwargs) -> bytes:
+        return self._tee(self._raw.read)(amt, decode_content, **kwargs)
+
+    def stream(self, amt: Optional[int] = 2 ** 16, decode_content: Optional[bool] = None) -> Iterator[bytes]:
+        for chunk in self._raw.stream(amt, decode_content=decode_content):
+            self._keep(chunk, decode_content, last=False)
+            yield chunk
+        self._keep(b"", decode_content, last=True)
+
+
+def _patch_requests() -> None:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    original = HTTPAdapter.send
+    _originals["requests"] = (HTTPAdapter, "send", original)
+
+    def build(adapter, request, status: int, headers: list, body: bytes):
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response._content = body
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.connection = adapter
+        return response
+
+    def send(self, request, *args, **kwargs):
+        cassette = _active
+        body = request.body
+        if cassette is None or not isinstance(body, (bytes, str, type(None))):
+            # Streamed uploads can't be hashed without consuming them.
+            return original(self, request, *args, **kwargs)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        body = body or b""
+        key, seq, hit = cassette.begin(request.method, request.url, body, request.headers)
+        if hit is not None:
+            return build(self, request, *hit)
+        response = original(self, request, *args, **kwargs)
+        if cassette.skip(key, response.status_code):
+            return response
+        status = response.status_code
+        # The body is stored decoded, so its headers must describe it that way.
+        headers = [[k, v] for k, v in response.headers.items()
+                   if k.lower() not in ("content-encoding", "content-length")]
+
+        def done(content: _Body) -> None:
+            cassette.finish(key, seq, request.method, request.url, body, status,
+                            headers + [["Content-Length", str(content.size)]], content)
+
+        response.raw = _RecordingBody(response.raw, done)
+        return response
+
+    HTTPAdapter.send = send
+
+
+def _patch_httpx(module: str) -> None:
+    try:
+        httpx = importlib.import_module(module)
+    except ImportError:
+        return
+
+    def build(status: int, headers: list, body: bytes):
+        return httpx.Response(status, headers=headers, stream=httpx.ByteStream(body))
+
+    class RecordingStream(httpx.SyncByteStream):
+        """The live response's raw stream, handed to `done` once it has been read to the end."""
+
+        def __init__(self, stream, done: Callable[[_Body], None]):
+            self._stream = stream
+            self._done = done
+
+        def __iter__(self) -> Iterator[bytes]:
+            content = _Body()
+            for chunk in self._stream:
+                content.add(chunk)
+                yield chunk
+            self._done(content)
+
+        def close(self) -> None:
+            self._stream.close()
+
+    class AsyncRecordingStream(httpx.AsyncByteStream):
+        def __init__(self, stream, done: Callable[[_Body], None]):
+            self._stream = stream
+            self._done = done
+
+        async def __aiter__(self):
+            content = _Body()
+            async for chunk in self._stream:
+                content.add(chunk)
+                yield chunk
+            self._done(content)
+
+        async def aclose(self) -> None:
+            await self._stream.aclose()
+
+    def recorder(cassette: Cassette, key: str, seq: int, request, response, body: bytes) -> Callable[[_Body], None]:
+        # Raw bytes: httpx decodes Content-Encoding itself once we hand the response back.
+        headers = response.headers.multi_items()
+        return lambda content: cassette.finish(key, seq, request.method, str(request.url), body,
+                                               response.status_code, headers, content)
+
+    original = httpx.HTTPTransport.handle_request
+    _originals[module] = (httpx.HTTPTransport, "handle_request", original)
+
+    def handle_request(self, request):
+        cassette = _active
+        if cassette is None:
+            return original(self, request)
+        body = request.read()
+        key, seq, hit = cassette.begin(request.method, str(request.url), body, request.headers)
+        if hit is not None:
+            return build(*hit)
+        response = original(self, request)
+        if not cassette.skip(key, response.status_code):
+            response.stream = RecordingStream(response.stream, recorder(cassette, key, seq, request, response, body))
+        return response
+
+    original_async = httpx.AsyncHTTPTransport.handle_async_request
+    _originals[module + ".async"] = (httpx.AsyncHTTPTransport, "handle_async_request", original_async)
+
+    async def handle_async_request(self, request):
+        cassette = _active
+        if cassette is None:
+            return await original_async(self, request)
+        body = await request.aread()
+        key, seq, hit = cassette.begin(request.method, str(request.url), body, request.headers)
+        if hit is not None:
+            return build(*hit)
+        response = await original_async(self, request)
+        if not cassette.skip(key, response.status_code):
+            response.stream = AsyncRecordingStream(response.stream,
+                                                   recorder(cassette, key, seq, request, response, body))
+        return response
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+
+def _unpatch() -> None:
+    for cls, name, original in _originals.values():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+@contextlib.contextmanager
+def use(path: str | os.PathLike, mode: str = "auto") -> Iterator[Cassette]:
+    """Record or replay every outbound call made inside the block."""
+    global _active
+    with _install_lock:
+        if _active is not None:
+            raise RuntimeError(f"a cassette is already in use ({_active.path})")
+        cassette = Cassette(path, mode)
+        _patch_requests()
+        for module in HTTPX_MODULES:
+            _patch_httpx(module)
+        _active = cassette
+    try:
+        yield cassette
+    finally:
+        with _install_lock:
+            _active = None
+            _unpatch()
+        print(f"[cassette] {cassette.replayed} replayed, {cassette.recorded} recorded ({cassette.path})")
+        cassette.close()
+
+
+def from_env(command: str) -> contextlib.AbstractContextManager:
+    """use() as configured by AUTOGRAM_CASSETTE/AUTOGRAM_CASSETTE_MODE, or a no-op when unset."""
+    setting = os.environ.get("AUTOGRAM_CASSETTE", "").strip()
+    if setting.lower() in ("", "0", "false", "no"):
+        return contextlib.nullcontext()
+    path = cache_dir() / "cassettes" / f"{command}.sqlite3" if setting.lower() in ("1", "true", "yes") else setting
+    return use(path, os.environ.get("AUTOGRAM_CASSETTE_MODE", "auto").lower())
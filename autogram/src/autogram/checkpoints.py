@@ -0,0 +1,127 @@
+"""Checkpointed pipeline runs.
+
+Each run gets a directory under AUTOGRAM_RUNS_DIR (default `autogram/runs`)
+holding one JSON file per finished stage: the stage output plus a hash of
+the inputs that produced it. Running again with the same run id skips every
+stage whose inputs hash the same, so a failed publish can be retried
+without repeating the search, LLM calls or render.
+
+    run = RunDir.open(args.resume)
+    collected = run.stage("collect", {"query": query}, lambda: collector._run(query=query))
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Union
+
+from autogram import root
+
+
+def runs_dir() -> Path:
+    path = Path(os.environ.get("AUTOGRAM_RUNS_DIR") or root / "runs")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def input_hash(inputs: Any) -> str:
+    """Stable hash of JSON-serializable stage inputs."""
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path: str) -> Optional[str]:
+    """sha256 of a file, for use as a stage input; None if it does not exist."""
+    if not path or not os.path.exists(path):
+        return None
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + ".part")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+class StageError(RuntimeError):
+    """A stage returned an ERROR string instead of raising."""
+
+
+class RunDir:
+    """Directory of stage checkpoints for one run."""
+
+    def __init__(self, run_id: str, path: Path, resumed: bool = False):
+        self.run_id = run_id
+        self.path = path
+        self.resumed = resumed
+
+    @classmethod
+    def open(cls, run_id: Optional[str] = None, **meta: Any) -> "RunDir":
+        """Resume `run_id` if given (it must exist), otherwise start a new run."""
+        base = runs_dir()
+        if run_id:
+            path = base / run_id
+            if not (path / "run.json").exists():
+                raise FileNotFoundError(f"No run {run_id!r} in {base}")
+            run = cls(run_id, path, resumed=True)
+            print(f"[run] Resuming run {run_id} ({path})")
+            return run
+
+        run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        path = base / run_id
+        path.mkdir(parents=True)
+        _write_json(path / "run.json", {"run_id": run_id, "created": time.time(), **meta})
+        print(f"[run] Started run {run_id} ({path}); resume with --resume {run_id}")
+        return cls(run_id, path)
+
+    def file(self, name: str) -> str:
+        """Path of an artifact stored inside the run directory."""
+        return str(self.path / name)
+
+    def load(self, name: str) -> Optional[dict]:
+        try:
+            with open(self.path / f"{name}.json", "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def stage(self, name: str, inputs: Any, fn: Callable[[], Any],
+              files: Union[tuple[str, ...], Callable[[Any], Iterable[str]]] = ()) -> Any:
+        """Return the checkpointed output of `name` if `inputs` are unchanged, else run `fn`.
+
+        `files` lists paths the output depends on existing (e.g. a rendered
+        video), or is a function returning them from the output when they
+        are only known once the stage has run; a checkpoint whose files are
+        gone is run again. An output
+        string starting with "ERROR" raises StageError and is not saved.
+        """
+        digest = input_hash(inputs)
+        saved = self.load(name)
+        if saved and saved.get("input_hash") == digest and all(os.path.exists(p) for p in saved.get("files", [])):
+            print(f"[run] {name}: inputs unchanged, reusing checkpoint")
+            return saved["output"]
+
+        start = time.monotonic()
+        output = fn()
+        if isinstance(output, str) and output.startswith("ERROR"):
+            raise StageError(f"{name}: {output}")
+        if callable(files):
+            files = tuple(files(output))
+        _write_json(self.path / f"{name}.json", {
+            "stage": name,
+            "input_hash": digest,
+            "output": output,
+            "files": [str(p) for p in files],
+            "seconds": round(time.monotonic() - start, 3),
+            "finished": time.time(),
+        })
+        return output
@@ -0,0 +1,172 @@
+"""Deduplicated, resumable Cloudinary video uploads.
+
+A local index maps each file's SHA-256 to the `secure_url` Cloudinary
+returned for it, so retrying a publish never re-uploads a known video.
+An indexed URL is only reused after a HEAD request shows the asset is
+still there (it may have been deleted in the Cloudinary console), and
+entries expire after CLOUDINARY_INDEX_TTL seconds (default 30 days).
+Files that do need uploading are sent as parallel chunks sharing one
+upload id; finished chunks are recorded on disk so an interrupted upload
+picks up where it stopped.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+
+from autogram import ratelimit
+from autogram.cache import SQLiteCache, cache_dir
+from autogram.http_pool import get_session
+from autogram.tracing import span
+
+
+CHUNK_SIZE = int(os.environ.get("CLOUDINARY_CHUNK_SIZE", 20 * 1024 * 1024))
+MAX_WORKERS = int(os.environ.get("CLOUDINARY_UPLOAD_WORKERS", 4))
+INDEX_TTL = float(os.environ.get("CLOUDINARY_INDEX_TTL", 30 * 86400))
+
+_index: Optional[SQLiteCache] = None
+_index_lock = threading.Lock()
+_configured = False
+
+
+def configure_cloudinary() -> None:
+    """Configure the Cloudinary SDK from the environment, once per process."""
+    global _configured
+    import cloudinary
+
+    with _index_lock:
+        if not _configured:
+            cloudinary.config(
+                cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
+                api_key=os.getenv("CLOUDINARY_API_KEY"),
+                api_secret=os.getenv("CLOUDINARY_API_SECRET"),
+                secure=True,
+                **({"upload_prefix": os.environ["CLOUDINARY_UPLOAD_PREFIX"]} if os.environ.get("CLOUDINARY_UPLOAD_PREFIX") else {}),
+            )
+            _configured = True
+
+
+def get_upload_index() -> SQLiteCache:
+    """Return the sha256 -> secure_url index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SQLiteCache(cache_dir() / "cloudinary.sqlite3", ttl=INDEX_TTL, max_entries=100000)
+        return _index
+
+
+def file_sha256(path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _still_hosted(url: str) -> bool:
+    try:
+        resp = get_session("cloudinary").head(url, timeout=10, allow_redirects=True)
+    except requests.RequestException:
+        return False
+    return resp.ok
+
+
+def _state_path(digest: str) -> str:
+    path = cache_dir() / "uploads"
+    path.mkdir(exist_ok=True)
+    return str(path / f"{digest}.json")
+
+
+def _load_state(digest: str) -> dict:
+    try:
+        with open(_state_path(digest), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(digest: str, state: dict) -> None:
+    path = _state_path(digest)
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(path + ".part", path)
+
+
+def upload_video(local_video_path: str, chunk_size: int = CHUNK_SIZE, max_workers: int = MAX_WORKERS) -> str:
+    """Upload a video to Cloudinary (or reuse a previous upload) and return its secure_url."""
+    import cloudinary.uploader
+    import cloudinary.utils
+
+    size = os.path.getsize(local_video_path)
+    if not size:
+        raise ValueError(f"{local_video_path} is empty; refusing to upload it")
+    digest = file_sha256(local_video_path)
+    index = get_upload_index()
+    known = index.get(digest)
+    if known:
+        if _still_hosted(known):
+            print("☁ Video already on Cloudinary, skipping upload")
+            return known
+        print("☁ Previous upload is gone from Cloudinary, uploading again")
+        index.delete(digest)
+
+    configure_cloudinary()
+    state = _load_state(digest)
+    if state.get("chunk_size") != chunk_size:
+        state = {
+            "upload_id": cloudinary.utils.random_public_id(),
+            "public_id": f"autogram_{digest[:20]}",
+            "chunk_size": chunk_size,
+            "done": [],
+        }
+        _save_state(digest, state)
+    done = set(state["done"])
+    state_lock = threading.Lock()
+
+    ranges = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+    file_name = os.path.basename(local_video_path)
+
+    def send(index_and_range):
+        i, (start, end) = index_and_range
+        with open(local_video_path, "rb") as f:
+            f.seek(start)
+            chunk = f.read(end - start)
+        with span("cloudinary.chunk", chunk=i, bytes=len(chunk)):
+            result = ratelimit.call(
+                "cloudinary",
+                cloudinary.uploader.upload_large_part,
+                (file_name, chunk),
+                http_headers={
+                    "Content-Range": f"bytes {start}-{end - 1}/{size}",
+                    "X-Unique-Upload-Id": state["upload_id"],
+                },
+                public_id=state["public_id"],
+                resource_type="video",
+            )
+        with state_lock:
+            state["done"].append(i)
+            _save_state(digest, state)
+        return result
+
+    # Cloudinary assembles the file when the final chunk arrives, so it goes last.
+    *body, last = list(enumerate(ranges))
+    todo = [item for item in body if item[0] not in done]
+    if done:
+        print(f"☁ Resuming upload: {len(done)}/{len(ranges)} chunks already sent")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        list(pool.map(send, todo))
+    response = send(last)
+
+    video_url = response["secure_url"]
+    index.set(digest, video_url)
+    try:
+        os.remove(_state_path(digest))
+    except OSError:
+        pass
+    return video_url
@@ -0,0 +1,169 @@
+"""Extractive compaction of collected text to a token budget.
+
+Sentences are scored against the task query with BM25 (computed as NumPy
+matrix operations over a sentence x term count matrix). Without a query, or
+when no sentence shares a term with it, sentences are scored by TF-IDF
+cosine similarity to the whole text instead, which favours the central
+content. The best sentences are kept, in their original order, until the
+budget is spent; a snippet's `(source: ...)` citation and its `###`
+section heading are kept whenever any of its sentences is.
+
+The default budget comes from COMPACT_TOKEN_BUDGET (default 2000 tokens).
+"""
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from autogram.tokens import count_tokens, split_sentences
+
+
+TOKEN_BUDGET = int(os.environ.get("COMPACT_TOKEN_BUDGET", 2000))
+K1 = 1.5
+B = 0.75
+
+_TERM = re.compile(r"[a-z0-9]+")
+_CITATION = re.compile(r"\s*\(sources?: [^()]*\)\s*$")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were with".split()
+)
+
+
+@dataclass
+class CompactionResult:
+    text: str
+    tokens_before: int
+    tokens_after: int
+    sentences_kept: int
+    sentences_total: int
+
+
+@dataclass
+class _Unit:
+    text: str
+    paragraph: int
+    heading: Optional[int]
+    tokens: int
+
+
+def terms(text: str) -> list[str]:
+    return [t for t in _TERM.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _units(text: str, model: str) -> tuple[list[str], dict[int, str], list[_Unit]]:
+    """Split `text` into headings, per-paragraph citations and sentence units."""
+    headings: list[str] = []
+    citations: dict[int, str] = {}
+    units: list[_Unit] = []
+    heading = None
+    for paragraph, block in enumerate(p.strip() for p in re.split(r"\n\s*\n", text)):
+        if not block:
+            continue
+        if block.startswith("#") and "\n" not in block:
+            headings.append(block)
+            heading = len(headings) - 1
+            continue
+        # A snippet's "(source: ...)" cites the whole paragraph, not its last sentence.
+        citation = _CITATION.search(block)
+        if citation:
+            citations[paragraph] = citation.group().strip()
+            block = block[:citation.start()]
+        for sentence in split_sentences(block):
+            units.append(_Unit(sentence.strip(), paragraph, heading, count_tokens(" " + sentence, model)))
+    return headings, citations, units
+
+
+def _term_matrix(docs: list[list[str]], vocab: dict[str, int]) -> np.ndarray:
+    rows = [i for i, doc in enumerate(docs) for term in doc if term in vocab]
+    cols = [vocab[term] for doc in docs for term in doc if term in vocab]
+    matrix = np.zeros((len(docs), len(vocab)), dtype=np.float32)
+    np.add.at(matrix, (rows, cols), 1.0)
+    return matrix
+
+
+def bm25_scores(sentences: list[str], query: str) -> np.ndarray:
+    """BM25 score of every sentence for `query`."""
+    docs = [terms(s) for s in sentences]
+    query_terms = sorted(set(terms(query)))
+    vocab = {term: i for i, term in enumerate(query_terms)}
+    if not vocab or not docs:
+        return np.zeros(len(docs), dtype=np.float32)
+    tf = _term_matrix(docs, vocab)
+    lengths = np.array([len(doc) for doc in docs], dtype=np.float32)
+    avg = max(float(lengths.mean()), 1.0)
+    df = (tf > 0).sum(axis=0)
+    n = len(docs)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5))
+    norm = K1 * (1 - B + B * lengths / avg)
+    return ((tf * (K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+
+
+def centrality_scores(sentences: list[str]) -> np.ndarray:
+    """Cosine similarity of each sentence's TF-IDF vector to the whole text's."""
+    docs = [terms(s) for s in sentences]
+    vocab = {term: i for i, term in enumerate(sorted({t for doc in docs for t in doc}))}
+    if not vocab:
+        return np.zeros(len(docs), dtype=np.float32)
+    tf = _term_matrix(docs, vocab)
+    idf = np.log((1 + len(docs)) / (1 + (tf > 0).sum(axis=0))) + 1
+    tfidf = tf * idf
+    centroid = tfidf.sum(axis=0)
+    norms = np.linalg.norm(tfidf, axis=1) * (np.linalg.norm(centroid) or 1.0)
+    return np.divide(tfidf @ centroid, norms, out=np.zeros(len(docs), dtype=np.float32), where=norms > 0)
+
+
+def compact(text: str, query: str = "", budget: int = TOKEN_BUDGET, model: str = "gpt-4o-mini") -> CompactionResult:
+    """Keep the sentences of `text` most relevant to `query` within `budget` tokens."""
+    tokens_before = count_tokens(text, model)
+    headings, citations, units = _units(text, model)
+    if tokens_before <= budget or not units:
+        return CompactionResult(text, tokens_before, tokens_before, len(units), len(units))
+
+    sentences = [u.text for u in units]
+    scores = bm25_scores(sentences, query) if query else np.zeros(len(units), dtype=np.float32)
+    if not scores.any():
+        scores = centrality_scores(sentences)
+
+    # Ties go to the earlier sentence; headings and citations are charged when first used.
+    order = np.lexsort((np.arange(len(units)), -scores))
+    keep, spent, used_headings, used_paragraphs = set(), 0, set(), set()
+    for i in order:
+        if scores[i] <= 0 and keep:
+            break
+        unit = units[int(i)]
+        cost = unit.tokens
+        if unit.heading is not None and unit.heading not in used_headings:
+            cost += count_tokens(headings[unit.heading], model)
+        if unit.paragraph in citations and unit.paragraph not in used_paragraphs:
+            cost += count_tokens(" " + citations[unit.paragraph], model)
+        if spent + cost > budget:
+            continue
+        keep.add(int(i))
+        spent += cost
+        used_paragraphs.add(unit.paragraph)
+        if unit.heading is not None:
+            used_headings.add(unit.heading)
+
+    last_kept = {units[i].paragraph: i for i in sorted(keep)}
+    blocks: list[str] = []
+    last_paragraph, last_heading = None, None
+    for i, unit in enumerate(units):
+        if i not in keep:
+            continue
+        if unit.heading is not None and unit.heading != last_heading:
+            blocks.append(headings[unit.heading])
+            last_heading = unit.heading
+        if unit.paragraph == last_paragraph:
+            blocks[-1] += " " + unit.text
+        else:
+            blocks.append(unit.text)
+        last_paragraph = unit.paragraph
+        if unit.paragraph in citations and last_kept[unit.paragraph] == i:
+            blocks[-1] += " " + citations[unit.paragraph]
+
+    compacted = "\n\n".join(blocks)
+    return CompactionResult(compacted, tokens_before, count_tokens(compacted, model), len(keep), len(units))
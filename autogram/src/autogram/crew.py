@@ -1,12 +1,10 @@
 from crewai import Agent, Crew, Process, Task #type:ignore
-from crewai.project import CrewBase, agent, crew, task #type:ignore
+from crewai.project import CrewBase, after_kickoff, agent, crew, task #type:ignore
 from crewai.agents.agent_builder.base_agent import BaseAgent #type:ignore
-# built-in and custom tools
-from crewai_tools import SerperDevTool #type:ignore
-from autogram.tools.collector_tool import CollectorTool
-from autogram.tools.summarizer_tool import SummarizerTool
-from autogram.tools.formatter_tool import FormatterTool
-from autogram.tools.veo_tool import VeoTool
+# built-in and custom tools, imported and built on first call (see autogram.tools.lazy)
+from autogram.tools import tool_functions
+from autogram.task_graph import async_flags, critical_path, describe_plan, plan_waves, task_nodes
+from autogram import fact_index
 import os
 
 # from crewai_tools import ScrapeWebsiteTool  # Commented out for now
@@ -15,14 +13,7 @@ from typing import List
 # you can use the @before_kickoff and @after_kickoff decorators
 # https://docs.crewai.com/concepts/crews#example-crew-class-with-decorators
 
-# Tool registration map for CrewAI
-tool_functions = {
-    "veo_tool": VeoTool,
-    "collector_tool": CollectorTool,
-    "summarizer_tool": SummarizerTool,
-    "formatter_tool": FormatterTool,
-    # add others if needed
-}
+# Tool registration map for CrewAI lives in autogram.tools.TOOL_PATHS (add others there if needed)
 
 
 @CrewBase
@@ -38,7 +29,11 @@ class Autogram():
     def researcher(self) -> Agent:
         return Agent(
             config=self.agents_config['researcher'], 
-            tools=[SerperDevTool(), CollectorTool()], 
+            tools=[
+                tool_functions.lazy("serper_dev_tool"),
+                tool_functions.lazy("collector_tool"),
+                tool_functions.lazy("multi_collector_tool"),
+            ],
             verbose=True
         )
     
@@ -48,7 +43,7 @@ class Autogram():
         """Summarizer agent: consumes research output and produces concise summaries using summarizer tool."""
         return Agent(
             config=self.agents_config['summarizer'], 
-            tools=[SummarizerTool()],
+            tools=[tool_functions.lazy("summarizer_tool")],
             verbose=True
         )
 
@@ -57,7 +52,7 @@ class Autogram():
         """Content Creator agent: takes the summary from the summarizer agent and creates a full script for the instagram video"""
         return Agent(
             config=self.agents_config['content_creator'], 
-            tools=[FormatterTool()],
+            tools=[tool_functions.lazy("formatter_tool")],
             verbose=True
         )
     
@@ -70,7 +65,7 @@ class Autogram():
         
         return Agent(
             config=self.agents_config['video_generator'],
-            tools=[VeoTool(api_key=veo_api_key)],
+            tools=[tool_functions.lazy("veo_tool", api_key=veo_api_key)],
             verbose=True,
             instructions="Use the VeoTool to generate a video using the script text from the 'report.md' file.",
             
@@ -96,7 +91,19 @@ class Autogram():
     def reporting_task(self) -> Task:
         return Task(
             config=self.tasks_config['reporting_task'], 
-            output_file='report.md' #Saves the final script to report.md for ease of viewing. Could pass the file to another agent for video generation
+            output_file='report.md', #Saves the final script to report.md for ease of viewing. Could pass the file to another agent for video generation
+            guardrail=self._novel_script if fact_index.enabled() else None,
+        )
+
+    @staticmethod
+    def _novel_script(output):
+        """Task guardrail: send the script back to the agent if we already rendered something like it."""
+        match = fact_index.get_fact_index().check(output.raw)
+        if match is None:
+            return True, output
+        return False, (
+            f"This script is {match.similarity:.0%} similar to one already published: {match.text[:300]!r}. "
+            "Choose a different discovery from the research and write the script about that instead."
         )
     
     @task
@@ -113,13 +120,62 @@ class Autogram():
     @crew
     def crew(self) -> Crew:
         """Creates the Autogram crew"""
-       
+
+        tasks = self.tasks
+        if os.getenv("AUTOGRAM_PARALLEL_TASKS", "true").lower() in ("1", "true", "yes"):
+            tasks = self._schedule_tasks()
 
         return Crew(
             agents=self.agents, 
-            tasks=self.tasks, 
+            tasks=tasks, 
             process=Process.sequential,
             verbose=True,
             tools=tool_functions,
        
         )
+
+    def _schedule_tasks(self) -> List[Task]:
+        """Order tasks into dependency waves and mark independent ones async.
+
+        Tasks that only share upstream `context` (e.g. summarize_task and
+        reporting_task, which both depend on research_task) then run at the
+        same time under Process.sequential.
+        """
+        nodes = task_nodes(self.tasks)
+        waves = plan_waves(nodes)
+        flags = async_flags(waves)
+        by_name = {node.name: task for node, task in zip(nodes, self.tasks)}
+
+        scheduled = []
+        for wave in waves:
+            for name in wave:
+                by_name[name].async_execution = flags[name]
+                scheduled.append(by_name[name])
+
+        path, _ = critical_path(nodes)
+        print("Task plan:\n" + describe_plan(waves, flags))
+        print("Critical path: " + " -> ".join(path))
+        return scheduled
+
+    @after_kickoff
+    def log_critical_path(self, output):
+        """Log the measured critical path once the crew finishes."""
+        nodes = task_nodes(self.tasks)
+        durations = {
+            node.name: task.execution_duration
+            for node, task in zip(nodes, self.tasks)
+            if getattr(task, "execution_duration", None) is not None
+        }
+        if durations:
+            path, total = critical_path(nodes, durations)
+            steps = ", ".join(f"{name} {durations.get(name, 0):.1f}s" for name in path)
+            print(f"Critical path: {total:.1f}s ({steps}); sum of all tasks {sum(durations.values()):.1f}s")
+        return output
+
+    @after_kickoff
+    def index_script(self, output):
+        """Remember the rendered script so later runs pick something else."""
+        report = next((t.output for t in self.tasks if t.name == "reporting_task" and t.output), None)
+        if report is not None:
+            fact_index.record_fact(report.raw, source="crew")
+        return output
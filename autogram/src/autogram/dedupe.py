@@ -0,0 +1,122 @@
+"""Near-duplicate snippet removal with MinHash.
+
+Search results often quote the same press release, so several snippets
+say nearly the same thing. Each snippet is reduced to a set of word
+shingles and a MinHash signature; locality-sensitive banding finds
+candidate pairs and the estimated Jaccard similarity decides. The first
+snippet of each group is kept and the source links of the others are
+attached to it, so no source is lost.
+
+Tune with SNIPPET_DEDUPE (on by default) and SNIPPET_DEDUPE_THRESHOLD
+(estimated Jaccard similarity of word 3-grams, default 0.5).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from autogram.tokens import count_tokens
+
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+THRESHOLD = float(os.environ.get("SNIPPET_DEDUPE_THRESHOLD", 0.5))
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def enabled() -> bool:
+    return os.environ.get("SNIPPET_DEDUPE", "true").lower() in ("1", "true", "yes")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """Overlapping word `size`-grams of the lower-cased text."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def signature(shingle_set: set[str]) -> tuple[int, ...]:
+    """MinHash signature: for each permutation, the smallest hash of any shingle."""
+    if not shingle_set:
+        return (0,) * NUM_PERM
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingle_set]
+    return tuple(min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS)
+
+
+def similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the shingle sets behind two signatures."""
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+
+@dataclass
+class Snippet:
+    text: str
+    links: list[str] = field(default_factory=list)
+    group: Optional[str] = None
+
+
+@dataclass
+class DedupeResult:
+    kept: list[Snippet]
+    dropped: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def dedupe_snippets(snippets: Iterable[Snippet], threshold: float = THRESHOLD) -> DedupeResult:
+    """Drop snippets that are near-duplicates of an earlier one, merging their links into it.
+
+    Order is preserved, so snippets from several collections (e.g. one per
+    query) can be passed together and regrouped by `Snippet.group`.
+    """
+    rows = NUM_PERM // BANDS
+    buckets: dict[tuple, list[int]] = {}
+    kept: list[Snippet] = []
+    signatures: list[tuple[int, ...]] = []
+    result = DedupeResult(kept)
+
+    for snippet in snippets:
+        result.tokens_before += count_tokens(snippet.text)
+        shingle_set = shingles(snippet.text)
+        if not shingle_set:
+            # No words to compare (e.g. only punctuation): keep it, but never as a match for others.
+            kept.append(Snippet(snippet.text, list(snippet.links), snippet.group))
+            signatures.append(())
+            result.tokens_after += count_tokens(snippet.text)
+            continue
+        sig = signature(shingle_set)
+
+        candidates = set()
+        keys = [(band, sig[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+        for key in keys:
+            candidates.update(buckets.get(key, ()))
+        match = next((i for i in sorted(candidates) if similarity(sig, signatures[i]) >= threshold), None)
+
+        if match is not None:
+            original = kept[match]
+            original.links.extend(link for link in snippet.links if link not in original.links)
+            result.dropped += 1
+            continue
+
+        index = len(kept)
+        kept.append(Snippet(snippet.text, list(snippet.links), snippet.group))
+        signatures.append(sig)
+        for key in keys:
+            buckets.setdefault(key, []).append(index)
+        result.tokens_after += count_tokens(snippet.text)
+
+    return result
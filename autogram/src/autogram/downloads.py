@@ -0,0 +1,176 @@
+"""Streaming, resumable file downloads.
+
+Chunks are written straight to `<dest>.part` while a SHA-256 is computed,
+so memory stays flat regardless of file size. The finished file is moved
+into place atomically. If a `.part` file is left behind by an interrupted
+download, the next attempt resumes from its end with an HTTP Range request.
+
+A resume is only attempted when `<dest>.part.json` shows the partial file
+came from the same URL and the server gave it an ETag or Last-Modified
+validator. The validator is sent as `If-Range`, so a changed file comes
+back whole instead of being appended to the old bytes. Partial files from
+another URL, or with no validator, are discarded.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Optional
+
+import requests
+
+from autogram import ratelimit
+from autogram.http_pool import get_session
+
+
+CHUNK_SIZE = 1 << 20
+
+
+class IncompleteDownload(IOError):
+    """The transfer ended early or no longer matches the partial file; worth another attempt."""
+
+
+def _hash_file(path: str, hasher) -> None:
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+
+
+def _discard(*paths: str) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _load_meta(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_meta(path: str, url: str, resp: requests.Response, length: Optional[int]) -> None:
+    meta = {"url": url, "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified"),
+            "length": length}
+    with open(path, "w") as f:
+        json.dump(meta, f)
+
+
+def _if_range(meta: dict) -> Optional[str]:
+    # Weak ETags are not allowed in If-Range; Last-Modified is the fallback.
+    etag = meta.get("etag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return meta.get("last_modified")
+
+
+def _content_range(resp: requests.Response) -> tuple[Optional[int], Optional[int]]:
+    """(first byte, total length) from `Content-Range`; either is None when absent or unknown."""
+    match = re.match(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", resp.headers.get("Content-Range", ""))
+    if not match:
+        return None, None
+    first, total = match.groups()
+    return (int(first) if first else None), (int(total) if total != "*" else None)
+
+
+def stream_download(url: str, dest: str, headers: Optional[dict] = None, session: Optional[requests.Session] = None,
+                    retries: int = 3, timeout: tuple = (10, 60)) -> str:
+    """Download `url` to `dest` and return the file's SHA-256 hex digest.
+
+    Dropped connections, timeouts, short transfers, 429 and 5xx responses
+    are retried up to `retries` times with jittered backoff; other HTTP
+    errors are raised straight away.
+    """
+    session = session or get_session("downloads")
+    part = dest + ".part"
+    meta_path = part + ".json"
+    last_error: Optional[Exception] = None
+    delay = 0.0
+
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(delay)
+        hasher = hashlib.sha256()
+        request_headers = dict(headers or {})
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        meta = _load_meta(meta_path) if offset else {}
+        validator = _if_range(meta)
+        if offset and (meta.get("url") != url or not validator):
+            _discard(part, meta_path)
+            offset = 0
+        if offset:
+            request_headers["Range"] = f"bytes={offset}-"
+            request_headers["If-Range"] = validator
+
+        try:
+            with session.get(url, headers=request_headers, stream=True, timeout=timeout, allow_redirects=True) as resp:
+                if resp.status_code == 416 and offset:
+                    # Nothing left to fetch, but only if the server's length is the one the part was fetched against.
+                    _, total = _content_range(resp)
+                    if total is not None and total == offset == meta.get("length"):
+                        _hash_file(part, hasher)
+                        break
+                    _discard(part, meta_path)
+                    raise IncompleteDownload(f"partial download no longer matches {url}; starting over")
+                resp.raise_for_status()
+
+                first, total = _content_range(resp)
+                if resp.status_code == 206:
+                    if not offset or first != offset or total != meta.get("length"):
+                        _discard(part, meta_path)
+                        raise IncompleteDownload(
+                            f"server sent a range that does not continue the partial download of {url}")
+                    _hash_file(part, hasher)
+                    mode = "ab"
+                else:
+                    # 200 means the file changed (If-Range failed) or the server ignores ranges.
+                    offset, mode = 0, "wb"
+                    expected = resp.headers.get("Content-Length")
+                    _save_meta(meta_path, url, resp, int(expected) if expected is not None else total)
+
+                expected = resp.headers.get("Content-Length")
+                written = 0
+                with open(part, mode) as f:
+                    for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            written += len(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if expected is not None and written != int(expected):
+                    raise IncompleteDownload(f"incomplete download: got {written} of {expected} bytes")
+            break
+        except requests.HTTPError as e:
+            # 429 and 5xx are worth another try; 403/404/410 (e.g. an expired signed URL) are not.
+            minimum = ratelimit.retry_delay(e)
+            if minimum is None:
+                raise
+            last_error, delay = e, max(minimum, ratelimit.backoff(attempt))
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                IncompleteDownload) as e:
+            last_error, delay = e, ratelimit.backoff(attempt)
+    else:
+        raise IOError(f"download of {url} failed after {retries + 1} attempts: {last_error}")
+
+    os.replace(part, dest)
+    _discard(meta_path)
+    return hasher.hexdigest()
+
+
+def write_atomic(data: bytes, dest: str) -> str:
+    """Write in-memory bytes to `dest` atomically and return their SHA-256."""
+    part = dest + ".part"
+    with open(part, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(part, dest)
+    return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,232 @@
+"""Index of facts we already rendered, to avoid paying for the same video twice.
+
+Facts are embedded locally with feature hashing: stopword-filtered words
+and word pairs are hashed into DIM buckets, weighted by sublinear term
+frequency and by IDF over the facts indexed so far (so boilerplate shared by
+every script counts for little), then L2-normalized. The raw hashed counts
+live in SQLite next to the fact text as float16 and are held in memory as a
+sparse (row, bucket, weight) matrix, since a one-sentence fact touches only
+a few dozen of the DIM buckets. The current IDF is applied to both the query
+and the stored facts at lookup time, so the similarity of two facts does not
+drift as the index grows; the weighted, normalized matrix is rebuilt only
+when new facts arrive. A lookup is one sparse matrix-vector product
+(`np.bincount` over the non-zeros), a few milliseconds even with tens of
+thousands of facts.
+
+FACT_DEDUPE=false disables the check and FACT_DEDUPE_THRESHOLD (cosine
+similarity, default 0.5) sets how close counts as a repeat.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+
+from autogram.cache import cache_dir
+from autogram.compaction import terms
+
+
+DIM = 1024
+# PRAGMA user_version of an index whose `vector` column holds raw term counts.
+SCHEMA_VERSION = 1
+THRESHOLD = float(os.environ.get("FACT_DEDUPE_THRESHOLD", 0.5))
+REGENERATE_ATTEMPTS = int(os.environ.get("FACT_REGENERATE_ATTEMPTS", 2))
+
+
+def enabled() -> bool:
+    return os.environ.get("FACT_DEDUPE", "true").lower() in ("1", "true", "yes")
+
+
+def _bucket(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(), "big") % DIM
+
+
+def term_counts(text: str) -> np.ndarray:
+    """Hashed counts of the words and adjacent word pairs in `text`."""
+    words = terms(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    counts = np.zeros(DIM, dtype=np.float32)
+    for feature in features:
+        counts[_bucket(feature)] += 1.0
+    return counts
+
+
+@dataclass
+class FactMatch:
+    id: int
+    text: str
+    similarity: float
+    created: float
+    meta: dict
+
+
+class DuplicateFact(RuntimeError):
+    """No sufficiently new fact could be produced."""
+
+    def __init__(self, text: str, match: FactMatch):
+        super().__init__(
+            f"fact is {match.similarity:.0%} similar to one rendered on "
+            f"{time.strftime('%Y-%m-%d', time.localtime(match.created))}: {match.text[:120]!r}"
+        )
+        self.text = text
+        self.match = match
+
+
+class FactIndex:
+    """Rendered facts plus their embedding matrix, shared by threads and processes through SQLite."""
+
+    def __init__(self, path: Optional[str | os.PathLike] = None):
+        self.path = Path(path) if path else cache_dir() / "facts.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS facts ("
+            "id INTEGER PRIMARY KEY, text TEXT NOT NULL, meta TEXT NOT NULL, created REAL NOT NULL, "
+            "vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+        self._ids: list[int] = []
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._cols = np.zeros(0, dtype=np.int32)
+        self._tf = np.zeros(0, dtype=np.float32)
+        # _tf weighted by the current IDF and normalized per fact; None once new facts change the IDF.
+        self._weights: Optional[np.ndarray] = None
+        self._df = np.zeros(DIM, dtype=np.float64)
+        self._last_id = 0
+
+    def _migrate(self) -> None:
+        """Replace the IDF-weighted vectors of an older index with counts recomputed from the fact text."""
+        with self._conn:
+            rows = self._conn.execute("SELECT id, text FROM facts").fetchall()
+            self._conn.executemany("UPDATE facts SET vector = ? WHERE id = ?",
+                                   [(term_counts(text).astype(np.float16).tobytes(), fact_id) for fact_id, text in rows])
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._ids)
+
+    def _refresh(self) -> None:
+        """Load rows added since the last call (possibly by another process)."""
+        rows = self._conn.execute(
+            "SELECT id, vector FROM facts WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        if not rows:
+            return
+        vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float16).reshape(len(rows), DIM)
+        new_rows, new_cols = np.nonzero(vectors)
+        self._rows = np.concatenate([self._rows, (new_rows + len(self._ids)).astype(np.int32)])
+        self._cols = np.concatenate([self._cols, new_cols.astype(np.int32)])
+        counts = vectors[new_rows, new_cols].astype(np.float32)
+        self._tf = np.concatenate([self._tf, 1 + np.log(counts)])
+        self._weights = None
+        self._df += (vectors > 0).sum(axis=0)
+        self._ids.extend(row[0] for row in rows)
+        self._last_id = rows[-1][0]
+
+    def _idf(self) -> np.ndarray:
+        return np.log((1 + len(self._ids)) / (1 + self._df)) + 1
+
+    def _embed(self, counts: np.ndarray) -> np.ndarray:
+        weighted = np.where(counts > 0, 1 + np.log(np.maximum(counts, 1)), 0) * self._idf()
+        norm = float(np.linalg.norm(weighted))
+        return (weighted / norm if norm else weighted).astype(np.float32)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of `query` (from _embed) to every indexed fact, both under the current IDF."""
+        if self._weights is None:
+            weighted = self._tf * self._idf()[self._cols].astype(np.float32)
+            norms = np.sqrt(np.bincount(self._rows, weights=weighted * weighted, minlength=len(self._ids)))
+            self._weights = (weighted / norms[self._rows]).astype(np.float32)
+        return np.bincount(self._rows, weights=self._weights * query[self._cols], minlength=len(self._ids))
+
+    def nearest(self, text: str, exclude: Optional[Callable[[dict], bool]] = None) -> Optional[FactMatch]:
+        """The most similar indexed fact, or None if the index is empty."""
+        with self._lock:
+            self._refresh()
+            if not self._ids:
+                return None
+            scores = self._scores(self._embed(term_counts(text)))
+            top = np.argpartition(-scores, min(20, len(scores) - 1))[:20]
+            for row in top[np.argsort(-scores[top])]:
+                fact_id = self._ids[int(row)]
+                found = self._conn.execute("SELECT text, created, meta FROM facts WHERE id = ?", (fact_id,)).fetchone()
+                meta = json.loads(found[2])
+                if exclude is None or not exclude(meta):
+                    return FactMatch(fact_id, found[0], float(scores[row]), found[1], meta)
+        return None
+
+    def check(self, text: str, threshold: float = THRESHOLD,
+              exclude: Optional[Callable[[dict], bool]] = None) -> Optional[FactMatch]:
+        """Return the indexed fact `text` repeats (similarity >= threshold), or None if it is new."""
+        match = self.nearest(text, exclude)
+        return match if match is not None and match.similarity >= threshold else None
+
+    def add(self, text: str, **meta) -> int:
+        counts = term_counts(text)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO facts (text, meta, created, vector) VALUES (?, ?, ?, ?)",
+                (text, json.dumps(meta, default=str), time.time(), counts.astype(np.float16).tobytes()),
+            )
+            self._conn.commit()
+            self._refresh()
+            return cursor.lastrowid
+
+
+_index: Optional[FactIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_fact_index() -> Optional[FactIndex]:
+    """Return the shared index, or None if FACT_DEDUPE is disabled."""
+    global _index
+    if not enabled():
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = FactIndex()
+        return _index
+
+
+def novel_fact(generate: Callable[[list[str]], str], exclude: Optional[Callable[[dict], bool]] = None,
+               attempts: int = REGENERATE_ATTEMPTS) -> str:
+    """Call generate(avoid) until it returns a fact that is not in the index.
+
+    `avoid` lists the already-rendered facts the previous candidates
+    repeated, so the prompt can steer away from them. Raises DuplicateFact
+    if every attempt repeats a rendered fact.
+    """
+    index = get_fact_index()
+    avoid: list[str] = []
+    for attempt in range(attempts + 1):
+        text = generate(avoid)
+        if index is None or (isinstance(text, str) and text.startswith("ERROR")):
+            return text
+        match = index.check(text, exclude=exclude)
+        if match is None:
+            return text
+        print(f"[facts] candidate repeats a rendered fact ({match.similarity:.2f}); "
+              f"{'regenerating' if attempt < attempts else 'giving up'}")
+        if match.text not in avoid:
+            avoid.append(match.text)
+    raise DuplicateFact(text, match)
+
+
+def record_fact(text: str, **meta) -> Optional[int]:
+    """Add a rendered fact to the shared index (no-op when FACT_DEDUPE is disabled)."""
+    index = get_fact_index()
+    if index is None or not text or text.startswith("ERROR"):
+        return None
+    return index.add(text.strip(), **meta)
@@ -0,0 +1,37 @@
+"""Shared keep-alive HTTP sessions.
+
+Each external service gets one `requests.Session` per process so repeated
+calls reuse pooled TCP/TLS connections instead of paying a new handshake.
+"""
+from __future__ import annotations
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+POOL_SIZE = 16
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+def get_session(name: str = "default") -> requests.Session:
+    """Return the process-wide session for `name`, creating it on first use."""
+    with _lock:
+        session = _sessions.get(name)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[name] = session
+        return session
+
+
+def close_sessions() -> None:
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
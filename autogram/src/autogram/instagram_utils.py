@@ -1,44 +1,44 @@
 import os
 import time
-import requests
-import cloudinary
-import cloudinary.uploader
 from dotenv import load_dotenv
 
+from autogram import ratelimit
+from autogram.cloudinary_upload import upload_video
+from autogram.http_pool import get_session
+from autogram.mp4 import ensure_faststart
+from autogram.tracing import traced
+
 load_dotenv()
 
-# Cloudinary config
-cloudinary.config(
-    cloud_name=os.getenv("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.getenv("CLOUDINARY_API_KEY"),
-    api_secret=os.getenv("CLOUDINARY_API_SECRET"),
-    secure=True
-)
+# Cloudinary is configured on first upload (see cloudinary_upload.configure_cloudinary)
 
 # Instagram API creds
 IG_USER_ID = os.getenv("IG_USER_ID")
 ACCESS_TOKEN = os.getenv("IG_PAGE_ACCESS_TOKEN")
 
+# Override to point at a different API version or a local stand-in (see autogram.bench.fakes).
+GRAPH_API_BASE = os.getenv("GRAPH_API_BASE", "https://graph.facebook.com/v21.0").rstrip("/")
+GRAPH_TIMEOUT = 30
+# How long Instagram may take to process an uploaded Reel before we give up.
+PROCESSING_TIMEOUT = float(os.getenv("IG_PROCESSING_TIMEOUT", 600))
+
 
 # ==========================
 # CLOUDINARY + IG FUNCTIONS
 # ==========================
 
+@traced("cloudinary.upload")
 def upload_to_cloudinary(local_video_path):
     print("☁ Uploading video to Cloudinary...")
-    response = cloudinary.uploader.upload_large(
-        local_video_path,
-        resource_type="video"
-    )
-
-    video_url = response["secure_url"]
+    video_url = upload_video(local_video_path)
     print("☁ Cloudinary URL:", video_url)
     return video_url
 
 
+@traced("instagram.create")
 def create_video_object(video_url, caption):
     print("🎬 Creating IG media object...")
-    url = f"https://graph.facebook.com/v21.0/{IG_USER_ID}/media"
+    url = f"{GRAPH_API_BASE}/{IG_USER_ID}/media"
 
     params = {
         "media_type": "REELS",
@@ -47,7 +47,9 @@ def create_video_object(video_url, caption):
         "access_token": ACCESS_TOKEN
     }
 
-    response = requests.post(url, params=params).json()
+    response = ratelimit.call(
+        "graph", get_session("graph").post, url, params=params, timeout=GRAPH_TIMEOUT, idempotent=False
+    ).json()
     print("🎥 Media Object Response:", response)
 
     if "id" not in response:
@@ -56,22 +58,26 @@ def create_video_object(video_url, caption):
     return response["id"]
 
 
+@traced("instagram.status")
 def check_media_status(creation_id):
-    url = f"https://graph.facebook.com/v21.0/{creation_id}"
+    url = f"{GRAPH_API_BASE}/{creation_id}"
     params = {"fields": "status", "access_token": ACCESS_TOKEN}
 
-    response = requests.get(url, params=params).json()
+    response = ratelimit.call("graph", get_session("graph").get, url, params=params, timeout=GRAPH_TIMEOUT).json()
     print("⌛ Processing Status:", response)
 
     return response
 
 
+@traced("instagram.publish")
 def publish_video(creation_id):
     print("🚀 Publishing IG Reel...")
-    url = f"https://graph.facebook.com/v21.0/{IG_USER_ID}/media_publish"
+    url = f"{GRAPH_API_BASE}/{IG_USER_ID}/media_publish"
     params = {"creation_id": creation_id, "access_token": ACCESS_TOKEN}
 
-    response = requests.post(url, params=params).json()
+    response = ratelimit.call(
+        "graph", get_session("graph").post, url, params=params, timeout=GRAPH_TIMEOUT, idempotent=False
+    ).json()
     print("📤 Publish Response:", response)
 
     if "id" not in response:
@@ -80,6 +86,28 @@ def publish_video(creation_id):
     return response["id"]
 
 
+def wait_for_media(creation_id, timeout=PROCESSING_TIMEOUT, initial_interval=2.0, max_interval=30.0):
+    """Poll a media container until it finishes, backing off exponentially up to `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    interval = initial_interval
+    while True:
+        status = check_media_status(creation_id)
+        st = status.get("status", "")
+
+        if "Finished" in st:
+            print("✔ Processing complete!")
+            return status
+
+        if "Error" in st:
+            raise Exception(f"❌ Instagram processing error: {st}")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"❌ Instagram processing did not finish within {timeout:.0f}s: {st}")
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, max_interval)
+
+
 # ==========================
 # MAIN PUBLIC FUNCTION
 # ==========================
@@ -90,6 +118,9 @@ def post_to_instagram(video_path, caption="Generated automatically ✨"):
     if not os.path.exists(video_path):
         raise FileNotFoundError(f"Video not found: {video_path}")
 
+    # Reels start processing sooner when the index (moov) precedes the media data.
+    ensure_faststart(video_path)
+
     # Step 1: Upload to Cloudinary
     video_url = upload_to_cloudinary(video_path)
 
@@ -98,18 +129,7 @@ def post_to_instagram(video_path, caption="Generated automatically ✨"):
 
     # Step 3: Poll IG processing status
     print("⏳ Waiting for Instagram to process video...")
-    while True:
-        status = check_media_status(creation_id)
-        st = status.get("status", "")
-
-        if "Finished" in st:
-            print("✔ Processing complete!")
-            break
-
-        if "Error" in st:
-            raise Exception(f"❌ Instagram processing error: {st}")
-
-        time.sleep(3)
+    wait_for_media(creation_id)
 
     # Step 4: Publish to Instagram
     post_id = publish_video(creation_id)
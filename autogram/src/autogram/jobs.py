@@ -0,0 +1,216 @@
+"""Durable job queue for the `autogram serve` daemon.
+
+Jobs live in one SQLite table under the cache directory, so they survive
+restarts and can be submitted by any process (the CLI writes straight to
+the database; the daemon's HTTP endpoint does the same). Workers claim the
+highest-priority job whose `run_at` has passed inside a BEGIN IMMEDIATE
+transaction, so two workers never get the same job, and hold a lease on it
+that the daemon keeps renewing. A job whose lease runs out (its daemon was
+killed) is claimed again by the next free worker.
+
+A failed job goes back to the queue with exponential backoff until it has
+used AUTOGRAM_JOB_ATTEMPTS attempts (default 3); then it is marked failed.
+The same limit applies to jobs whose lease ran out, so a job that keeps
+killing its daemon is not re-run forever. A worker whose lease was taken
+over cannot record a result for the job any more (LeaseLost).
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+from autogram.cache import cache_dir
+
+
+KINDS = ("topic", "publish")
+STATES = ("queued", "running", "done", "failed", "cancelled")
+MAX_ATTEMPTS = int(os.environ.get("AUTOGRAM_JOB_ATTEMPTS", 3))
+RETRY_DELAY = 30.0
+RETRY_DELAY_MAX = 3600.0
+LEASE_SECONDS = 120.0
+
+
+@dataclass
+class Job:
+    id: int
+    kind: str
+    payload: dict
+    priority: int
+    state: str
+    attempts: int
+    max_attempts: int
+    run_at: float
+    created: float
+    started: Optional[float]
+    finished: Optional[float]
+    run_id: Optional[str]
+    result: Any
+    error: Optional[str]
+    worker: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return dict(self.__dict__)
+
+
+_COLUMNS = ("id, kind, payload, priority, state, attempts, max_attempts, run_at, created, started, finished, "
+            "run_id, result, error, worker")
+
+
+class LeaseLost(RuntimeError):
+    """The job's lease expired and another worker claimed it."""
+
+
+def _job(row) -> Job:
+    values = list(row)
+    values[2] = json.loads(values[2])
+    values[12] = json.loads(values[12]) if values[12] is not None else None
+    return Job(*values)
+
+
+class JobQueue:
+    """Jobs shared by every thread and process through one SQLite file."""
+
+    def __init__(self, path: Optional[str | os.PathLike] = None):
+        self.path = Path(path) if path else cache_dir() / "jobs.sqlite3"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "state TEXT NOT NULL, attempts INTEGER NOT NULL, max_attempts INTEGER NOT NULL, run_at REAL NOT NULL, "
+            "created REAL NOT NULL, started REAL, finished REAL, run_id TEXT, result TEXT, error TEXT, "
+            "worker TEXT, lease_until REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (state, priority, run_at)")
+
+    def _write(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def submit(self, kind: str, payload: dict, priority: int = 0, run_at: Optional[float] = None,
+               max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Queue a job; higher `priority` runs first, and not before `run_at` (epoch seconds)."""
+        if kind not in KINDS:
+            raise ValueError(f"unknown job kind {kind!r} (expected one of {', '.join(KINDS)})")
+        now = time.time()
+        cursor = self._write(
+            "INSERT INTO jobs (kind, payload, priority, state, attempts, max_attempts, run_at, created) "
+            "VALUES (?, ?, ?, 'queued', 0, ?, ?, ?)",
+            (kind, json.dumps(payload), int(priority), int(max_attempts), run_at or now, now),
+        )
+        return cursor.lastrowid
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS) -> Optional[Job]:
+        """Take the next ready job (or one whose lease expired), or None if there is none."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                # The daemon running these died mid-job (OOM, crash) on their last allowed attempt.
+                self._conn.execute(
+                    "UPDATE jobs SET state = 'failed', finished = ?, lease_until = NULL, "
+                    "error = 'worker stopped responding on attempt ' || attempts || "
+                    "COALESCE(' (last error: ' || error || ')', '') "
+                    "WHERE state = 'running' AND lease_until < ? AND attempts >= max_attempts",
+                    (now, now),
+                )
+                row = self._conn.execute(
+                    f"SELECT {_COLUMNS} FROM jobs "
+                    "WHERE (state = 'queued' AND run_at <= ?) OR (state = 'running' AND lease_until < ?) "
+                    "ORDER BY priority DESC, run_at, id LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET state = 'running', attempts = attempts + 1, started = ?, worker = ?, "
+                        "lease_until = ? WHERE id = ?",
+                        (now, worker, now + lease, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = _job(row)
+        job.state, job.attempts, job.started, job.worker = "running", job.attempts + 1, now, worker
+        return job
+
+    def renew(self, worker: str, lease: float = LEASE_SECONDS) -> None:
+        """Extend the lease on every job the workers of daemon `worker` are running."""
+        self._write(
+            "UPDATE jobs SET lease_until = ? WHERE state = 'running' AND instr(worker, ?) = 1",
+            (time.time() + lease, worker + "/"),
+        )
+
+    def set_run_id(self, job_id: int, run_id: str) -> None:
+        self._write("UPDATE jobs SET run_id = ? WHERE id = ?", (run_id, job_id))
+
+    def _finish(self, job: Job, sql: str, params: tuple) -> None:
+        """Run an UPDATE on a job this worker still owns, or raise LeaseLost."""
+        cursor = self._write(sql + " WHERE id = ? AND state = 'running' AND worker = ?", params + (job.id, job.worker))
+        if cursor.rowcount == 0:
+            raise LeaseLost(f"job {job.id} is no longer held by {job.worker}")
+
+    def complete(self, job: Job, result: Any = None) -> None:
+        self._finish(job, "UPDATE jobs SET state = 'done', finished = ?, result = ?, error = NULL, lease_until = NULL",
+                     (time.time(), json.dumps(result, default=str)))
+
+    def fail(self, job: Job, error: str, retry: bool = True) -> Optional[float]:
+        """Record a failed attempt; return the retry delay, or None if the job will not be retried."""
+        if not retry or job.attempts >= job.max_attempts:
+            self._finish(job, "UPDATE jobs SET state = 'failed', finished = ?, error = ?, lease_until = NULL",
+                         (time.time(), error))
+            return None
+        delay = min(RETRY_DELAY * 2 ** (job.attempts - 1), RETRY_DELAY_MAX)
+        self._finish(job, "UPDATE jobs SET state = 'queued', run_at = ?, error = ?, lease_until = NULL",
+                     (time.time() + delay, error))
+        return delay
+
+    def release(self, job_id: int) -> None:
+        """Put a running job back at the front of the queue without using up an attempt."""
+        self._write(
+            "UPDATE jobs SET state = 'queued', attempts = MAX(attempts - 1, 0), run_at = ?, lease_until = NULL "
+            "WHERE id = ? AND state = 'running'",
+            (time.time(), job_id),
+        )
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancel a job that has not started yet."""
+        cursor = self._write("UPDATE jobs SET state = 'cancelled', finished = ? WHERE id = ? AND state = 'queued'",
+                             (time.time(), job_id))
+        return cursor.rowcount > 0
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def list(self, state: Optional[str] = None, limit: int = 50) -> list[Job]:
+        """Most recent jobs first, optionally only those in `state`."""
+        sql = f"SELECT {_COLUMNS} FROM jobs"
+        params: tuple = ()
+        if state:
+            sql += " WHERE state = ?"
+            params = (state,)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY id DESC LIMIT ?", params + (limit,)).fetchall()
+        return [_job(row) for row in rows]
+
+    def counts(self) -> dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: 0 for state in STATES} | dict(rows)
+
+    def next_run_at(self) -> Optional[float]:
+        """When the earliest queued job becomes ready."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(run_at) FROM jobs WHERE state = 'queued'").fetchone()
+        return row[0]
@@ -5,8 +5,8 @@ from datetime import datetime
 import os
 import sys
 
-from autogram.crew import Autogram
-from autogram.instagram_utils import post_to_instagram
+# The crew and Instagram modules are imported inside the commands that need
+# them, so subcommands and --help don't pay for crewAI/SDK import time.
 
 warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 
@@ -19,12 +19,32 @@ load_dotenv()
 # interpolate any tasks and agents information
 
 def run():
+    # Subcommands such as `autogram campaign topics.txt` share the `autogram` entry point.
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        return COMMANDS[sys.argv[1]](sys.argv[2:])
+
+    import argparse
+
+    from autogram.checkpoints import RunDir, file_digest
+    from autogram.instagram_utils import post_to_instagram
+
+    from autogram import tracing
+
+    parser = argparse.ArgumentParser(prog="autogram")
+    parser.add_argument("--resume", metavar="RUN_ID", help="reuse the finished stages of an earlier run")
+    args, _ = parser.parse_known_args(sys.argv[1:])
+
     inputs = {
         'current_year': str(datetime.now().year)
     }
+    run_dir = RunDir.open(args.resume, command="run", inputs=inputs)
+    tracing.set_run(run_dir.run_id)
 
-    try:
-        result = Autogram().crew().kickoff(inputs=inputs)
+    def kickoff():
+        from autogram.crew import Autogram
+
+        with tracing.span("crew.kickoff"):
+            result = Autogram().crew().kickoff(inputs=inputs)
 
         print("\n=== RAW CREW OUTPUT OBJECT ===")
         print(result)
@@ -33,13 +53,19 @@ def run():
 
         # ✓ Correct extraction of text from CrewOutput
         if hasattr(result, "final_output"):
-            output_text = result.final_output
+            return result.final_output
         elif hasattr(result, "raw_output"):
-            output_text = result.raw_output
+            return result.raw_output
         elif hasattr(result, "output"):
-            output_text = result.output
-        else:
-            output_text = str(result)
+            return result.output
+        return str(result)
+
+    # Editing the agent or task config invalidates the checkpoint.
+    config_dir = os.path.join(os.path.dirname(__file__), "config")
+    config = {name: file_digest(os.path.join(config_dir, name)) for name in ("agents.yaml", "tasks.yaml")}
+
+    try:
+        output_text = run_dir.stage("kickoff", {"inputs": inputs, "config": config}, kickoff)
 
         print("\n=== EXTRACTED OUTPUT TEXT ===")
         print(output_text)
@@ -58,25 +84,37 @@ def run():
             caption = "Neuroscience Facts"
             print(f"🎬 Detected video: {video_path}")
 
-            post_to_instagram(video_path, caption)
+            run_dir.stage(
+                "publish",
+                {"video": file_digest(video_path) or video_path, "caption": caption},
+                lambda: post_to_instagram(video_path, caption),
+            )
             return
 
         print("⚠️ No video was posted — MP4 not found in CrewOutput.")
 
     except Exception as e:
-        raise Exception(f"Error while running crew: {e}")
+        raise Exception(f"Error while running crew (resume with --resume {run_dir.run_id}): {e}")
 
 
 def train():
     """
     Train the crew for a given number of iterations.
+
+    With AUTOGRAM_CASSETTE set, outbound calls are recorded once and replayed
+    on later runs (see autogram.cassette).
     """
+    from autogram import cassette
+
     inputs = {
         "topic": "AI LLMs",
         'current_year': str(datetime.now().year)
     }
     try:
-        Autogram().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        # Installed before the crew is built, so its clients are taped from the first request.
+        with cassette.from_env("train"):
+            from autogram.crew import Autogram
+            Autogram().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -85,6 +123,8 @@ def replay():
     """
     Replay the crew execution from a specific task.
     """
+    from autogram.crew import Autogram
+
     try:
         Autogram().crew().replay(task_id=sys.argv[1])
 
@@ -94,17 +134,72 @@ def replay():
 def test():
     """
     Test the crew execution and returns the results.
+
+    Honours AUTOGRAM_CASSETTE like train().
     """
+    from autogram import cassette
+
     inputs = {
         "topic": "AI LLMs",
         "current_year": str(datetime.now().year)
     }
     
     try:
-        Autogram().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
+        with cassette.from_env("test"):
+            from autogram.crew import Autogram
+            Autogram().crew().test(n_iterations=int(sys.argv[1]), eval_llm=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while testing the crew: {e}")
 
+def campaign(argv=None):
+    """
+    Run many topics through the pipelined collect -> render -> publish stages.
+    """
+    from autogram.campaign import main as campaign_main
+    return campaign_main(sys.argv[1:] if argv is None else argv)
+
+
+def stats(argv=None):
+    """
+    Print p50/p95/p99 latency per stage from a trace file (see autogram.tracing).
+    """
+    from autogram.tracing import main as stats_main
+    return stats_main(sys.argv[1:] if argv is None else argv)
+
+
+def serve(argv=None):
+    """
+    Run the job-queue daemon with a pool of warm workers (see autogram.serve).
+    """
+    from autogram.serve import serve_main
+    return serve_main(sys.argv[1:] if argv is None else argv)
+
+
+def submit(argv=None):
+    """
+    Queue topic or publish jobs for `autogram serve`.
+    """
+    from autogram.serve import submit_main
+    return submit_main(sys.argv[1:] if argv is None else argv)
+
+
+def jobs(argv=None):
+    """
+    List or cancel queued jobs.
+    """
+    from autogram.serve import jobs_main
+    return jobs_main(sys.argv[1:] if argv is None else argv)
+
+
+COMMANDS = {
+    "campaign": campaign,
+    "stats": stats,
+    "serve": serve,
+    "submit": submit,
+    "jobs": jobs,
+}
+
+
 if __name__ == "__main__":
       run()
\ No newline at end of file
@@ -0,0 +1,526 @@
+"""Pure-Python MP4 rewriting: faststart and lossless concatenation.
+
+Veo returns MP4s with `moov` (the index) after `mdat` (the samples), so a
+server must read the whole file before it can start processing it.
+`faststart()` maps the file with mmap, copies only the `moov` box into
+memory, adds the size shift to every `stco`/`co64` chunk offset (promoting
+`stco` to `co64` if an offset would overflow 32 bits) and writes the new
+file in one streaming pass, copying the sample data straight from the map.
+
+`concat()` joins clips that share an encoding (e.g. the scenes of one
+segmented render) end to end: the sample tables of each track are appended
+to one another with sample, chunk and byte offsets rebased, and the media
+data of every clip is copied into a single `mdat` behind the new `moov`.
+Each track gets an edit list that keeps every clip's own edits (e.g. the
+audio priming offset) and pads a track that ends early in a clip with an
+empty edit, so all tracks of the next clip start together. Nothing is decoded or re-encoded in either case, and
+memory use does not grow with the file size.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from autogram.tracing import span
+
+
+# Boxes whose payload is a list of child boxes, on the path to stco/co64.
+CONTAINERS = frozenset({b"moov", b"trak", b"mdia", b"minf", b"stbl", b"edts", b"dinf", b"mvex", b"udta"})
+COPY_BLOCK = 8 * 1024 * 1024
+
+
+class MP4Error(ValueError):
+    """The file is not an MP4 this module can rewrite."""
+
+
+@dataclass
+class Box:
+    type: bytes
+    offset: int
+    size: int
+    header: int
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.size
+
+    @property
+    def body(self) -> int:
+        return self.offset + self.header
+
+
+def iter_boxes(buf, start: int = 0, end: Optional[int] = None) -> Iterator[Box]:
+    """Yield the boxes laid out back to back in buf[start:end]."""
+    end = len(buf) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                raise MP4Error(f"truncated 64-bit box header at {offset}")
+            size = struct.unpack_from(">Q", buf, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise MP4Error(f"bad size {size} for box {kind!r} at {offset}")
+        yield Box(kind, offset, size, header)
+        offset += size
+
+
+def top_level_boxes(buf) -> list[Box]:
+    return list(iter_boxes(buf))
+
+
+def _map(f, path: str) -> mmap.mmap:
+    """Read-only map of the open file `f`; mmap refuses empty files, which are reported as MP4Error."""
+    if os.fstat(f.fileno()).st_size == 0:
+        raise MP4Error(f"{path}: empty file")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def is_faststart(path: str) -> bool:
+    """True if `moov` already comes before the first `mdat`."""
+    with open(path, "rb") as f, _map(f, path) as mm:
+        for box in iter_boxes(mm):
+            if box.type == b"moov":
+                return True
+            if box.type == b"mdat":
+                return False
+    raise MP4Error(f"{path}: no moov or mdat box")
+
+
+def _chunk_offset_tables(moov: bytearray) -> Iterator[Box]:
+    """Yield every stco/co64 box inside `moov` (offsets relative to `moov`)."""
+    def walk(start: int, end: int):
+        for box in iter_boxes(moov, start, end):
+            if box.type in (b"stco", b"co64"):
+                yield box
+            elif box.type in CONTAINERS:
+                yield from walk(box.body, box.end)
+
+    top = next(iter_boxes(moov))
+    yield from walk(top.body, top.end)
+
+
+def _set_size(buf: bytearray, box_offset: int, delta: int) -> None:
+    size = struct.unpack_from(">I", buf, box_offset)[0]
+    if size == 1:
+        struct.pack_into(">Q", buf, box_offset + 8, struct.unpack_from(">Q", buf, box_offset + 8)[0] + delta)
+    else:
+        struct.pack_into(">I", buf, box_offset, size + delta)
+
+
+def _promote_stco(moov: bytearray) -> bytearray:
+    """Rewrite every 32-bit stco table as a co64 table, fixing the enclosing box sizes."""
+    while True:
+        table = next((box for box in _chunk_offset_tables(moov) if box.type == b"stco"), None)
+        if table is None:
+            return moov
+        count = struct.unpack_from(">I", moov, table.body + 4)[0]
+        offsets = struct.unpack_from(f">{count}I", moov, table.body + 8)
+        body = moov[table.body:table.body + 8] + struct.pack(f">{count}Q", *offsets)
+        new = struct.pack(">I4s", 8 + len(body), b"co64") + body
+        growth = len(new) - table.size
+
+        # Every box enclosing the table grows by the same amount.
+        parents, start, end = [], 0, len(moov)
+        while True:
+            parent = next(b for b in iter_boxes(moov, start, end) if b.offset <= table.offset < b.end)
+            if parent.offset == table.offset:
+                break
+            parents.append(parent.offset)
+            start, end = parent.body, parent.end
+        moov = moov[:table.offset] + new + moov[table.end:]
+        for offset in parents:
+            _set_size(moov, offset, growth)
+
+
+def _shift_offsets(moov: bytearray, shift) -> None:
+    for table in _chunk_offset_tables(moov):
+        count = struct.unpack_from(">I", moov, table.body + 4)[0]
+        fmt = f">{count}{'I' if table.type == b'stco' else 'Q'}"
+        offsets = struct.unpack_from(fmt, moov, table.body + 8)
+        struct.pack_into(fmt, moov, table.body + 8, *(shift(o) for o in offsets))
+
+
+def faststart(src: str, dest: Optional[str] = None) -> bool:
+    """Rewrite `src` (in place, or to `dest`) with `moov` ahead of `mdat`.
+
+    Returns False, leaving the file untouched, if it was already faststart.
+    """
+    dest = dest or src
+    with open(src, "rb") as f, _map(f, src) as mm:
+        boxes = top_level_boxes(mm)
+        moov = next((b for b in boxes if b.type == b"moov"), None)
+        first_mdat = next((b for b in boxes if b.type == b"mdat"), None)
+        if moov is None or first_mdat is None:
+            raise MP4Error(f"{src}: no moov or mdat box")
+        if moov.offset < first_mdat.offset:
+            return False
+        if any(b.type == b"moof" for b in boxes):
+            raise MP4Error(f"{src}: fragmented MP4 is not supported")
+
+        new_moov = bytearray(mm[moov.offset:moov.end])
+        insert_at = first_mdat.offset
+
+        def shift_by(size):
+            def shift(offset):
+                if offset < insert_at:
+                    return offset
+                # Data between the insertion point and the old moov moves down by the new moov;
+                # anything after the old moov also loses the old copy.
+                return offset + size if offset < moov.offset else offset + size - moov.size
+            return shift
+
+        if max((o for o in _all_offsets(new_moov)), default=0) + len(new_moov) > 0xFFFFFFFF:
+            new_moov = _promote_stco(new_moov)
+        _shift_offsets(new_moov, shift_by(len(new_moov)))
+
+        tmp = dest + ".part"
+        with open(tmp, "wb") as out:
+            view = memoryview(mm)
+            try:
+                _copy(view, out, 0, insert_at)
+                out.write(new_moov)
+                _copy(view, out, insert_at, moov.offset)
+                _copy(view, out, moov.end, len(mm))
+            finally:
+                view.release()
+    os.replace(tmp, dest)
+    return True
+
+
+def _all_offsets(moov: bytearray) -> Iterator[int]:
+    for table in _chunk_offset_tables(moov):
+        count = struct.unpack_from(">I", moov, table.body + 4)[0]
+        yield from struct.unpack_from(f">{count}{'I' if table.type == b'stco' else 'Q'}", moov, table.body + 8)
+
+
+def _copy(view: memoryview, out, start: int, end: int) -> None:
+    for offset in range(start, end, COPY_BLOCK):
+        out.write(view[offset:min(offset + COPY_BLOCK, end)])
+
+
+# Offsets of the duration field in a full box's body, for box versions 0 and 1.
+_DURATION_FIELD = {b"mvhd": (16, 24), b"tkhd": (20, 28), b"mdhd": (16, 24)}
+# Offsets of the timescale field in mvhd/mdhd, for versions 0 and 1.
+_TIMESCALE_FIELD = (12, 20)
+
+
+@dataclass
+class _Track:
+    handler: bytes
+    timescale: int
+    stsd: bytes
+    stts: list[tuple[int, int]]
+    ctts: Optional[list[tuple[int, int]]]
+    ctts_version: int
+    stsc: list[tuple[int, int, int]]
+    sizes: list[int]
+    offsets: list[int]
+    stss: Optional[list[int]]
+    # (segment duration in movie timescale, media time or -1 for empty, rate integer, rate fraction)
+    edits: Optional[list[tuple[int, int, int, int]]]
+
+    @property
+    def media_duration(self) -> int:
+        return sum(count * delta for count, delta in self.stts)
+
+
+def _child(buf, parent: Box, kind: bytes) -> Box:
+    box = next((b for b in iter_boxes(buf, parent.body, parent.end) if b.type == kind), None)
+    if box is None:
+        raise MP4Error(f"no {kind.decode()} box inside {parent.type.decode()}")
+    return box
+
+
+def _field(buf, box: Box, offsets: tuple[int, int]) -> int:
+    if buf[box.body] == 1:
+        return struct.unpack_from(">Q", buf, box.body + offsets[1])[0]
+    return struct.unpack_from(">I", buf, box.body + offsets[0])[0]
+
+
+def _entries(buf, box: Box, fmt: str, skip: int = 0) -> list[tuple]:
+    """Entries of a full box laid out as version/flags, [skip bytes,] count, then `count` x `fmt`."""
+    start = box.body + 4 + skip
+    count = struct.unpack_from(">I", buf, start)[0]
+    size = struct.calcsize(">" + fmt)
+    return list(struct.iter_unpack(">" + fmt, bytes(buf[start + 4:start + 4 + count * size])))
+
+
+def _edit_list(buf, trak: Box) -> Optional[list[tuple]]:
+    edts = next((b for b in iter_boxes(buf, trak.body, trak.end) if b.type == b"edts"), None)
+    elst = edts and next((b for b in iter_boxes(buf, edts.body, edts.end) if b.type == b"elst"), None)
+    if not elst:
+        return None
+    return _entries(buf, elst, "Qqhh" if buf[elst.body] == 1 else "Iihh")
+
+
+def _read_track(buf, trak: Box) -> _Track:
+    mdia = _child(buf, trak, b"mdia")
+    mdhd = _child(buf, mdia, b"mdhd")
+    stbl = _child(buf, _child(buf, mdia, b"minf"), b"stbl")
+    tables = {box.type: box for box in iter_boxes(buf, stbl.body, stbl.end)}
+    if b"stz2" in tables:
+        raise MP4Error("compact sample sizes (stz2) are not supported")
+
+    uniform, count = struct.unpack_from(">II", buf, tables[b"stsz"].body + 4)
+    sizes = [uniform] * count if uniform else list(struct.unpack_from(f">{count}I", buf, tables[b"stsz"].body + 12))
+    chunk_table = tables.get(b"co64") or tables.get(b"stco")
+    if chunk_table is None:
+        raise MP4Error("track has no chunk offset table")
+    ctts = tables.get(b"ctts")
+    ctts_version = buf[ctts.body] if ctts else 0
+    hdlr = _child(buf, mdia, b"hdlr")
+    return _Track(
+        handler=bytes(buf[hdlr.body + 8:hdlr.body + 12]),
+        timescale=_field(buf, mdhd, _TIMESCALE_FIELD),
+        stsd=bytes(buf[tables[b"stsd"].offset:tables[b"stsd"].end]),
+        stts=_entries(buf, tables[b"stts"], "II"),
+        ctts=_entries(buf, ctts, "Ii" if ctts_version else "II") if ctts else None,
+        ctts_version=ctts_version,
+        stsc=_entries(buf, tables[b"stsc"], "III"),
+        sizes=sizes,
+        offsets=[o for (o,) in _entries(buf, chunk_table, "Q" if chunk_table.type == b"co64" else "I")],
+        stss=[n for (n,) in _entries(buf, tables[b"stss"], "I")] if b"stss" in tables else None,
+        edits=_edit_list(buf, trak),
+    )
+
+
+def _make_box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _make_table(kind: bytes, fmt: str, entries: list, version: int = 0, prefix: bytes = b"") -> bytes:
+    flat = [value for entry in entries for value in entry]
+    return _make_box(kind, struct.pack(">I", version << 24) + prefix
+                     + struct.pack(f">I{fmt * len(entries)}", len(entries), *flat))
+
+
+def _with_field(buf, box: Box, offsets: tuple[int, int], value: int) -> bytes:
+    data = bytearray(buf[box.offset:box.end])
+    if buf[box.body] == 1:
+        struct.pack_into(">Q", data, box.header + offsets[1], value)
+    elif value > 0xFFFFFFFF:
+        raise MP4Error(f"{box.type.decode()} duration does not fit a version 0 box")
+    else:
+        struct.pack_into(">I", data, box.header + offsets[0], value)
+    return bytes(data)
+
+
+def _rebuild(buf, start: int, end: int, replace) -> bytes:
+    """Re-serialize buf[start:end], substituting replace(box) wherever it is not None."""
+    parts = []
+    for box in iter_boxes(buf, start, end):
+        new = replace(box)
+        if new is None:
+            if box.type in CONTAINERS:
+                new = _make_box(box.type, _rebuild(buf, box.body, box.end, replace))
+            else:
+                new = bytes(buf[box.offset:box.end])
+        parts.append(new)
+    return b"".join(parts)
+
+
+def _merged_stbl(tracks: list[_Track], offset_maps: list, wide: bool) -> bytes:
+    """One sample table covering `tracks` (the same track of every clip) in order."""
+    stts, ctts, stsc, sizes, offsets, stss = [], [], [], [], [], []
+    has_ctts = any(t.ctts is not None for t in tracks)
+    has_stss = any(t.stss is not None for t in tracks)
+    samples = chunks = 0
+    for track, offset_map in zip(tracks, offset_maps):
+        stts += track.stts
+        if has_ctts:
+            ctts += track.ctts if track.ctts is not None else [(len(track.sizes), 0)]
+        stsc += [(first + chunks, per_chunk, description) for first, per_chunk, description in track.stsc]
+        sizes += track.sizes
+        offsets += [offset_map(o) for o in track.offsets]
+        if has_stss:
+            numbers = track.stss if track.stss is not None else range(1, len(track.sizes) + 1)
+            stss += [n + samples for n in numbers]
+        samples += len(track.sizes)
+        chunks += len(track.offsets)
+
+    uniform = sizes[0] if sizes and all(size == sizes[0] for size in sizes) else 0
+    parts = [tracks[0].stsd, _make_table(b"stts", "II", stts)]
+    if has_ctts:
+        version = max(t.ctts_version for t in tracks)
+        parts.append(_make_table(b"ctts", "Ii" if version else "II", ctts, version))
+    if has_stss:
+        parts.append(_make_table(b"stss", "I", [(n,) for n in stss]))
+    parts.append(_make_table(b"stsc", "III", stsc))
+    if uniform:
+        parts.append(_make_box(b"stsz", struct.pack(">III", 0, uniform, len(sizes))))
+    else:
+        parts.append(_make_table(b"stsz", "I", [(size,) for size in sizes], prefix=struct.pack(">I", 0)))
+    parts.append(_make_table(b"co64" if wide else b"stco", "Q" if wide else "I", [(o,) for o in offsets]))
+    return _make_box(b"stbl", b"".join(parts))
+
+
+def _joined_edits(clips: list[tuple[list[_Track], int]], movie_timescale: int) -> tuple[list[list[tuple]], int]:
+    """Edit list of every joined track, and the joined movie duration, from (tracks, movie timescale) per clip.
+
+    Each clip's edits (an implicit single edit if it has none) are carried
+    over with their media times moved past the earlier clips' samples, and
+    scaled to the first clip's movie timescale. Every track is then padded
+    with an empty edit to the clip's longest track, so a short audio track
+    or an edit-list offset in one clip does not shift the tracks of the next.
+    """
+    edits: list[list[tuple]] = [[] for _ in clips[0][0]]
+    media_base = [0] * len(edits)
+    total = 0
+    for tracks, timescale in clips:
+        shown = []
+        for track in tracks:
+            entries = track.edits
+            if entries is None:
+                entries = [(round(track.media_duration * timescale / track.timescale), 0, 1, 0)]
+            shown.append([(round(duration * movie_timescale / timescale), media_time, rate, fraction)
+                          for duration, media_time, rate, fraction in entries])
+        length = max(sum(entry[0] for entry in entries) for entries in shown)
+        for index, (track, entries) in enumerate(zip(tracks, shown)):
+            moved = [(duration, media_time + media_base[index] if media_time >= 0 else -1, rate, fraction)
+                     for duration, media_time, rate, fraction in entries]
+            gap = length - sum(entry[0] for entry in entries)
+            if gap > 0:
+                moved.append((gap, -1, 1, 0))
+            edits[index] += moved
+            media_base[index] += track.media_duration
+        total += length
+    return edits, total
+
+
+def _elst(entries: list[tuple]) -> bytes:
+    wide = any(duration > 0xFFFFFFFF or media_time > 0x7FFFFFFF for duration, media_time, _, _ in entries)
+    return _make_table(b"elst", "Qqhh" if wide else "Iihh", entries, version=1 if wide else 0)
+
+
+def concat(paths: list[str], dest: str) -> None:
+    """Join the MP4 clips at `paths`, in order, into one faststart file at `dest`.
+
+    Every clip must have the same tracks with identical sample descriptions
+    (codec settings) and timescales; otherwise MP4Error is raised, since
+    joining them would need a re-encode. Clips whose tracks differ in
+    length are padded to their longest track (see `_joined_edits`).
+    """
+    if not paths:
+        raise MP4Error("nothing to join")
+    with ExitStack() as stack:
+        maps = []
+        for path in paths:
+            f = stack.enter_context(open(path, "rb"))
+            maps.append(stack.enter_context(_map(f, path)))
+
+        clips = []
+        for path, mm in zip(paths, maps):
+            boxes = top_level_boxes(mm)
+            moov = next((b for b in boxes if b.type == b"moov"), None)
+            if moov is None:
+                raise MP4Error(f"{path}: no moov box")
+            if any(b.type == b"moof" for b in boxes):
+                raise MP4Error(f"{path}: fragmented MP4 is not supported")
+            traks = [b for b in iter_boxes(mm, moov.body, moov.end) if b.type == b"trak"]
+            timescale = _field(mm, _child(mm, moov, b"mvhd"), _TIMESCALE_FIELD)
+            clips.append((boxes, moov, [_read_track(mm, trak) for trak in traks], timescale))
+
+        first_boxes, first_moov, first_tracks, movie_timescale = clips[0]
+        for path, (_, _, tracks, _) in zip(paths[1:], clips[1:]):
+            if [(t.handler, t.timescale, t.stsd) for t in tracks] != \
+                    [(t.handler, t.timescale, t.stsd) for t in first_tracks]:
+                raise MP4Error(f"{path}: tracks or encoding differ from {paths[0]}; cannot join without re-encoding")
+
+        # Where each clip's mdat payloads land inside the joined mdat.
+        layout, data_size = [], 0
+        for boxes, _, _, _ in clips:
+            spans = []
+            for box in boxes:
+                if box.type == b"mdat":
+                    spans.append((box.body, box.end, data_size))
+                    data_size += box.end - box.body
+            layout.append(spans)
+
+        def offset_map(clip: int, base: int):
+            def remap(offset: int) -> int:
+                for start, end, at in layout[clip]:
+                    if start <= offset < end:
+                        return base + at + offset - start
+                raise MP4Error(f"{paths[clip]}: chunk offset {offset} is outside the media data")
+            return remap
+
+        ftyp = next((bytes(maps[0][b.offset:b.end]) for b in first_boxes if b.type == b"ftyp"), b"")
+        media_durations = [sum(clip[2][index].media_duration for clip in clips) for index in range(len(first_tracks))]
+        edits, movie_duration = _joined_edits([(clip[2], clip[3]) for clip in clips], movie_timescale)
+        edts = [_make_box(b"edts", _elst(entries)) for entries in edits]
+
+        def build_moov(base: int, wide: bool) -> bytes:
+            buf = maps[0]
+            track_index = iter(range(len(first_tracks)))
+
+            def replace(box: Box) -> Optional[bytes]:
+                if box.type == b"mvhd":
+                    return _with_field(buf, box, _DURATION_FIELD[b"mvhd"], movie_duration)
+                if box.type != b"trak":
+                    return None
+                index = next(track_index)
+
+                def replace_in_track(inner: Box) -> Optional[bytes]:
+                    if inner.type == b"edts":
+                        return b""
+                    if inner.type == b"tkhd":
+                        # The joined edit list goes right after tkhd, replacing the first clip's.
+                        return _with_field(buf, inner, _DURATION_FIELD[b"tkhd"], movie_duration) + edts[index]
+                    if inner.type == b"mdhd":
+                        return _with_field(buf, inner, _DURATION_FIELD[b"mdhd"], media_durations[index])
+                    if inner.type == b"stbl":
+                        return _merged_stbl([clip[2][index] for clip in clips],
+                                            [offset_map(n, base) for n in range(len(clips))], wide)
+                    return None
+
+                return _make_box(b"trak", _rebuild(buf, box.body, box.end, replace_in_track))
+
+            return _make_box(b"moov", _rebuild(buf, first_moov.body, first_moov.end, replace))
+
+        wide = len(ftyp) + len(build_moov(0, True)) + 16 + data_size > 0xFFFFFFFF
+        mdat_header = (struct.pack(">I4sQ", 1, b"mdat", 16 + data_size) if wide
+                       else struct.pack(">I4s", 8 + data_size, b"mdat"))
+        size = len(build_moov(0, wide))
+        moov = build_moov(len(ftyp) + size + len(mdat_header), wide)
+
+        tmp = dest + ".part"
+        with open(tmp, "wb") as out:
+            out.write(ftyp)
+            out.write(moov)
+            out.write(mdat_header)
+            for mm, spans in zip(maps, layout):
+                view = memoryview(mm)
+                try:
+                    for start, end, _ in spans:
+                        _copy(view, out, start, end)
+                finally:
+                    view.release()
+    os.replace(tmp, dest)
+
+
+def ensure_faststart(path: str) -> bool:
+    """Faststart `path` in place unless MP4_FASTSTART=false; problems are reported, not raised.
+
+    Returns True if the file was rewritten.
+    """
+    if os.environ.get("MP4_FASTSTART", "true").lower() not in ("1", "true", "yes"):
+        return False
+    try:
+        with span("mp4.faststart") as s:
+            moved = faststart(path)
+            s.set(moved=moved)
+    except (MP4Error, OSError) as e:
+        print(f"[mp4] faststart skipped for {path}: {e}")
+        return False
+    if moved:
+        print(f"[mp4] moved moov to the front of {path}")
+    return moved
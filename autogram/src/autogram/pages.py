@@ -0,0 +1,335 @@
+"""Fetch search result pages and pull out their main text.
+
+Pages are downloaded concurrently through the pooled "pages" session.
+Every download stops after PAGE_MAX_BYTES bytes (default 1 MiB) or
+PAGE_TIMEOUT seconds (default 10), and once enough text has been
+extracted. The timeout covers the whole fetch: connecting, waiting for
+the first byte, every redirect hop and every body read only get the time
+left, and a page that runs out of time while its body is arriving keeps
+the text extracted so far, marked truncated. HTML is decoded and fed to an incremental
+`HTMLParser` piece by piece as it arrives, so a page is never buffered whole.
+
+The extractor drops scripts, styles, navigation, headers, footers, asides,
+forms and elements whose class or id marks them as cookie banners, share
+bars, comments and the like, then splits what is left into blocks at
+block-level tags. Blocks that are mostly link text (menus, tag clouds) or
+only a few words long are dropped, and when the page has an <article> or
+<main> element only the blocks inside it are kept. At most PAGE_MAX_CHARS
+characters (default 4000) are returned per page.
+
+Extracted text is cached per URL in `.cache/pages.sqlite3` (PAGE_CACHE=false
+disables it, PAGE_CACHE_TTL sets the lifetime in seconds).
+"""
+from __future__ import annotations
+
+import codecs
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Iterator, Optional
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+from autogram.cache import SQLiteCache, cache_dir
+from autogram.http_pool import get_session
+from autogram.tracing import span
+
+
+PAGE_MAX_BYTES = int(os.environ.get("PAGE_MAX_BYTES", 1 << 20))
+PAGE_TIMEOUT = float(os.environ.get("PAGE_TIMEOUT", 10))
+PAGE_MAX_CHARS = int(os.environ.get("PAGE_MAX_CHARS", 4000))
+PAGE_WORKERS = int(os.environ.get("PAGE_WORKERS", 6))
+CHUNK_SIZE = 16 * 1024
+MAX_REDIRECTS = 5
+USER_AGENT = "Mozilla/5.0 (compatible; autogram/0.1; +https://crewai.com)"
+
+SKIP_TAGS = frozenset({"script", "style", "noscript", "template", "svg", "canvas", "iframe", "object",
+                       "nav", "header", "footer", "aside", "form", "button", "select", "dialog"})
+BLOCK_TAGS = frozenset({"p", "div", "section", "article", "main", "li", "ul", "ol", "dl", "dt", "dd",
+                        "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "tr", "td", "th",
+                        "figure", "figcaption", "br", "hr"})
+HEADINGS = frozenset({"h1", "h2", "h3", "h4", "h5", "h6"})
+MAIN_TAGS = frozenset({"article", "main"})
+# Page furniture that is not marked up as <nav>/<aside>, recognised by a whole part of a
+# class or id ("cookie-banner", "share_bar") on one of these container tags.
+_BOILERPLATE = re.compile(r"(?:^|[\s_-])(?:cookie|consent|banner|newsletter|subscribe|share|social|comments?|"
+                          r"related|sidebar|breadcrumbs?|menu|promo|advert|ads?|popup|modal|footer|masthead)"
+                          r"(?=$|[\s_-])")
+BOILERPLATE_TAGS = frozenset({"div", "section", "ul", "ol", "li", "span", "p", "figure", "table"})
+MIN_WORDS = 6
+MAX_LINK_DENSITY = 0.5
+# Text inside <article>/<main> shorter than this means the markup is a wrapper, not the content.
+MIN_MAIN_CHARS = 200
+
+
+class PageTextParser(HTMLParser):
+    """Incremental HTML-to-text extractor: feed() chunks as they arrive, then read `text`."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._title: list[str] = []
+        self._skip: list[list] = []  # [tag, nesting depth] of the element being skipped
+        self._main_depth = 0
+        self._link_depth = 0
+        self._in_title = False
+        self._parts: list[str] = []
+        self._link_chars = 0
+        self._heading = False
+        self._main_seen = False
+        # (text, inside <article>/<main>) per kept block, in document order.
+        self._blocks: list[tuple[str, bool]] = []
+        self._chars = [0, 0]
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip:
+            if tag == self._skip[-1][0]:
+                self._skip[-1][1] += 1
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        marker = " ".join(value or "" for name, value in attrs if name in ("class", "id", "role")).lower()
+        if tag in SKIP_TAGS or (tag in BOILERPLATE_TAGS and _BOILERPLATE.search(marker)):
+            self._flush()
+            self._skip.append([tag, 1])
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+            self._heading = tag in HEADINGS
+        if tag in MAIN_TAGS:
+            self._main_depth += 1
+            self._main_seen = True
+        elif tag == "a":
+            self._link_depth += 1
+
+    def handle_endtag(self, tag):
+        if self._skip:
+            if tag == self._skip[-1][0]:
+                self._skip[-1][1] -= 1
+                if not self._skip[-1][1]:
+                    self._skip.pop()
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag in MAIN_TAGS:
+            self._main_depth = max(0, self._main_depth - 1)
+        elif tag == "a":
+            self._link_depth = max(0, self._link_depth - 1)
+
+    def handle_data(self, data):
+        if self._skip:
+            return
+        if self._in_title:
+            self._title.append(data)
+            return
+        self._parts.append(data)
+        if self._link_depth:
+            self._link_chars += len(data.strip())
+
+    def _flush(self) -> None:
+        text = " ".join("".join(self._parts).split())
+        link_chars, heading = self._link_chars, self._heading
+        self._parts, self._link_chars, self._heading = [], 0, False
+        if not text or link_chars > MAX_LINK_DENSITY * len(text):
+            return
+        if len(text.split()) < MIN_WORDS and not heading:
+            return
+        in_main = self._main_depth > 0
+        self._blocks.append((text, in_main))
+        self._chars[in_main] += len(text)
+
+    def close(self) -> None:
+        super().close()
+        self._flush()
+
+    def _use_main(self) -> bool:
+        return self._chars[True] >= MIN_MAIN_CHARS
+
+    def enough(self, max_chars: int) -> bool:
+        """True once more text has been kept than will be returned."""
+        if self._use_main():
+            return self._chars[True] >= max_chars
+        # Without <article>/<main> so far, the content may still be ahead of us.
+        return not self._main_seen and self._chars[False] >= 2 * max_chars
+
+    @property
+    def title(self) -> str:
+        return " ".join("".join(self._title).split())
+
+    @property
+    def text(self) -> str:
+        main = self._use_main()
+        return "\n\n".join(text for text, in_main in self._blocks if in_main or not main)
+
+
+def html_text(html: str) -> str:
+    """Main-body text of a complete HTML document."""
+    parser = PageTextParser()
+    parser.feed(html)
+    parser.close()
+    return parser.text
+
+
+def clip(text: str, max_chars: int) -> str:
+    """`text` cut to at most `max_chars`, at a word boundary."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0].rstrip() + " …"
+
+
+@dataclass
+class Page:
+    url: str
+    title: str = ""
+    text: str = ""
+    bytes: int = 0
+    truncated: bool = False
+    error: Optional[str] = None
+
+
+def _charset(content_type: str) -> str:
+    match = re.search(r"charset=[\"']?([\w.:-]+)", content_type)
+    try:
+        return codecs.lookup(match.group(1)).name if match else "utf-8"
+    except LookupError:
+        return "utf-8"
+
+
+def _open(url: str, headers: dict, deadline: float) -> requests.Response:
+    """GET `url` for streaming, following redirects by hand so every hop only gets the time left."""
+    session = get_session("pages")
+    for _ in range(MAX_REDIRECTS + 1):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("no response within the page timeout")
+        resp = session.get(url, headers=headers, stream=True, timeout=(min(5.0, remaining), remaining),
+                           allow_redirects=False)
+        target = session.get_redirect_target(resp)
+        if target is None:
+            return resp
+        resp.close()
+        url = urljoin(resp.url, target)
+    raise requests.TooManyRedirects(f"more than {MAX_REDIRECTS} redirects")
+
+
+def _read_body(resp, deadline: float) -> Iterator[bytes]:
+    """Decoded body bytes of a streamed response as they arrive; raises TimeoutError at `deadline`.
+
+    Each socket read waits only for the time left, so a server that
+    trickles its response cannot hold the download past the deadline.
+    """
+    raw = resp.raw
+    if isinstance(raw, io.BytesIO) or not hasattr(raw, "read1"):
+        # Replayed responses (autogram.cassette) are already in memory; urllib3 < 2.3 has no read1().
+        yield from resp.iter_content(chunk_size=CHUNK_SIZE)
+        return
+    sock = getattr(getattr(raw, "connection", None), "sock", None)
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError
+        if sock is not None:
+            sock.settimeout(remaining)
+        try:
+            chunk = raw.read1(CHUNK_SIZE, decode_content=True)
+        except ReadTimeoutError:
+            raise TimeoutError from None
+        if not chunk:
+            return
+        yield chunk
+
+
+def fetch_page(url: str, max_bytes: int = PAGE_MAX_BYTES, timeout: float = PAGE_TIMEOUT,
+               max_chars: int = PAGE_MAX_CHARS) -> Page:
+    """Download `url` and extract its main text; failures are reported in `Page.error`."""
+    cache = get_page_cache()
+    cache_key = f"{max_chars}:{url}"
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return Page(url, cached["title"], cached["text"])
+
+    page = Page(url)
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    with span("collector.page", host=urlsplit(url).hostname) as s:
+        try:
+            headers = {"User-Agent": USER_AGENT, "Accept": "text/html,application/xhtml+xml,text/plain;q=0.8"}
+            with _open(url, headers, deadline) as resp:
+                resp.raise_for_status()
+                content_type = resp.headers.get("Content-Type", "text/html").lower()
+                if "html" not in content_type and not content_type.startswith("text/"):
+                    raise ValueError(f"not a text page ({content_type.split(';')[0]})")
+                parser = PageTextParser() if "html" in content_type else None
+                plain: list[str] = []
+                plain_chars = 0
+                decoder = codecs.getincrementaldecoder(_charset(content_type))(errors="replace")
+                try:
+                    for chunk in _read_body(resp, deadline):
+                        chunk = chunk[:max_bytes - page.bytes]
+                        page.bytes += len(chunk)
+                        text = decoder.decode(chunk)
+                        if parser is not None:
+                            parser.feed(text)
+                            if parser.enough(max_chars):
+                                break
+                        else:
+                            plain.append(text)
+                            plain_chars += len(text)
+                            if plain_chars >= max_chars:
+                                break
+                        if page.bytes >= max_bytes:
+                            page.truncated = True
+                            break
+                except TimeoutError:
+                    # Out of time: keep what has been extracted so far.
+                    page.truncated = timed_out = True
+                tail = decoder.decode(b"", final=True)
+                if parser is not None:
+                    parser.feed(tail)
+                    parser.close()
+                    page.title, page.text = parser.title, clip(parser.text, max_chars)
+                else:
+                    paragraphs = re.split(r"\n\s*\n", "".join(plain) + tail)
+                    page.text = clip("\n\n".join(" ".join(p.split()) for p in paragraphs if p.strip()), max_chars)
+        except Exception as e:
+            page.error = f"{type(e).__name__}: {e}"
+        s.set(bytes=page.bytes, chars=len(page.text), truncated=page.truncated, ok=page.error is None)
+
+    # A page cut short by the clock may read differently next time; the byte cap always cuts it the same.
+    if cache is not None and page.text and not timed_out:
+        cache.set(cache_key, {"title": page.title, "text": page.text})
+    return page
+
+
+def fetch_pages(urls: list[str], max_workers: int = PAGE_WORKERS, **limits) -> list[Page]:
+    """fetch_page() every URL concurrently; results are in the order of `urls`."""
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls))), thread_name_prefix="page") as pool:
+        return list(pool.map(lambda url: fetch_page(url, **limits), urls))
+
+
+_page_cache: Optional[SQLiteCache] = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[SQLiteCache]:
+    """Return the extracted-text cache, or None if PAGE_CACHE is disabled."""
+    global _page_cache
+    if os.environ.get("PAGE_CACHE", "true").lower() not in ("1", "true", "yes"):
+        return None
+    with _page_cache_lock:
+        if _page_cache is None:
+            _page_cache = SQLiteCache(cache_dir() / "pages.sqlite3", ttl=float(os.environ.get("PAGE_CACHE_TTL", 86400)))
+        return _page_cache
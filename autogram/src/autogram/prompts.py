@@ -0,0 +1,70 @@
+"""Prompt builders shared by the demo runner and the campaign pipeline."""
+from __future__ import annotations
+
+import math
+import re
+from typing import Iterable, Iterator, Sequence
+
+
+# "Scene 2: ...", "**Scene 2 - The Lab**", "### Shot 3", "Segment 4." at the start of a line.
+_SCENE = re.compile(r"^[\W_]*(?:scene|shot|segment)\s*\d+\b.*$", re.IGNORECASE | re.MULTILINE)
+
+
+def build_fact_prompt(collected: str, avoid: Sequence[str] = ()) -> str:
+    """Prompt asking for a single plain-text neuroscience fact from collected research.
+
+    `avoid` lists facts that were already published, which the answer must not repeat.
+    """
+    repeat = ""
+    if avoid:
+        repeat = (
+            "These facts were already published; pick a DIFFERENT discovery:\n"
+            + "\n".join(f"- {fact}" for fact in avoid)
+            + "\n\n"
+        )
+    return (
+        "Write ONE clean sentence about the most important neuroscience discovery from this research. "
+        "Include the institution name and what they discovered. "
+        "Use NO emojis, NO hashtags, NO special characters. Just plain text.\n\n"
+        + repeat
+        + collected
+    )
+
+
+def split_scenes(script: str, max_scenes: int = 4) -> list[str]:
+    """Split a video script into one self-contained prompt per scene.
+
+    Scenes start at "Scene N" (or "Shot N"/"Segment N") headings. The text
+    before the first one (character and setting) is repeated in every
+    prompt so the clips match. Runs of scenes are merged to stay within
+    `max_scenes`; a script without scene headings is returned whole.
+    """
+    starts = [m.start() for m in _SCENE.finditer(script)]
+    if len(starts) < 2 or max_scenes < 2:
+        return [script.strip()]
+    preamble = script[:starts[0]].strip()
+    scenes = [script[a:b].strip() for a, b in zip(starts, starts[1:] + [len(script)])]
+    if len(scenes) > max_scenes:
+        per = math.ceil(len(scenes) / max_scenes)
+        scenes = ["\n\n".join(scenes[i:i + per]) for i in range(0, len(scenes), per)]
+    return [f"{preamble}\n\n{scene}" if preamble else scene for scene in scenes]
+
+
+def build_video_prompt(script: str) -> str:
+    """Veo prompt for the wizard goat reading `script` to camera."""
+    return "".join(stream_video_prompt([script]))
+
+
+def stream_video_prompt(chunks: Iterable[str]) -> Iterator[str]:
+    """`build_video_prompt` for a script that arrives in pieces (e.g. a SummaryStream)."""
+    yield "A wizard goat character speaking directly to camera saying: '"
+    # Like str.strip(): drop leading whitespace and hold the rest until more text follows it.
+    pending, started = "", False
+    for chunk in chunks:
+        for piece in re.findall(r"\s+|\S+", chunk):
+            if piece.isspace():
+                pending += piece if started else ""
+                continue
+            yield pending + piece
+            pending, started = "", True
+    yield "'. The goat should be clearly visible and speaking the words audibly."
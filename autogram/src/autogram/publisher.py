@@ -0,0 +1,123 @@
+"""Batch Instagram publisher.
+
+Uploads many (video, caption) jobs concurrently, polls every pending
+media container from a single loop with exponential backoff and a hard
+timeout, and publishes each Reel as soon as Instagram finishes processing
+it. Failures are reported per job instead of aborting the whole batch.
+"""
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from autogram import instagram_utils
+from autogram.mp4 import ensure_faststart
+
+
+@dataclass
+class PublishResult:
+    video_path: str
+    caption: str
+    creation_id: Optional[str] = None
+    post_id: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.post_id is not None
+
+
+@dataclass
+class _Pending:
+    result: PublishResult
+    deadline: float
+    interval: float
+    next_poll: float
+
+
+def _upload_and_create(video_path: str, caption: str) -> str:
+    # As in post_to_instagram: Reels start processing sooner with moov ahead of mdat.
+    ensure_faststart(video_path)
+    video_url = instagram_utils.upload_to_cloudinary(video_path)
+    return instagram_utils.create_video_object(video_url, caption)
+
+
+def publish_many(jobs: Iterable[tuple[str, str]], max_workers: int = 4,
+                 timeout: float = instagram_utils.PROCESSING_TIMEOUT,
+                 initial_interval: float = 2.0, max_interval: float = 30.0) -> list[PublishResult]:
+    """Publish every (video_path, caption) job and return one result per job, in input order.
+
+    Uploads and publish calls run on a pool of `max_workers` threads. Status
+    polling for all containers happens on the calling thread; each container
+    backs off independently and fails once `timeout` seconds pass after it
+    was created.
+    """
+    results = [PublishResult(video_path=path, caption=caption) for path, caption in jobs]
+    started = time.monotonic()
+    pending: list[_Pending] = []
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        in_flight = {}
+        for result in results:
+            in_flight[pool.submit(_upload_and_create, result.video_path, result.caption)] = ("create", result)
+
+        while in_flight or pending:
+            now = time.monotonic()
+            for item in list(pending):
+                result = item.result
+                if now >= item.deadline:
+                    result.error = f"Instagram processing did not finish within {timeout:.0f}s"
+                    result.elapsed = now - started
+                    pending.remove(item)
+                    continue
+                if now < item.next_poll:
+                    continue
+                try:
+                    st = instagram_utils.check_media_status(result.creation_id).get("status", "")
+                except Exception as e:
+                    st = ""
+                    print(f"⚠️ Status check failed for {result.video_path}: {e}")
+                if "Finished" in st:
+                    pending.remove(item)
+                    in_flight[pool.submit(instagram_utils.publish_video, result.creation_id)] = ("publish", result)
+                elif "Error" in st:
+                    pending.remove(item)
+                    result.error = f"Instagram processing error: {st}"
+                    result.elapsed = time.monotonic() - started
+                else:
+                    item.interval = min(item.interval * 2, max_interval)
+                    item.next_poll = time.monotonic() + item.interval
+
+            wake_at = [p.next_poll for p in pending] + [p.deadline for p in pending]
+            wait_for = max(0.0, min(wake_at) - time.monotonic()) if wake_at else None
+            if in_flight:
+                done, _ = wait(in_flight, timeout=wait_for, return_when=FIRST_COMPLETED)
+            else:
+                done = set()
+                time.sleep(wait_for or 0)
+
+            for future in done:
+                stage, result = in_flight.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    result.error = f"{stage} failed: {e}"
+                    result.elapsed = time.monotonic() - started
+                    continue
+                if stage == "create":
+                    result.creation_id = value
+                    now = time.monotonic()
+                    pending.append(_Pending(result, now + timeout, initial_interval, now + initial_interval))
+                else:
+                    result.post_id = value
+                    result.elapsed = time.monotonic() - started
+
+    for result in results:
+        if result.ok:
+            print(f"✅ Reel posted: {result.video_path} -> https://instagram.com/p/{result.post_id}/")
+        else:
+            print(f"❌ Failed to post {result.video_path}: {result.error}")
+    return results
@@ -0,0 +1,284 @@
+"""Per-provider rate limiting and 429-aware retries for external calls.
+
+Each provider (serper, openai, veo, cloudinary, graph) has a token bucket
+stored in SQLite under the cache directory, so every thread and every
+process on the machine draws from the same budget. `call()` waits for a
+token, runs the request and retries 429s, 5xx responses and connection
+errors with full-jitter exponential backoff, never sooner than the
+server's Retry-After. A Retry-After also pauses the whole provider, so
+other workers stop hammering an API that has just pushed back.
+
+Limits are set per provider as RATE_LIMIT_<PROVIDER>="<per second>[,<burst>]",
+e.g. RATE_LIMIT_OPENAI=8,16. RATE_LIMIT=false disables throttling (retries
+still apply), as does replaying a cassette (see autogram.cassette);
+RATE_LIMIT_RETRIES sets the retry count (default 4).
+
+Time spent waiting is reported to listeners registered with
+`add_listener(fn)` as fn(event, provider, seconds, **info) with event
+"throttle" or "retry", recorded as `ratelimit.<event>` trace spans and
+summed in `stats()`.
+"""
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from autogram import cassette, tracing
+from autogram.cache import cache_dir
+
+
+# (requests per second, burst) when no RATE_LIMIT_<PROVIDER> is set.
+DEFAULT_LIMITS = {
+    "serper": (5.0, 10),
+    "openai": (8.0, 16),
+    "veo": (1.0, 4),
+    "cloudinary": (4.0, 8),
+    "graph": (2.0, 4),
+}
+RETRIES = int(os.environ.get("RATE_LIMIT_RETRIES", 4))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = frozenset({408, 420, 429, 500, 502, 503, 504})
+# The request was refused before being processed, so even non-idempotent calls can repeat it.
+THROTTLE_STATUSES = frozenset({420, 429})
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when a call still fails with a retryable error after all retries."""
+
+
+def enabled() -> bool:
+    return os.environ.get("RATE_LIMIT", "true").lower() in ("1", "true", "yes")
+
+
+def limits_for(provider: str) -> tuple[float, int]:
+    raw = os.environ.get(f"RATE_LIMIT_{provider.upper()}")
+    if not raw:
+        return DEFAULT_LIMITS.get(provider, (5.0, 10))
+    rate, _, burst = raw.partition(",")
+    return float(rate), int(burst) if burst else max(1, int(float(rate)))
+
+
+class TokenBucket:
+    """Token buckets shared through one SQLite file (one row per provider)."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            "provider TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, paused_until REAL NOT NULL)"
+        )
+
+    def _take(self, provider: str, rate: float, burst: int) -> float:
+        """Take one token if available; otherwise return how long to wait for one."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT tokens, updated, paused_until FROM buckets WHERE provider = ?", (provider,)
+                ).fetchone()
+                tokens, updated, paused_until = row if row else (float(burst), now, 0.0)
+                tokens = min(float(burst), tokens + max(0.0, now - updated) * rate)
+                if paused_until > now:
+                    wait = paused_until - now
+                elif tokens >= 1.0:
+                    tokens -= 1.0
+                    wait = 0.0
+                else:
+                    wait = (1.0 - tokens) / rate
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO buckets (provider, tokens, updated, paused_until) VALUES (?, ?, ?, ?)",
+                    (provider, tokens, now, paused_until),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def acquire(self, provider: str, rate: float, burst: int) -> float:
+        """Block until a token for `provider` is available; return the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._take(provider, rate, burst)
+            if wait <= 0:
+                return waited
+            # Re-check rather than sleeping the full time: another process may pause or refill.
+            wait = min(wait, 1.0) + random.uniform(0, 0.01)
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, provider: str, seconds: float) -> None:
+        """Hold every caller of `provider` back for `seconds` (e.g. after a Retry-After)."""
+        with self._lock:
+            until = time.time() + seconds
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT INTO buckets (provider, tokens, updated, paused_until) VALUES (?, 0, ?, ?) "
+                    "ON CONFLICT(provider) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)",
+                    (provider, time.time(), until),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_bucket: Optional[TokenBucket] = None
+_bucket_lock = threading.Lock()
+_listeners: list[Callable[..., None]] = []
+_stats: dict[str, dict[str, float]] = defaultdict(lambda: {"throttled": 0.0, "throttles": 0, "retries": 0, "retry_wait": 0.0})
+_stats_lock = threading.Lock()
+
+
+def get_bucket() -> TokenBucket:
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = TokenBucket(cache_dir() / "ratelimit.sqlite3")
+        return _bucket
+
+
+def add_listener(fn: Callable[..., None]) -> None:
+    """Call fn(event, provider, seconds, **info) whenever a call is throttled or retried."""
+    _listeners.append(fn)
+
+
+def stats() -> dict[str, dict[str, float]]:
+    """Per-provider throttled seconds, throttle count, retries and seconds spent backing off."""
+    with _stats_lock:
+        return {provider: dict(values) for provider, values in _stats.items()}
+
+
+def _emit(event: str, provider: str, seconds: float, **info: Any) -> None:
+    with _stats_lock:
+        entry = _stats[provider]
+        if event == "throttle":
+            entry["throttled"] += seconds
+            entry["throttles"] += 1
+        else:
+            entry["retries"] += 1
+            entry["retry_wait"] += seconds
+    tracing.record(f"ratelimit.{event}", seconds, provider=provider, **info)
+    for listener in list(_listeners):
+        try:
+            listener(event, provider, seconds, **info)
+        except Exception as e:
+            print(f"[ratelimit] listener failed: {e}")
+
+
+def acquire(provider: str) -> float:
+    """Wait for `provider`'s rate limit; return the seconds spent waiting."""
+    if not enabled() or cassette.replaying():
+        return 0.0
+    rate, burst = limits_for(provider)
+    waited = get_bucket().acquire(provider, rate, burst)
+    if waited > 0:
+        _emit("throttle", provider, waited)
+    return waited
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _status_and_headers(obj: Any) -> tuple[Optional[int], Any]:
+    """Pull an HTTP status and headers out of a response or an SDK exception."""
+    response = getattr(obj, "response", None)
+    status = getattr(obj, "status_code", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None) or getattr(response, "status", None)
+    if status is None and isinstance(getattr(obj, "code", None), int):
+        status = obj.code  # google.genai errors
+    headers = getattr(obj, "headers", None)
+    if headers is None and response is not None:
+        headers = getattr(response, "headers", None)
+    return status, headers
+
+
+_TRANSIENT_ERRORS = (
+    "ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout",  # requests
+    "APIConnectionError", "APITimeoutError",  # openai
+    "ConnectError", "ReadError", "RemoteProtocolError",  # httpx
+    "GeneralError",  # cloudinary 5xx
+)
+
+
+def retry_delay(obj: Any, idempotent: bool = True) -> Optional[float]:
+    """None if `obj` (a response or exception) should not be retried, else the minimum wait.
+
+    Non-idempotent calls are only retried when the server refused them as
+    rate limited, since anything else may already have taken effect.
+    """
+    name = type(obj).__name__
+    if name == "RateLimited":  # cloudinary.exceptions
+        return 0.0
+    if idempotent and (name in _TRANSIENT_ERRORS or isinstance(obj, (ConnectionError, TimeoutError))):
+        return 0.0
+    status, headers = _status_and_headers(obj)
+    if status not in (RETRY_STATUSES if idempotent else THROTTLE_STATUSES):
+        return None
+    retry_after = parse_retry_after(headers.get("Retry-After") if headers is not None else None)
+    return retry_after or 0.0
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call(provider: str, fn: Callable[..., Any], *args: Any, retries: Optional[int] = None, idempotent: bool = True,
+         **kwargs: Any) -> Any:
+    """Run fn(*args, **kwargs) under `provider`'s rate limit, retrying throttling and transient errors.
+
+    A returned response with a retryable status (e.g. a `requests` 429) is
+    retried too; after the last attempt it is returned as is, so callers
+    keep their usual status handling. Exceptions are re-raised.
+    """
+    retries = RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        acquire(provider)
+        try:
+            result = fn(*args, **kwargs)
+            failure = result
+        except Exception as e:
+            result, failure = None, e
+            minimum = retry_delay(e, idempotent)
+            if minimum is None or attempt == retries:
+                raise
+        else:
+            minimum = retry_delay(result, idempotent)
+            if minimum is None or attempt == retries:
+                return result
+
+        delay = max(minimum, backoff(attempt))
+        if minimum:
+            # The server said when to come back; hold every worker back until then.
+            get_bucket().pause(provider, minimum)
+        status, _ = _status_and_headers(failure)
+        print(f"[ratelimit] {provider}: {status or type(failure).__name__}, retrying in {delay:.1f}s "
+              f"({attempt + 1}/{retries})")
+        _emit("retry", provider, delay, status=status, attempt=attempt + 1)
+        time.sleep(delay)
+    raise RateLimitExceeded(provider)
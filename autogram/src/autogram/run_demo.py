@@ -6,6 +6,7 @@ PYTHONPATH set externally. It expects the environment keys to be available via
 `autogram/.env` (autogram package loads it) or the shell.
 """
 from __future__ import annotations
+import argparse
 import sys
 from pathlib import Path
 
@@ -14,37 +15,70 @@ root = Path(__file__).resolve().parent
 sys.path.insert(0, str(root / 'autogram' / 'src'))
 
 from autogram.tools.collector_tool import CollectorTool
-from autogram.tools.summarizer_tool import SummarizerTool
+from autogram.tools.summarizer_tool import SummarizerTool, compact_text
 from autogram.tools.formatter_tool import FormatterTool
 from autogram.tools.veo_tool import VeoTool
+from autogram.prompts import build_fact_prompt, build_video_prompt
+from autogram.artifacts import place_file
+from autogram.checkpoints import RunDir, StageError, file_digest
+from autogram.fact_index import DuplicateFact, novel_fact, record_fact
+from autogram import tracing
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the collect -> summarize -> format -> video demo.")
+    parser.add_argument('--force', action='store_true', help="render the video even if this prompt was rendered before")
+    parser.add_argument('--resume', metavar='RUN_ID', help="reuse the finished stages of an earlier run")
+    parser.add_argument('--publish', action='store_true', help="post the video to Instagram")
+    args = parser.parse_args(argv)
+
+    import os
+    from datetime import datetime
+
     query = "recent advances in neuroscience"
+    try:
+        run = RunDir.open(args.resume, command="run_demo", query=query)
+    except FileNotFoundError as e:
+        print("[demo]", e)
+        return
+    tracing.set_run(run.run_id)
+    tracing.set_topic(query)
     collector = CollectorTool()
     summarizer = SummarizerTool()
     formatter = FormatterTool()
 
-    print("[demo] Collecting web content for query:", query)
-    collected = collector._run(query=query, num_results=3)
-    if isinstance(collected, str) and collected.startswith("ERROR"):
-        print("[demo] Collector error:", collected)
-        return
-
-    print("[demo] Collected length:", len(collected))
+    try:
+        print("[demo] Collecting web content for query:", query)
+        collected = run.stage("collect", {"query": query, "num_results": 3},
+                              lambda: collector._run(query=query, num_results=3))
+        print("[demo] Collected length:", len(collected))
 
-    # Create a single neuroscience fact sentence
-    print("[demo] Creating single neuroscience fact...")
-    fact_prompt = (
-        "Write ONE clean sentence about the most important neuroscience discovery from this research. "
-        "Include the institution name and what they discovered. "
-        "Use NO emojis, NO hashtags, NO special characters. Just plain text.\n\n"
-        + collected
-    )
+        # Create a single neuroscience fact sentence
+        print("[demo] Creating single neuroscience fact...")
+        research = compact_text(collected, query)
 
-    script = summarizer._run(text=fact_prompt, max_tokens=50)
-    if isinstance(script, str) and script.startswith("ERROR"):
-        print("[demo] Summarizer error (script):", script)
+        def stream_fact(fact_prompt):
+            # Show the fact as it is generated, formatted the way the report will show it.
+            try:
+                stream = summarizer.stream(fact_prompt, max_tokens=50)
+                print("[demo] ", end="", flush=True)
+                for piece in formatter.format_stream(stream, style='markdown'):
+                    print(piece, end="", flush=True)
+            except Exception as e:
+                return f"ERROR: openai summary failed: {e}"
+            print(f"\n[demo] First token after {stream.ttft or 0:.2f}s, fact done in {stream.total:.2f}s")
+            return stream.text
+
+        def generate(avoid):
+            fact_prompt = build_fact_prompt(research, avoid)
+            return run.stage(f"summarize-{len(avoid)}" if avoid else "summarize",
+                             {"prompt": fact_prompt, "max_tokens": 50},
+                             lambda: stream_fact(fact_prompt))
+
+        # Regenerate (then give up) if the fact was already rendered by an earlier run.
+        script = novel_fact(generate, exclude=lambda meta: meta.get("run_id") == run.run_id)
+    except (StageError, DuplicateFact) as e:
+        print("[demo] Stage failed:", e)
         return
 
     # Format the single fact
@@ -52,9 +86,6 @@ def main() -> None:
     formatted_script = formatter._run(text=script, style='markdown')
 
     # Tool trace (which env vars we saw)
-    import os
-    from datetime import datetime
-
     trace_lines = [
         f"Generated: {datetime.utcnow().isoformat()} UTC",
         f"SERPER_KEY present: {bool(os.environ.get('SERPER_KEY'))}",
@@ -64,9 +95,7 @@ def main() -> None:
     ]
 
     out_path = root / 'report.md'
-    with out_path.open('w', encoding='utf-8') as f:
-        f.write('# Neuroscience Fact\n\n')
-        f.write(formatted_script + '\n')
+    report = '# Neuroscience Fact\n\n' + formatted_script + '\n'
 
     # Optionally run video generation if RUN_VEO=true in the env
     # By default, run video generation. Set RUN_VEO=false in the env to disable.
@@ -81,25 +110,46 @@ def main() -> None:
             try:
                 veo = VeoTool(api_key=veo_key)
                 # Create a direct video generation prompt with the specific fact
-                video_prompt = f"A wizard goat character speaking directly to camera saying: '{script.strip()}'. The goat should be clearly visible and speaking the words audibly."
+                video_prompt = build_video_prompt(script)
+                video_file = run.file('video.mp4')
 
                 print(f"[demo] Using report.md as video prompt (chars={len(video_prompt)})")
-                veo_out = veo._run(prompt=video_prompt, output_file=str(root / 'autogram_output.mp4'))
+                veo_out = run.stage(
+                    "video",
+                    {"prompt": video_prompt, "force": args.force},
+                    lambda: veo._run(prompt=video_prompt, output_file=video_file, force=args.force),
+                    files=(video_file,),
+                )
+                place_file(veo_out, str(root / 'autogram_output.mp4'))
+                run.stage("fact", {"script": script}, lambda: record_fact(script, run_id=run.run_id, topic=query, video=veo_out))
                 print('[demo] Video generation completed:', veo_out)
             except Exception as e:
                 print('[demo] Video generation error:', e)
 
         # append video info to the report
-        with out_path.open('a', encoding='utf-8') as f:
-            f.write('\n---\n\n')
-            f.write('## Video generation\n\n')
-            if veo_out:
-                f.write(f'Video file: {veo_out}\n')
-            else:
-                f.write('Video generation was not run or failed.\n')
+        report += '\n---\n\n## Video generation\n\n'
+        if veo_out:
+            report += f'Video file: {veo_out}\n'
+        else:
+            report += 'Video generation was not run or failed.\n'
 
+    out_path.write_text(report, encoding='utf-8')
+    with open(run.file('report.md'), 'w', encoding='utf-8') as f:
+        f.write(report)
     print(f"[demo] Report written to: {out_path}")
 
+    if args.publish and veo_out:
+        from autogram.instagram_utils import post_to_instagram
+
+        caption = "Neuroscience Facts"
+        try:
+            post_id = run.stage("publish", {"video": file_digest(veo_out), "caption": caption},
+                                lambda: post_to_instagram(veo_out, caption))
+            print('[demo] Published:', post_id)
+        except Exception as e:
+            print('[demo] Publish error:', e)
+            print(f'[demo] Retry with: python run_demo.py --publish --resume {run.run_id}')
+
 
 if __name__ == '__main__':
     main()
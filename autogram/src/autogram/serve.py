@@ -0,0 +1,398 @@
+"""`autogram serve`: a long-running daemon that works through the job queue.
+
+The daemon builds the campaign tools once (collector, summarizer, formatter,
+Veo, and their HTTP clients and caches) and shares them between a pool of
+worker threads, so a job costs only the work it does. Jobs come from the
+durable queue in `autogram.jobs`: `autogram submit` writes to it directly,
+and the daemon also accepts jobs over a local HTTP endpoint.
+
+    POST   /jobs        {"topic": "...", "priority": 0, "publish": true, "publish_at": "+2h"}
+    POST   /jobs        {"kind": "publish", "video": "path.mp4", "caption": "...", "run_at": "2026-01-01T09:00"}
+    GET    /jobs[?state=queued]
+    GET    /jobs/<id>
+    DELETE /jobs/<id>   (cancels a queued job)
+    GET    /health
+
+A topic job runs collect -> summarize -> format -> render inside a
+checkpointed run directory, so a retried job skips the steps that already
+succeeded. With "publish", it then queues a publish job, optionally for a
+later time, which replaces cron-started posting.
+
+SIGINT/SIGTERM stop taking new jobs and wait for running ones to finish; a
+second signal exits at once and puts the running jobs back in the queue.
+AUTOGRAM_SERVE_WORKERS (default 2) and AUTOGRAM_SERVE_PORT (default 8765)
+set the defaults for --workers and --port.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import sqlite3
+import socket
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+from autogram import tracing
+from autogram.jobs import KINDS, LEASE_SECONDS, STATES, Job, JobQueue, LeaseLost
+
+
+POLL_SECONDS = 1.0
+TOPIC_STAGES = ("collect", "summarize", "format", "render")
+
+
+def parse_when(value: Any) -> Optional[float]:
+    """Epoch seconds from an epoch number, "+90s"/"+30m"/"+2h"/"+1d", or an ISO date/time."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip()
+    if value.startswith("+"):
+        units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+        scale = units.get(value[-1], 1)
+        return time.time() + float(value[1:].rstrip("smhd")) * scale
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def job_request(data: dict) -> tuple[str, dict, int, Optional[float]]:
+    """Validate a submitted job; returns (kind, payload, priority, run_at)."""
+    kind = data.get("kind") or ("publish" if data.get("video") and not data.get("topic") else "topic")
+    if kind not in KINDS:
+        raise ValueError(f"unknown job kind {kind!r}")
+    if kind == "topic":
+        if not data.get("topic"):
+            raise ValueError("a topic job needs a 'topic'")
+        payload = {"topic": data["topic"], "publish": bool(data.get("publish")), "caption": data.get("caption"),
+                   "publish_at": parse_when(data.get("publish_at"))}
+    else:
+        if not data.get("video"):
+            raise ValueError("a publish job needs a 'video'")
+        payload = {"video": os.path.abspath(data["video"]), "caption": data.get("caption")}
+    return kind, payload, int(data.get("priority") or 0), parse_when(data.get("run_at"))
+
+
+class Daemon:
+    """Runs queued jobs on `workers` threads that share one set of warm tools."""
+
+    def __init__(self, queue: JobQueue, workers: int = 2, out_dir: str = "serve_output",
+                 host: str = "127.0.0.1", port: Optional[int] = 8765):
+        self.queue = queue
+        self.workers = workers
+        self.out_dir = Path(out_dir)
+        self.host = host
+        self.port = port
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stop = threading.Event()
+        self.wake = threading.Event()
+        self.running: dict[int, Job] = {}
+        self._running_lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._http: Optional[ThreadingHTTPServer] = None
+
+    def start(self) -> None:
+        from autogram.campaign import build_stages
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        self.stages = {stage.name: stage for stage in build_stages(self.out_dir, publish=True)}
+        print(f"[serve] tools ready in {time.monotonic() - started:.2f}s")
+
+        tracing.set_run(f"serve-{os.getpid()}")
+        for n in range(self.workers):
+            self._spawn(self._work, f"worker-{n}", f"{self.id}/{n}")
+        self._spawn(self._renew_leases, "leases")
+
+        if self.port is not None:
+            self._http = ThreadingHTTPServer((self.host, self.port), _Handler)
+            self._http.owner = self
+            self.port = self._http.server_address[1]
+            self._spawn(self._http.serve_forever, "http")
+            print(f"[serve] listening on http://{self.host}:{self.port}")
+        print(f"[serve] {self.workers} workers, queue {self.queue.path}, output {self.out_dir}")
+
+    def _spawn(self, target, name: str, *args) -> None:
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def shutdown(self) -> None:
+        """Stop taking jobs and wait for the running ones to finish."""
+        self.stop.set()
+        self.wake.set()
+        if self._http is not None:
+            self._http.shutdown()
+            self._http.server_close()
+        with self._running_lock:
+            busy = len(self.running)
+        if busy:
+            print(f"[serve] waiting for {busy} running job(s) to finish (signal again to abort)")
+        for thread in self._threads:
+            thread.join()
+        print("[serve] stopped")
+
+    def abort(self) -> None:
+        """Put running jobs back in the queue for the next daemon and exit immediately."""
+        with self._running_lock:
+            for job_id in self.running:
+                self.queue.release(job_id)
+        print(f"[serve] aborted; {len(self.running)} running job(s) re-queued")
+        os._exit(1)
+
+    def run(self) -> None:
+        """Serve until SIGINT/SIGTERM."""
+        def handle(signum, frame):
+            if self.stop.is_set():
+                self.abort()
+            print(f"[serve] {signal.Signals(signum).name}: shutting down")
+            self.stop.set()
+            self.wake.set()
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
+        self.start()
+        while not self.stop.wait(POLL_SECONDS):
+            pass
+        self.shutdown()
+
+    def submit(self, data: dict) -> int:
+        kind, payload, priority, run_at = job_request(data)
+        job_id = self.queue.submit(kind, payload, priority=priority, run_at=run_at)
+        self.wake.set()
+        return job_id
+
+    def _renew_leases(self) -> None:
+        while not self.stop.wait(LEASE_SECONDS / 3):
+            self.queue.renew(self.id)
+        # Keep the leases of jobs that are still finishing during shutdown.
+        while any(t.is_alive() for t in self._threads if t.name.startswith("worker")):
+            self.queue.renew(self.id)
+            time.sleep(min(LEASE_SECONDS / 3, POLL_SECONDS))
+
+    def _idle_wait(self) -> None:
+        try:
+            next_at = self.queue.next_run_at()
+        except sqlite3.Error:
+            next_at = None
+        timeout = POLL_SECONDS if next_at is None else min(POLL_SECONDS, max(next_at - time.time(), 0.01))
+        if self.wake.wait(timeout):
+            self.wake.clear()
+
+    def _work(self, name: str) -> None:
+        while not self.stop.is_set():
+            try:
+                job = self.queue.claim(name)
+            except sqlite3.Error as e:
+                # e.g. "database is locked" while another process holds the queue; try again shortly.
+                print(f"[serve] {name}: could not claim a job: {e}")
+                self._idle_wait()
+                continue
+            if job is None:
+                self._idle_wait()
+                continue
+            with self._running_lock:
+                self.running[job.id] = job
+            try:
+                self._run_job(job)
+            finally:
+                with self._running_lock:
+                    self.running.pop(job.id, None)
+
+    def _run_job(self, job: Job) -> None:
+        from autogram.checkpoints import RunDir
+        from autogram.fact_index import DuplicateFact
+
+        start = time.monotonic()
+        waited = max(0.0, job.started - job.run_at)
+        label = job.payload.get("topic") or job.payload.get("video")
+        tracing.set_topic(job.payload.get("topic"))
+        print(f"[serve] job {job.id} ({job.kind} {label!r}) started, attempt {job.attempts}/{job.max_attempts}, "
+              f"waited {waited:.1f}s")
+        try:
+            if job.run_id:
+                run = RunDir.open(job.run_id)
+            else:
+                run = RunDir.open(command="serve", job=job.id, kind=job.kind, payload=job.payload)
+                self.queue.set_run_id(job.id, run.run_id)
+            with tracing.span(f"job.{job.kind}", job=job.id, attempt=job.attempts):
+                result = self._topic(job, run) if job.kind == "topic" else self._publish(job, run)
+        except Exception as e:
+            try:
+                # Research for a topic that only yields already-published facts will not improve on retry.
+                delay = self.queue.fail(job, str(e), retry=not isinstance(e, DuplicateFact))
+            except LeaseLost:
+                print(f"[serve] job {job.id} failed after its lease was taken over; leaving it to the new owner")
+                return
+            outcome = f"retrying in {delay:.0f}s" if delay is not None else "giving up"
+            print(f"[serve] job {job.id} failed after {time.monotonic() - start:.1f}s: {e}; {outcome}")
+            return
+        try:
+            self.queue.complete(job, result)
+        except LeaseLost:
+            print(f"[serve] job {job.id} finished after its lease was taken over; result discarded")
+            return
+        print(f"[serve] job {job.id} done in {time.monotonic() - start:.1f}s")
+
+    def _topic(self, job: Job, run) -> dict:
+        from autogram.campaign import slugify
+
+        topic = job.payload["topic"]
+        item = {"topic": topic, "slug": f"job{job.id:05d}-{slugify(topic)}", "caption": job.payload.get("caption")}
+        for name in TOPIC_STAGES:
+            fn = self.stages[name].fn
+            # A reused render checkpoint is only good while its MP4 is still on disk.
+            item = run.stage(name, item, lambda: fn(dict(item)),
+                             files=lambda out: [out["video"]] if out.get("video") else [])
+        result = {key: item.get(key) for key in ("script", "report", "video")}
+        result["run_id"] = run.run_id
+        if job.payload.get("publish"):
+            result["publish_job"] = self.queue.submit(
+                "publish", {"video": item["video"], "caption": item.get("caption"), "topic": topic},
+                priority=job.priority, run_at=job.payload.get("publish_at"),
+            )
+        return result
+
+    def _publish(self, job: Job, run) -> dict:
+        from autogram.checkpoints import file_digest
+
+        video, caption = job.payload["video"], job.payload.get("caption")
+        fn = self.stages["publish"].fn
+        post_id = run.stage("publish", {"video": file_digest(video) or video, "caption": caption},
+                            lambda: fn({"video": video, "caption": caption})["post_id"])
+        return {"post_id": post_id, "run_id": run.run_id}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "autogram-serve"
+
+    @property
+    def daemon(self) -> Daemon:
+        return self.server.owner
+
+    def _send(self, status: int, body: Any) -> None:
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _job_id(self) -> Optional[int]:
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            return int(parts[1])
+        return None
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            with self.daemon._running_lock:
+                running = sorted(self.daemon.running)
+            return self._send(200, {"ok": not self.daemon.stop.is_set(), "workers": self.daemon.workers,
+                                    "running": running, "jobs": self.daemon.queue.counts()})
+        if url.path.rstrip("/") == "/jobs":
+            query = parse_qs(url.query)
+            state = query.get("state", [None])[0]
+            limit = int(query.get("limit", [50])[0])
+            return self._send(200, [job.to_dict() for job in self.daemon.queue.list(state, limit)])
+        job_id = self._job_id()
+        job = self.daemon.queue.get(job_id) if job_id is not None else None
+        if job is None:
+            return self._send(404, {"error": "not found"})
+        self._send(200, job.to_dict())
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send(404, {"error": "not found"})
+        if self.daemon.stop.is_set():
+            return self._send(503, {"error": "shutting down"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            data = json.loads(self.rfile.read(length) or b"{}")
+            job_id = self.daemon.submit(data)
+        except (ValueError, TypeError) as e:
+            return self._send(400, {"error": str(e)})
+        self._send(201, {"id": job_id})
+
+    def do_DELETE(self):
+        job_id = self._job_id()
+        if job_id is None:
+            return self._send(404, {"error": "not found"})
+        if not self.daemon.queue.cancel(job_id):
+            return self._send(409, {"error": "job is not queued"})
+        self._send(200, {"id": job_id, "state": "cancelled"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="autogram serve", description="Run queued jobs on warm workers.")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("AUTOGRAM_SERVE_WORKERS", 2)))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AUTOGRAM_SERVE_PORT", 8765)))
+    parser.add_argument("--no-http", action="store_true", help="only take jobs submitted with `autogram submit`")
+    parser.add_argument("--out", default="serve_output", help="directory for reports and videos")
+    args = parser.parse_args(argv)
+
+    Daemon(JobQueue(), workers=args.workers, out_dir=args.out, host=args.host,
+           port=None if args.no_http else args.port).run()
+
+
+def submit_main(argv: Optional[list[str]] = None) -> list[int]:
+    parser = argparse.ArgumentParser(prog="autogram submit", description="Queue jobs for `autogram serve`.")
+    parser.add_argument("topics", nargs="*", help="topics to research and render")
+    parser.add_argument("--video", help="queue a publish job for this video instead")
+    parser.add_argument("--caption")
+    parser.add_argument("--priority", type=int, default=0, help="higher runs first")
+    parser.add_argument("--publish", action="store_true", help="publish each topic's video once rendered")
+    parser.add_argument("--publish-at", metavar="WHEN", help="when to publish: +2h, ISO time or epoch seconds")
+    parser.add_argument("--at", metavar="WHEN", help="do not start the job before this time")
+    args = parser.parse_args(argv)
+    if not args.topics and not args.video:
+        parser.error("give at least one topic or --video")
+
+    queue = JobQueue()
+    requests = [{"kind": "topic", "topic": topic} for topic in args.topics]
+    if args.video:
+        requests.append({"kind": "publish", "video": args.video})
+    ids = []
+    for data in requests:
+        data.update(caption=args.caption, priority=args.priority, publish=args.publish,
+                    publish_at=args.publish_at, run_at=args.at)
+        kind, payload, priority, run_at = job_request(data)
+        ids.append(queue.submit(kind, payload, priority=priority, run_at=run_at))
+        print(f"[submit] job {ids[-1]}: {kind} {payload.get('topic') or payload.get('video')!r}")
+    return ids
+
+
+def jobs_main(argv: Optional[list[str]] = None) -> list[dict]:
+    parser = argparse.ArgumentParser(prog="autogram jobs", description="List or cancel queued jobs.")
+    parser.add_argument("--state", choices=STATES)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--cancel", type=int, metavar="JOB_ID")
+    args = parser.parse_args(argv)
+
+    queue = JobQueue()
+    if args.cancel is not None:
+        print(f"[jobs] job {args.cancel} {'cancelled' if queue.cancel(args.cancel) else 'is not queued'}")
+        return []
+    print("[jobs] " + ", ".join(f"{state} {n}" for state, n in queue.counts().items()))
+    jobs = queue.list(args.state, args.limit)
+    for job in jobs:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(job.run_at))
+        label = job.payload.get("topic") or job.payload.get("video")
+        line = f"  {job.id:>5} {job.state:<9} p{job.priority:<3} {job.kind:<7} {when}  {label}"
+        if job.error:
+            line += f"  ({job.error[:80]})"
+        print(line)
+    return [job.to_dict() for job in jobs]
@@ -0,0 +1,123 @@
+"""Dependency graph for crew tasks.
+
+Builds a DAG from each task's `context` and groups tasks into waves that
+can run at the same time. Tasks in one wave never share an agent or an
+`output_file`, so concurrent execution cannot interleave their writes.
+Waves are ordered by declaration, which keeps every run's schedule the same.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class TaskNode:
+    name: str
+    deps: list[str] = field(default_factory=list)
+    agent: Optional[str] = None
+    output_file: Optional[str] = None
+
+
+def task_nodes(tasks) -> list[TaskNode]:
+    """Describe crewAI tasks as graph nodes.
+
+    A task with an explicit `context` depends on exactly those tasks. A task
+    without one gets the previous task's output under sequential execution,
+    so it depends on the task declared before it.
+    """
+    nodes = []
+    for index, task in enumerate(tasks):
+        name = getattr(task, "name", None) or f"task_{index}"
+        context = getattr(task, "context", None)
+        if isinstance(context, list):
+            deps = [getattr(t, "name", None) for t in context]
+        elif context is None or index == 0:
+            deps = []
+        else:
+            deps = [nodes[-1].name]
+        agent = getattr(task, "agent", None)
+        nodes.append(TaskNode(
+            name=name,
+            deps=[d for d in deps if d],
+            agent=getattr(agent, "role", None) if agent is not None else None,
+            output_file=getattr(task, "output_file", None),
+        ))
+    return nodes
+
+
+def plan_waves(nodes: list[TaskNode]) -> list[list[str]]:
+    """Group tasks into ordered waves whose members have no dependencies on each other."""
+    by_name = {node.name: node for node in nodes}
+    level: dict[str, int] = {}
+    for node in nodes:
+        missing = [d for d in node.deps if d not in level]
+        if missing:
+            raise ValueError(f"Task '{node.name}' depends on {missing}, which are not declared before it.")
+        level[node.name] = 1 + max((level[d] for d in node.deps), default=-1)
+
+    waves: list[list[str]] = []
+    for depth in range(max(level.values(), default=-1) + 1):
+        members = [node.name for node in nodes if level[node.name] == depth]
+        # Split members that would clash on an agent or an output file into later sub-waves.
+        while members:
+            wave, agents, outputs, rest = [], set(), set(), []
+            for name in members:
+                node = by_name[name]
+                if (node.agent and node.agent in agents) or (node.output_file and node.output_file in outputs):
+                    rest.append(name)
+                    continue
+                wave.append(name)
+                agents.add(node.agent)
+                outputs.add(node.output_file)
+            waves.append(wave)
+            members = rest
+    return waves
+
+
+def async_flags(waves: list[list[str]]) -> dict[str, bool]:
+    """Map each task to crewAI's `async_execution` so that each wave runs concurrently.
+
+    crewAI starts async tasks in the background and makes the next sync task
+    wait for all of them, so a multi-task wave is marked async and the first
+    task after it stays sync as the barrier. A crew may not end with more
+    than one async task, so the final wave always runs sequentially.
+    """
+    flags: dict[str, bool] = {}
+    barrier_needed = False
+    for index, wave in enumerate(waves):
+        final = index == len(waves) - 1
+        for position, name in enumerate(wave):
+            if barrier_needed and position == 0:
+                flags[name] = False
+                barrier_needed = False
+            else:
+                flags[name] = len(wave) > 1 and not final
+        barrier_needed = barrier_needed or any(flags[name] for name in wave)
+    return flags
+
+
+def critical_path(nodes: list[TaskNode], durations: Optional[dict[str, float]] = None) -> tuple[list[str], float]:
+    """Return the longest dependency chain and its total duration.
+
+    Without `durations` every task counts as 1, giving the longest chain by
+    task count.
+    """
+    durations = durations or {}
+    best: dict[str, tuple[float, list[str]]] = {}
+    for node in nodes:
+        cost = durations.get(node.name, 1.0)
+        prefix = max((best[d] for d in node.deps if d in best), key=lambda item: item[0], default=(0.0, []))
+        best[node.name] = (prefix[0] + cost, prefix[1] + [node.name])
+    if not best:
+        return [], 0.0
+    total, path = max(best.values(), key=lambda item: item[0])
+    return path, total
+
+
+def describe_plan(waves: list[list[str]], flags: dict[str, bool]) -> str:
+    lines = []
+    for index, wave in enumerate(waves, 1):
+        parts = [f"{name}{' (async)' if flags.get(name) else ''}" for name in wave]
+        lines.append(f"  wave {index}: " + " | ".join(parts))
+    return "\n".join(lines)
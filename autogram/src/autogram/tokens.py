@@ -0,0 +1,96 @@
+"""Token counting and token-bounded text splitting.
+
+Uses tiktoken when it is installed and falls back to a ~4 characters per
+token estimate otherwise, which is close enough for budgeting prompts.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except Exception:
+    tiktoken = None
+
+
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        pass
+    except Exception:
+        # The BPE files are downloaded on first use; offline, estimate instead.
+        return None
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Return the number of tokens `text` uses for `model` (estimated without tiktoken)."""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _split_words(text: str, max_tokens: int, model: str) -> list[str]:
+    pieces, current, current_tokens = [], [], 0
+    for word in text.split():
+        word_tokens = count_tokens(" " + word, model)
+        if current and current_tokens + word_tokens > max_tokens:
+            pieces.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(word)
+        current_tokens += word_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> list[str]:
+    """Split `text` into chunks of at most ~max_tokens tokens.
+
+    Breaks on paragraph boundaries where possible, then sentences, then words,
+    so chunks stay readable for the model.
+    """
+    units = []
+    for paragraph in (p.strip() for p in text.split('\n\n')):
+        if not paragraph:
+            continue
+        if count_tokens(paragraph, model) <= max_tokens:
+            units.append(paragraph)
+            continue
+        for sentence in split_sentences(paragraph):
+            if count_tokens(sentence, model) <= max_tokens:
+                units.append(sentence)
+            else:
+                units.extend(_split_words(sentence, max_tokens, model))
+
+    chunks, current, current_tokens = [], [], 0
+    for unit in units:
+        unit_tokens = count_tokens(unit, model)
+        if current and current_tokens + unit_tokens > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
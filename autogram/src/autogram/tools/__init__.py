@@ -0,0 +1,56 @@
+"""Autogram tools.
+
+Tool modules pull in heavy SDKs (crewai_tools, google.genai, openai), so
+they are imported lazily: `tool_functions["veo_tool"]` imports
+`autogram.tools.veo_tool` the first time it is looked up.
+`tool_functions.lazy("veo_tool", ...)` goes one step further and returns a
+proxy that only builds the tool when an agent first calls it (see
+`autogram.tools.lazy`).
+"""
+from __future__ import annotations
+
+import importlib
+from collections.abc import Mapping
+
+
+TOOL_PATHS = {
+    "veo_tool": "autogram.tools.veo_tool:VeoTool",
+    "collector_tool": "autogram.tools.collector_tool:CollectorTool",
+    "multi_collector_tool": "autogram.tools.collector_tool:MultiCollectorTool",
+    "summarizer_tool": "autogram.tools.summarizer_tool:SummarizerTool",
+    "formatter_tool": "autogram.tools.formatter_tool:FormatterTool",
+    "serper_dev_tool": "crewai_tools:SerperDevTool",
+}
+
+
+class LazyToolRegistry(Mapping):
+    """Read-only mapping of tool name -> tool class that imports each class on first access."""
+
+    def __init__(self, paths: dict[str, str]):
+        self._paths = dict(paths)
+        self._loaded: dict[str, type] = {}
+
+    def __getitem__(self, name: str) -> type:
+        if name not in self._loaded:
+            module_name, _, attr = self._paths[name].partition(":")
+            self._loaded[name] = getattr(importlib.import_module(module_name), attr)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def lazy(self, name: str, **kwargs):
+        """A LazyTool standing in for `self[name](**kwargs)`."""
+        from autogram.tools.lazy import LazyTool
+        return LazyTool.for_tool(name, **kwargs)
+
+    def loaded(self) -> list[str]:
+        return list(self._loaded)
+
+
+tool_functions = LazyToolRegistry(TOOL_PATHS)
+
+__all__ = ["LazyToolRegistry", "TOOL_PATHS", "tool_functions"]
@@ -1,62 +1,266 @@
 from crewai.tools import BaseTool
 from pydantic import BaseModel, Field
-from typing import Type
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Type, Union
 import os
-import requests
+import threading
 
+from autogram import dedupe, ratelimit
+from autogram.cache import SQLiteCache, cache_dir
+from autogram.http_pool import get_session
+from autogram.pages import Page, fetch_pages
+from autogram.tracing import span, traced
 
 
+SERPER_URL = os.environ.get('SERPER_URL', "https://google.serper.dev/search")
+MAX_WORKERS = 8
+
+# Deep mode reads the top COLLECT_DEEP_PAGES result pages (per query) instead of returning snippets.
+COLLECT_DEEP = os.environ.get('COLLECT_DEEP', 'false').lower() in ('1', 'true', 'yes')
+COLLECT_DEEP_PAGES = int(os.environ.get('COLLECT_DEEP_PAGES', 3))
+
+# Shared across every CollectorTool instance in the process; created on first use.
+_search_cache: Optional[SQLiteCache] = None
+_search_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SQLiteCache]:
+    """Return the persistent Serper response cache, or None if SERPER_CACHE is disabled.
+
+    Configure with SERPER_CACHE_TTL (seconds, default one day) and
+    SERPER_CACHE_MAX_ENTRIES (default 1000).
+    """
+    global _search_cache
+    if os.environ.get('SERPER_CACHE', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _search_cache_lock:
+        if _search_cache is None:
+            _search_cache = SQLiteCache(
+                cache_dir() / 'serper.sqlite3',
+                ttl=float(os.environ.get('SERPER_CACHE_TTL', 86400)),
+                max_entries=int(os.environ.get('SERPER_CACHE_MAX_ENTRIES', 1000)),
+            )
+        return _search_cache
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def get_serper_key() -> Optional[str]:
+    return os.environ.get('SERPER_API_KEY') or os.environ.get('SERPER_KEY')
+
+
+def extract_snippets(data, num_results: int) -> list[tuple[str, Optional[str]]]:
+    """Pull (text, link) pairs out of a Serper response."""
+    snippets = []
+    if isinstance(data, dict):
+        for section in ('organic', 'items', 'results'):
+            if section in data and isinstance(data[section], list):
+                for item in data[section][:num_results]:
+                    if isinstance(item, dict):
+                        text = item.get('snippet') or item.get('description') or item.get('title') or ''
+                        link = item.get('link') or item.get('url')
+                        if text:
+                            snippets.append((text, link))
+                break
+    return snippets
+
+
+def format_snippet(text: str, link: Union[str, List[str], None]) -> str:
+    links = [link] if isinstance(link, str) else [l for l in (link or []) if l]
+    if not links:
+        return text
+    if len(links) == 1:
+        return f"{text} (source: {links[0]})"
+    return f"{text} (sources: {', '.join(links)})"
+
+
+def format_page(page: Page, snippet: dedupe.Snippet) -> str:
+    """A fetched page as a titled section, keeping every source link of its snippet."""
+    title = page.title or snippet.text
+    return f"{title}\n\n{page.text}\n" + format_snippet("", snippet.links).strip()
+
+
+def read_pages(snippets: List[dedupe.Snippet], per_group: int = COLLECT_DEEP_PAGES) -> Dict[str, Page]:
+    """Fetch the first web link of the top `per_group` snippets of each group concurrently.
+
+    Returns the pages that yielded text, by URL; the rest keep their snippet.
+    """
+    urls, taken = [], Counter()
+    for snippet in snippets:
+        link = next((l for l in snippet.links if l.startswith(('http://', 'https://'))), None)
+        if link and link not in urls and taken[snippet.group] < per_group:
+            urls.append(link)
+            taken[snippet.group] += 1
+    if not urls:
+        return {}
+    with span("collector.pages", pages=len(urls)) as s:
+        pages = fetch_pages(urls)
+        read = {page.url: page for page in pages if page.text}
+        s.set(read=len(read), bytes=sum(page.bytes for page in pages))
+    for page in pages:
+        if page.url not in read:
+            print(f"[collector] could not read {page.url}: {page.error or 'no text found'}")
+    return read
+
+
+def render_collected(snippets: List[dedupe.Snippet], pages: Dict[str, Page]) -> List[str]:
+    out = []
+    for snippet in snippets:
+        page = next((pages[l] for l in snippet.links if l in pages), None)
+        out.append(format_page(page, snippet) if page else format_snippet(snippet.text, snippet.links))
+    return out
+
+
+def dedupe_collected(snippets: List[dedupe.Snippet]) -> List[dedupe.Snippet]:
+    """Drop near-duplicate snippets (see autogram.dedupe), reporting the tokens saved."""
+    if not dedupe.enabled() or len(snippets) < 2:
+        return snippets
+    with span("collector.dedupe", snippets=len(snippets)) as s:
+        result = dedupe.dedupe_snippets(snippets)
+        s.set(dropped=result.dropped, tokens_saved=result.tokens_saved)
+    if result.dropped:
+        print(f"[collector] dropped {result.dropped} near-duplicate snippet(s), "
+              f"~{result.tokens_saved} of {result.tokens_before} tokens saved")
+    return result.kept
 
 
 class CollectorToolInput(BaseModel):
     """Input schema for CollectorTool."""
     query: str = Field(..., description="Search query or URL to collect from")
     num_results: int = Field(3, description="Number of results to return")
+    deep: Optional[bool] = Field(
+        None, description="Also read the top result pages and return their main text instead of short snippets "
+                          "(default: COLLECT_DEEP)")
 
 
 class CollectorTool(BaseTool):
     name: str = "web_collector"
     description: str = (
-        "Collect web content using Serper (accepts SERPER_API_KEY or SERPER_KEY in environment)."
+        "Collect web content using Serper (accepts SERPER_API_KEY or SERPER_KEY in environment). "
+        "With deep=true the top result pages are read and their main text returned, which usually "
+        "answers a research question without further searches."
     )
     args_schema: Type[BaseModel] = CollectorToolInput
 
-    def _run(self, query: str, num_results: int = 3) -> str:
-    
-        key = os.environ.get('SERPER_API_KEY') or os.environ.get('SERPER_KEY')
+    @traced("tool.web_collector")
+    def _run(self, query: str, num_results: int = 3, deep: Optional[bool] = None) -> str:
+
+        key = get_serper_key()
         if not key:
             return "ERROR: SERPER API key not set. Set SERPER_API_KEY or SERPER_KEY in autogram/.env or the shell."
 
-        url = "https://google.serper.dev/search"
-        headers = {"X-API-KEY": key, "Content-Type": "application/json"}
-        payload = {"q": query, "num": num_results}
-
         try:
-            resp = requests.post(url, json=payload, headers=headers, timeout=15)
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._search(query, num_results, key)
         except Exception as e:
             return f"ERROR: failed to fetch from Serper: {e}"
 
-     
-        snippets = []
         try:
-            if isinstance(data, dict):
-               
-                for section in ('organic', 'items', 'results'):
-                    if section in data and isinstance(data[section], list):
-                        for item in data[section][:num_results]:
-                            if isinstance(item, dict):
-                                text = item.get('snippet') or item.get('description') or item.get('title') or ''
-                                link = item.get('link') or item.get('url')
-                                if text:
-                                    snippets.append(text + (f" (source: {link})" if link else ""))
-                        break
-
-           
+            found = [dedupe.Snippet(text, [link] if link else []) for text, link in extract_snippets(data, num_results)]
+            kept = dedupe_collected(found)
+            pages = read_pages(kept) if (COLLECT_DEEP if deep is None else deep) else {}
+            snippets = render_collected(kept, pages)
             if not snippets:
                 snippets.append(str(data)[:2000])
         except Exception:
-            snippets.append(str(data))
+            snippets = [str(data)]
 
         return "\n\n".join(snippets)
+
+    def collect_many(self, queries: List[str], num_results: int = 3, max_workers: int = MAX_WORKERS,
+                     deep: Optional[bool] = None) -> str:
+        """Run several searches concurrently and merge the results.
+
+        Searches share one pooled session, so the batch takes roughly as long as
+        the slowest query. Snippets keep their source link and are grouped by
+        query; a link already reported under an earlier query is not repeated,
+        and near-duplicate snippets are merged into the first one seen. With
+        `deep`, the top pages of every query are read in one concurrent batch.
+        """
+        key = get_serper_key()
+        if not key:
+            return "ERROR: SERPER API key not set. Set SERPER_API_KEY or SERPER_KEY in autogram/.env or the shell."
+
+        queries = [q for q in queries if q and q.strip()]
+        if not queries:
+            return "ERROR: no queries provided."
+
+        def fetch(query):
+            try:
+                return self._search(query, num_results, key), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+            results = list(pool.map(fetch, queries))
+
+        seen_links = set()
+        found = []
+        for query, (data, error) in zip(queries, results):
+            if error is not None:
+                continue
+            for text, link in extract_snippets(data, num_results):
+                if link and link in seen_links:
+                    continue
+                if link:
+                    seen_links.add(link)
+                found.append(dedupe.Snippet(text, [link] if link else [], group=query))
+        kept = dedupe_collected(found)
+        pages = read_pages(kept) if (COLLECT_DEEP if deep is None else deep) else {}
+        by_query = {}
+        for snippet, text in zip(kept, render_collected(kept, pages)):
+            by_query.setdefault(snippet.group, []).append(text)
+
+        sections = []
+        for query, (data, error) in zip(queries, results):
+            if error is not None:
+                sections.append(f"### {query}\n\nERROR: failed to fetch from Serper: {error}")
+                continue
+            sections.append(f"### {query}\n\n" + ("\n\n".join(by_query.get(query, [])) or "No results."))
+
+        return "\n\n".join(sections)
+
+    def _search(self, query: str, num_results: int, key: str):
+        """POST the query to Serper, serving repeats from the persistent cache."""
+        cache = get_search_cache()
+        cache_key = f"{num_results}:{normalize_query(query)}"
+        if cache is not None:
+            data = cache.get(cache_key)
+            if data is not None:
+                return data
+
+        headers = {"X-API-KEY": key, "Content-Type": "application/json"}
+        payload = {"q": query, "num": num_results}
+
+        with span("serper.search", num_results=num_results):
+            resp = ratelimit.call("serper", get_session("serper").post, SERPER_URL, json=payload, headers=headers, timeout=15)
+            resp.raise_for_status()
+            data = resp.json()
+
+        if cache is not None:
+            cache.set(cache_key, data)
+        return data
+
+
+class MultiCollectorToolInput(BaseModel):
+    """Input schema for MultiCollectorTool."""
+    queries: List[str] = Field(..., description="Search queries to run in parallel")
+    num_results: int = Field(3, description="Number of results to return per query")
+    deep: Optional[bool] = Field(
+        None, description="Also read the top result pages of each query and return their main text "
+                          "(default: COLLECT_DEEP)")
+
+
+class MultiCollectorTool(BaseTool):
+    name: str = "web_multi_collector"
+    description: str = (
+        "Run several Serper web searches at once and return merged, source-attributed snippets. "
+        "Prefer this over repeated web_collector calls when a research step needs multiple searches."
+    )
+    args_schema: Type[BaseModel] = MultiCollectorToolInput
+
+    @traced("tool.web_multi_collector")
+    def _run(self, queries: List[str], num_results: int = 3, deep: Optional[bool] = None) -> str:
+        return CollectorTool().collect_many(queries, num_results=num_results, deep=deep)
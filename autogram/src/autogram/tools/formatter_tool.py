@@ -1,8 +1,11 @@
 from crewai.tools import BaseTool #type:ignore
 from pydantic import BaseModel, Field
-from typing import Type
+from typing import Iterable, Iterator, Type
+import re
 import textwrap
 
+from autogram.tracing import traced
+
 
 class FormatterToolInput(BaseModel):
     text: str = Field(..., description="Text to format")
@@ -14,6 +17,7 @@ class FormatterTool(BaseTool):
     description: str = "Format text into Markdown or plain text for display."
     args_schema: Type[BaseModel] = FormatterToolInput
 
+    @traced("tool.formatter")
     def _run(self, text: str, style: str = 'markdown') -> str:
         if style == 'plain':
             return textwrap.fill(text, width=80)
@@ -25,3 +29,86 @@ class FormatterTool(BaseTool):
             md.append(p)
 
         return "\n\n".join(md)
+
+    def format_stream(self, chunks: Iterable[str], style: str = 'markdown') -> Iterator[str]:
+        """Format text arriving in pieces (e.g. a SummaryStream), yielding output as soon as it is final.
+
+        The joined output equals `_run` on the joined input.
+        """
+        if style == 'plain':
+            yield from _wrap_stream(chunks, width=80)
+        else:
+            yield from _paragraph_stream(chunks)
+
+
+def _paragraph_stream(chunks: Iterable[str]) -> Iterator[str]:
+    # Whitespace is held back until the next word shows whether it is a paragraph break.
+    pending, started = "", False
+    for chunk in chunks:
+        for piece in re.findall(r"\s+|\S+", chunk):
+            if piece.isspace():
+                pending += piece
+                continue
+            if started:
+                yield "\n\n" if "\n\n" in pending else pending
+            pending, started = "", True
+            yield piece
+
+
+def _expand_tabs(chunks: Iterable[str], tabsize: int = 8) -> Iterator[str]:
+    # str.expandtabs() on each piece would lose the column carried over from the previous one.
+    column = 0
+    for chunk in chunks:
+        out = []
+        for ch in chunk:
+            if ch == "\t":
+                out.append(" " * (tabsize - column % tabsize))
+                column += tabsize - column % tabsize
+            else:
+                out.append(ch)
+                column = 0 if ch in "\r\n" else column + 1
+        yield "".join(out)
+
+
+def _wrap_stream(chunks: Iterable[str], width: int) -> Iterator[str]:
+    """textwrap.fill(text, width) over text that arrives in pieces, one finished line at a time.
+
+    Wrapping is greedy, so a line is final once the word after it is known
+    not to fit. The last word (or run of whitespace) received so far may
+    still grow, so only the text before it is wrapped; all its lines but
+    the last are yielded. Wrapping then restarts at the unfinished line,
+    provided it begins a word; a line that starts partway through a broken
+    long or hyphenated word is re-wrapped together with the previous one.
+    """
+    wrapper = textwrap.TextWrapper(width=width)
+    text, emitted = "", 0  # text from the first line still held back; lines of it already yielded
+    for chunk in _expand_tabs(chunks):
+        text += chunk
+        settled = text[:_settled_end(text)].translate(_SPACES)
+        lines = wrapper.wrap(settled)
+        for line in lines[emitted:-1]:
+            yield line + "\n"
+        if len(lines) < 2:
+            continue
+        # textwrap drops a trailing chunk that str.strip() empties, which includes words like "\xa0".
+        body = settled.rstrip()
+        start = len(body) - len(lines[-1])
+        if (body.endswith(lines[-1]) and settled[start - 1] == " "
+                and wrapper.wrap(settled[start:]) == lines[-1:]):
+            text, emitted = text[start:], 0
+        else:
+            emitted = len(lines) - 1
+    yield "\n".join(wrapper.wrap(text)[emitted:])
+
+
+# The characters textwrap treats as spaces between words (ASCII whitespace only).
+_WHITESPACE = "\t\n\x0b\x0c\r "
+_SPACES = str.maketrans(_WHITESPACE, " " * len(_WHITESPACE))
+
+
+def _settled_end(text: str) -> int:
+    """Where the last word, or the whitespace after it, starts in `text`."""
+    end = len(text.rstrip(_WHITESPACE))
+    if end < len(text):
+        return end
+    return max(text.rfind(ch) for ch in _WHITESPACE) + 1
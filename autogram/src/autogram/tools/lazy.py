@@ -0,0 +1,66 @@
+"""Proxy tools that are built on their first call.
+
+Agents need a tool's name, description and argument schema up front, but
+not the tool itself. `LazyTool` carries those three and imports and
+constructs the real tool the first time an agent calls it, so building
+the crew does not import crewai_tools or google.genai or create a Veo
+client for agents that never get to run.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Optional, Type
+
+from crewai.tools import BaseTool  # type: ignore
+from pydantic import BaseModel, Field, PrivateAttr
+
+from autogram.tools import TOOL_PATHS, tool_functions
+
+
+class SerperSearchInput(BaseModel):
+    """Same arguments as crewai_tools' SerperDevToolSchema, without importing crewai_tools."""
+    search_query: str = Field(..., description="Mandatory search query you want to use to search the internet")
+
+
+# Metadata for tools whose module is too heavy to import just to read it.
+EXTERNAL_TOOLS: dict[str, tuple[str, str, Type[BaseModel]]] = {
+    "serper_dev_tool": (
+        "Search the internet with Serper",
+        "A tool that can be used to search the internet with a search_query. "
+        "Supports different search types: 'search' (default), 'news'",
+        SerperSearchInput,
+    ),
+}
+
+
+def _metadata(key: str) -> tuple[str, str, Type[BaseModel]]:
+    if key in EXTERNAL_TOOLS:
+        return EXTERNAL_TOOLS[key]
+    fields = tool_functions[key].model_fields
+    return fields["name"].default, fields["description"].default, fields["args_schema"].default
+
+
+class LazyTool(BaseTool):
+    """Stands in for `tool_functions[tool_key](**tool_kwargs)` until the agent first calls it."""
+
+    tool_key: str
+    tool_kwargs: dict = Field(default_factory=dict)
+    _tool: Optional[BaseTool] = PrivateAttr(default=None)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @classmethod
+    def for_tool(cls, key: str, **kwargs) -> "LazyTool":
+        if key not in TOOL_PATHS:
+            raise KeyError(key)
+        name, description, args_schema = _metadata(key)
+        return cls(name=name, description=description, args_schema=args_schema, tool_key=key, tool_kwargs=kwargs)
+
+    @property
+    def tool(self) -> BaseTool:
+        with self._lock:
+            if self._tool is None:
+                self._tool = tool_functions[self.tool_key](**self.tool_kwargs)
+            return self._tool
+
+    def _run(self, *args: Any, **kwargs: Any) -> Any:
+        return self.tool._run(*args, **kwargs)
@@ -1,7 +1,18 @@
 from crewai.tools import BaseTool #type: ignore
 from pydantic import BaseModel, Field
-from typing import Type
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, Optional, Type
+import hashlib
+import json
 import os
+import threading
+import time
+
+from autogram import ratelimit, tracing
+from autogram.cache import MemoryCache, SQLiteCache, cache_dir
+from autogram.compaction import TOKEN_BUDGET, compact
+from autogram.tokens import count_tokens, split_by_tokens
+from autogram.tracing import span, traced
 
 try:
     from openai import OpenAI
@@ -9,9 +20,114 @@ except Exception:
     OpenAI = None
 
 
+MODEL = "gpt-4o-mini"
+
+SUMMARY_PROMPT = "Summarize the following content in a concise, structured way suitable for a social media caption:\n\n"
+MAP_PROMPT = (
+    "Summarize the key facts, data and sources in the following section of a larger document. "
+    "Keep names, numbers and source links:\n\n"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive sections of one document. Merge them into a single "
+    "concise, structured summary suitable for a social media caption:\n\n"
+)
+
+# Inputs above this many tokens are summarized with map-reduce instead of one prompt.
+SINGLE_SHOT_TOKENS = int(os.environ.get('SUMMARY_SINGLE_SHOT_TOKENS', 6000))
+CHUNK_TOKENS = int(os.environ.get('SUMMARY_CHUNK_TOKENS', 3000))
+MAP_MAX_TOKENS = int(os.environ.get('SUMMARY_MAP_MAX_TOKENS', 300))
+MAX_WORKERS = int(os.environ.get('SUMMARY_MAX_WORKERS', 4))
+
+# One OpenAI client (and HTTP connection pool) per process, rebuilt only if the key changes.
+_client = None
+_client_key: Optional[str] = None
+_client_lock = threading.Lock()
+
+_memory_cache = MemoryCache(max_entries=int(os.environ.get('SUMMARY_CACHE_MAX_ENTRIES', 256)))
+_disk_cache: Optional[SQLiteCache] = None
+
+
+def get_client(key: str):
+    """Return the shared OpenAI client for `key`."""
+    global _client, _client_key
+    with _client_lock:
+        if _client is None or _client_key != key:
+            # Retries go through autogram.ratelimit so they share the per-provider budget.
+            _client = OpenAI(api_key=key, max_retries=0)
+            _client_key = key
+        return _client
+
+
+def get_disk_cache() -> Optional[SQLiteCache]:
+    """Return the on-disk completion cache when SUMMARY_CACHE_DISK is enabled.
+
+    Entries expire after SUMMARY_CACHE_TTL seconds (default one week).
+    """
+    global _disk_cache
+    if os.environ.get('SUMMARY_CACHE_DISK', 'false').lower() not in ('1', 'true', 'yes'):
+        return None
+    with _client_lock:
+        if _disk_cache is None:
+            _disk_cache = SQLiteCache(
+                cache_dir() / 'summaries.sqlite3',
+                ttl=float(os.environ.get('SUMMARY_CACHE_TTL', 7 * 86400)),
+                max_entries=int(os.environ.get('SUMMARY_CACHE_DISK_MAX_ENTRIES', 5000)),
+            )
+        return _disk_cache
+
+
+def compact_text(text: str, query: str = "", budget: int = TOKEN_BUDGET) -> str:
+    """Cut `text` to the sentences most relevant to `query` within `budget` tokens (see autogram.compaction)."""
+    with span("compaction", budget=budget) as s:
+        result = compact(text, query, budget, MODEL)
+        s.set(tokens_before=result.tokens_before, tokens_after=result.tokens_after)
+    if result.tokens_after < result.tokens_before:
+        print(f"[summarizer] compacted input {result.tokens_before} -> {result.tokens_after} tokens "
+              f"({result.sentences_kept}/{result.sentences_total} sentences)")
+    return result.text
+
+
+def completion_key(model: str, prompt: str, max_tokens: int) -> str:
+    payload = json.dumps({"model": model, "prompt": prompt, "max_tokens": max_tokens}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SummaryStream:
+    """A summary as it is generated: iterate it (once) for the text deltas.
+
+    `text`, `ttft` (seconds until the first delta) and `total` (seconds for
+    the whole generation, including any map step) fill in as the stream is
+    consumed, and `on_token(delta)` is called for every delta.
+    """
+
+    def __init__(self, deltas: Iterator[str], on_token: Optional[Callable[[str], None]] = None):
+        self._deltas = deltas
+        self.on_token = on_token
+        self.parts: list[str] = []
+        self.ttft: Optional[float] = None
+        self.total: Optional[float] = None
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.monotonic()
+        for delta in self._deltas:
+            if self.ttft is None:
+                self.ttft = time.monotonic() - start
+            self.parts.append(delta)
+            if self.on_token is not None:
+                self.on_token(delta)
+            yield delta
+        self.total = time.monotonic() - start
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+
 class SummarizerToolInput(BaseModel):
     text: str = Field(..., description="Text to summarize")
     max_tokens: int = Field(100, description="Maximum tokens for the summary") #Cap at 100 for short videos
+    mode: str = Field('auto', description="'single', 'map_reduce', or 'auto' to pick based on input length")
+    query: Optional[str] = Field(None, description="Task or topic; when given, the text is first cut down to the sentences most relevant to it")
 
 
 class SummarizerTool(BaseTool):
@@ -19,7 +135,8 @@ class SummarizerTool(BaseTool):
     description: str = "Summarize provided text using OpenAI (requires OPENAI_API_KEY)."
     args_schema: Type[BaseModel] = SummarizerToolInput
 
-    def _run(self, text: str, max_tokens: int = 100) -> str:
+    @traced("tool.summarizer")
+    def _run(self, text: str, max_tokens: int = 100, mode: str = 'auto', query: Optional[str] = None) -> str:
         key = os.environ.get('OPENAI_API_KEY')
         if not key:
             return "ERROR: OPENAI_API_KEY not set in environment. Set OPENAI_API_KEY in autogram/.env or the shell."
@@ -27,20 +144,101 @@ class SummarizerTool(BaseTool):
         if OpenAI is None:
             return "ERROR: openai package is not available in the environment."
 
+        if query:
+            text = compact_text(text, query)
+
         try:
-            client = OpenAI(api_key=key)
-            prompt = (
-                "Summarize the following content in a concise, structured way suitable for a social media caption:\n\n"
-                + text
-            )
-            resp = client.chat.completions.create(
-                model="gpt-4o-mini",
+            return self._complete(key, self._final_prompt(key, text, max_tokens, mode), max_tokens)
+        except Exception as e:
+            return f"ERROR: openai summary failed: {e}"
+
+    def stream(self, text: str, max_tokens: int = 100, mode: str = 'auto', query: Optional[str] = None,
+               on_token: Optional[Callable[[str], None]] = None) -> SummaryStream:
+        """Like `_run`, but return the summary as a SummaryStream of text deltas.
+
+        Nothing is requested until the stream is iterated. Errors are raised
+        (RuntimeError for missing configuration) instead of returned as text.
+        """
+        key = os.environ.get('OPENAI_API_KEY')
+        if not key:
+            raise RuntimeError("OPENAI_API_KEY not set in environment. Set OPENAI_API_KEY in autogram/.env or the shell.")
+        if OpenAI is None:
+            raise RuntimeError("openai package is not available in the environment.")
+
+        def deltas() -> Iterator[str]:
+            body = compact_text(text, query) if query else text
+            with span("tool.summarizer", stream=True):
+                yield from self._stream_complete(key, self._final_prompt(key, body, max_tokens, mode), max_tokens)
+
+        return SummaryStream(deltas(), on_token)
+
+    def _final_prompt(self, key: str, text: str, max_tokens: int, mode: str) -> str:
+        """The prompt whose completion is the summary; long inputs get their map step run first."""
+        if mode == 'map_reduce' or (mode == 'auto' and count_tokens(text, MODEL) > SINGLE_SHOT_TOKENS):
+            return self._reduce_prompt(key, text, max_tokens)
+        return SUMMARY_PROMPT + text
+
+    def _reduce_prompt(self, key: str, text: str, max_tokens: int) -> str:
+        """Summarize token-sized chunks concurrently; return the prompt that merges the partial summaries."""
+        chunks = split_by_tokens(text, CHUNK_TOKENS, MODEL)
+        if len(chunks) <= 1:
+            return SUMMARY_PROMPT + text
+
+        map_tokens = max(max_tokens, MAP_MAX_TOKENS)
+        with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(chunks)))) as pool:
+            partials = list(pool.map(lambda chunk: self._complete(key, MAP_PROMPT + chunk, map_tokens), chunks))
+
+        merged = "\n\n".join(f"Section {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+        # Very large inputs can produce partials that still overflow one prompt; reduce them recursively.
+        if count_tokens(merged, MODEL) > SINGLE_SHOT_TOKENS:
+            return self._reduce_prompt(key, merged, max_tokens)
+        return REDUCE_PROMPT + merged
+
+    def _complete(self, key: str, prompt: str, max_tokens: int) -> str:
+        """Return the completion for `prompt`, memoized by model, prompt and max_tokens."""
+        return "".join(self._stream_complete(key, prompt, max_tokens))
+
+    def _stream_complete(self, key: str, prompt: str, max_tokens: int) -> Iterator[str]:
+        """Yield the completion for `prompt` as it arrives; a cached completion comes as one delta.
+
+        Time to first token is set on the `openai.chat` span and recorded as
+        an `openai.ttft` span of its own, so `autogram stats` reports both.
+        """
+        cache_key = completion_key(MODEL, prompt, max_tokens)
+        cached = _memory_cache.get(cache_key)
+        disk = get_disk_cache()
+        if cached is None and disk is not None:
+            cached = disk.get(cache_key)
+            if cached is not None:
+                _memory_cache.set(cache_key, cached)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        with span("openai.chat", model=MODEL, max_tokens=max_tokens) as s:
+            start = time.monotonic()
+            stream = ratelimit.call(
+                "openai",
+                get_client(key).chat.completions.create,
+                model=MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=max_tokens,
+                stream=True,
             )
-         
-            if hasattr(resp, 'choices') and resp.choices:
-                return resp.choices[0].message.content
-            return str(resp)
-        except Exception as e:
-            return f"ERROR: openai summary failed: {e}"
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                if not parts:
+                    ttft = time.monotonic() - start
+                    s.set(ttft=round(ttft, 4))
+                    tracing.record("openai.ttft", ttft, model=MODEL)
+                parts.append(delta)
+                yield delta
+
+        content = "".join(parts)
+        if content:
+            _memory_cache.set(cache_key, content)
+            if disk is not None:
+                disk.set(cache_key, content)
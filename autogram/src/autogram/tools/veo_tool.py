@@ -1,14 +1,67 @@
 # autogram/tools/veo_tool.py
 
-import time
-from typing import Any, Optional, Type
+from typing import Any, Iterator, List, Optional, Type
 
 from pydantic import BaseModel, Field
 from crewai.tools.base_tool import BaseTool
-from google import genai
 
 import os
+import time
+
+from autogram.artifacts import VideoArtifactStore, artifact_key, place_file
+from autogram.cloudinary_upload import file_sha256
+from autogram.downloads import stream_download, write_atomic
+from autogram.mp4 import MP4Error, concat, ensure_faststart
+from autogram.prompts import split_scenes
+from autogram.tracing import span, traced
+from autogram.veo_jobs import DONE, VEO_MODEL, VeoJob, VeoJobManager
+
+
+# Hard limit for a single render; Veo usually finishes in a few minutes.
+VEO_TIMEOUT = float(os.environ.get('VEO_TIMEOUT', 900))
+
+# Render "Scene N" sections of a script as separate clips in parallel and join them.
+VEO_SEGMENTED = os.environ.get('VEO_SEGMENTED', 'false').lower() in ('1', 'true', 'yes')
+VEO_MAX_SCENES = int(os.environ.get('VEO_MAX_SCENES', 4))
+
+# Generation parameters that affect the output; part of the artifact cache key.
+VEO_PARAMS: dict = {}
+
+_artifact_store: Optional[VideoArtifactStore] = None
+
+
+def render_params(scenes: int) -> dict:
+    """Artifact key params for a prompt rendered as `scenes` clips.
+
+    Keeps a stitched video from being served for a whole-prompt render, or
+    for the same script split into a different number of scenes.
+    """
+    return {**VEO_PARAMS, "segmented": scenes} if scenes > 1 else VEO_PARAMS
+
 
+def scene_params() -> dict:
+    """Artifact key params for one scene clip of a segmented render, kept apart from whole-prompt renders."""
+    return {**VEO_PARAMS, "scene": True}
+
+
+def get_artifact_store() -> Optional[VideoArtifactStore]:
+    """Return the shared rendered-video store, or None if VEO_CACHE is disabled."""
+    global _artifact_store
+    if os.environ.get('VEO_CACHE', 'true').lower() not in ('1', 'true', 'yes'):
+        return None
+    if _artifact_store is None:
+        _artifact_store = VideoArtifactStore()
+    return _artifact_store
+
+
+class VeoToolSchema(BaseModel):
+    prompt: Optional[str] = Field(None, description="Text prompt describing the video")
+    from_file: Optional[str] = Field(None, description="Path to a text file (e.g. report.md) containing the prompt")
+    output_file: str = Field("autogram_output.mp4", description="Where to save the generated MP4")
+    force: bool = Field(False, description="Render again even if this prompt was rendered before")
+    segmented: Optional[bool] = Field(
+        None, description="Render each 'Scene N' of the script as its own clip in parallel and join them "
+                          "(default: VEO_SEGMENTED)")
 
 
 # -------------------------
@@ -16,12 +69,14 @@ import os
 # -------------------------
 class VeoTool(BaseTool):
     name: str = "veo_tool"
-    description: str = "Generates a video using Google Veo 3 based on a text prompt or script file."
+    description: str = ("Generates a video using Google Veo 3 based on a text prompt or script file. "
+                        "Scripts split into 'Scene N' sections can be rendered scene by scene in parallel.")
     args_schema: Type[BaseModel] = VeoToolSchema
 
     # Runtime fields
     api_key: Optional[str] = None
     client: Optional[Any] = None
+    jobs: Optional[Any] = None
 
     def __init__(self, api_key: Optional[str] = None):
         # Initialize BaseTool (pydantic) default behavior
@@ -35,17 +90,27 @@ class VeoTool(BaseTool):
             return
 
         try:
-            self.client = genai.Client(api_key=self.api_key)
+            from google import genai  # imported here so reading the tool's metadata stays cheap
+
+            base_url = os.environ.get('VEO_BASE_URL')
+            http_options = {'base_url': base_url} if base_url else None
+            self.client = genai.Client(api_key=self.api_key, http_options=http_options)
+            self.jobs = VeoJobManager(self.client)
         except Exception:
             # If client creation fails, set client to None and allow _run to raise
             self.client = None
 
-    def _run(self, prompt: str | None = None, from_file: str | None = None, output_file: str = "autogram_output.mp4") -> str:
-        """l
+    @traced("tool.veo")
+    def _run(self, prompt: str | None = None, from_file: str | None = None, output_file: str = "autogram_output.mp4",
+             force: bool = False, segmented: bool | None = None) -> str:
+        """
         CrewAI will call this method internally when the agent uses the tool.
 
         Provide either `prompt` or `from_file` (path to a text file containing the prompt).
-        Returns the path to the generated video file.
+        Returns the path to the generated video file. A prompt that was rendered
+        before is served from the local artifact store unless `force` is set.
+        With `segmented`, a script with "Scene N" headings is rendered one
+        clip per scene, concurrently, and the clips are joined losslessly.
         """
 
         # Load from script file if needed
@@ -56,24 +121,133 @@ class VeoTool(BaseTool):
         if not prompt:
             raise ValueError("No prompt provided to VeoTool. Provide prompt or from_file.")
 
+        if segmented is None:
+            segmented = VEO_SEGMENTED
+        scenes = split_scenes(prompt, VEO_MAX_SCENES) if segmented else [prompt]
+
+        if not force and self._from_cache(prompt, output_file, render_params(len(scenes))):
+            return output_file
+
+        if len(scenes) > 1:
+            return self._render_scenes(prompt, scenes, output_file, force)
+
         print("Generating video…")
 
-        operation = self.client.models.generate_videos(
-            model="veo-3.1-generate-preview",
-            prompt=prompt,
-        )
+        job_id = self._jobs().submit(prompt, timeout=VEO_TIMEOUT, output_file=output_file)
+        job = self._jobs().wait(job_id)
+        if job.status != DONE:
+            raise RuntimeError(f"Veo generation {job.status}: {job.error}")
 
-        while not operation.done:
-            print("Waiting for video generation to complete...")
-            time.sleep(10)
-            operation = self.client.operations.get(operation)
+        return self._save(job, output_file)
 
-        generated_video = operation.response.generated_videos[0]
-        file_bytes = self.client.files.download(file=generated_video.video)
+    def generate_many(self, prompts: List[str], output_files: Optional[List[str]] = None,
+                      timeout: Optional[float] = VEO_TIMEOUT,
+                      force: bool = False) -> Iterator[tuple[Optional[VeoJob], Optional[str]]]:
+        """Render several prompts concurrently and yield (job, path) as each one finishes.
 
-        with open(output_file, "wb") as f:
-            f.write(file_bytes)
+        `path` is None when the job failed, timed out or was cancelled; the
+        reason is in `job.error`. Cached prompts are yielded first with `job`
+        set to None.
+        """
+        if output_files is None:
+            output_files = [f"autogram_output_{i}.mp4" for i in range(1, len(prompts) + 1)]
+        if len(output_files) != len(prompts):
+            raise ValueError("output_files must match prompts one-to-one.")
+
+        jobs = self._jobs()
+        job_ids = []
+        for prompt, output_file in zip(prompts, output_files):
+            if not force and self._from_cache(prompt, output_file):
+                yield None, output_file
+                continue
+            job_ids.append(jobs.submit(prompt, timeout=timeout, output_file=output_file))
+
+        for job in jobs.as_completed(job_ids):
+            if job.status != DONE:
+                print(f"Veo job {job.job_id} {job.status}: {job.error}")
+                yield job, None
+                continue
+            try:
+                yield job, self._save(job, job.meta["output_file"])
+            except Exception as e:
+                job.error = f"download failed: {e}"
+                yield job, None
+
+    def _render_scenes(self, prompt: str, scenes: List[str], output_file: str, force: bool = False) -> str:
+        """Render `scenes` concurrently and join the clips into `output_file` without re-encoding."""
+        stem, ext = os.path.splitext(output_file)
+        clips = [f"{stem}.scene{i}{ext or '.mp4'}" for i in range(1, len(scenes) + 1)]
+        print(f"Generating video as {len(scenes)} scenes…")
+
+        jobs = self._jobs()
+        pending = {}
+        for scene, clip in zip(scenes, clips):
+            if force or not self._from_cache(scene, clip, scene_params()):
+                pending[jobs.submit(scene, timeout=VEO_TIMEOUT, output_file=clip, params=scene_params())] = clip
+        try:
+            # Each wait() polls every due job, so all scenes keep rendering while we wait on one.
+            for job_id, clip in pending.items():
+                job = jobs.wait(job_id)
+                if job.status != DONE:
+                    raise RuntimeError(f"Veo generation of {os.path.basename(clip)} {job.status}: {job.error}")
+                self._save(job, clip)
+
+            with span("veo.stitch", scenes=len(clips)):
+                concat(clips, output_file)
+        except MP4Error as e:
+            raise RuntimeError(f"Could not join the scene clips ({e}); set VEO_SEGMENTED=false to render in one piece")
+        finally:
+            for job_id in pending:
+                jobs.cancel(job_id)
+            for clip in clips:
+                if os.path.exists(clip):
+                    os.remove(clip)
+        print(f"Joined {len(clips)} scenes into {output_file}")
+
+        store = get_artifact_store()
+        if store is not None:
+            params = render_params(len(scenes))
+            store.put(artifact_key(prompt, VEO_MODEL, params), output_file, prompt, VEO_MODEL, params)
+        return output_file
 
-        print(f"Video saved to {output_file}")
+    def _from_cache(self, prompt: str, output_file: str, params: Optional[dict] = None) -> bool:
+        """Place a previously rendered video for `prompt` at `output_file` if one is stored."""
+        store = get_artifact_store()
+        if store is None:
+            return False
+        entry = store.get(artifact_key(prompt, VEO_MODEL, VEO_PARAMS if params is None else params))
+        if entry is None:
+            return False
+        place_file(entry["path"], output_file)
+        print(f"Reusing cached video for this prompt: {output_file} (rendered {time.ctime(entry['created'])})")
+        return True
+
+    def _jobs(self) -> VeoJobManager:
+        if self.client is None:
+            raise RuntimeError("VeoTool has no client. Set VEO_KEY or VEO_API_KEY, or pass api_key.")
+        if self.jobs is None:
+            self.jobs = VeoJobManager(self.client, model=VEO_MODEL)
+        return self.jobs
+
+    def _save(self, job: VeoJob, output_file: str) -> str:
+        video = job.video
+        uri = getattr(video, "uri", None)
+        with span("veo.download", job_id=job.job_id):
+            if uri:
+                # Stream to disk so memory stays flat however long the video is.
+                digest = stream_download(uri, output_file, headers={"x-goog-api-key": self.api_key})
+            elif getattr(video, "video_bytes", None):
+                digest = write_atomic(video.video_bytes, output_file)
+            else:
+                digest = write_atomic(self.client.files.download(file=video), output_file)
+        if ensure_faststart(output_file):
+            digest = file_sha256(output_file)
+
+        print(f"Video saved to {output_file} ({job.elapsed:.0f}s, {job.polls} polls, sha256 {digest[:12]})")
+
+        store = get_artifact_store()
+        if store is not None:
+            params = job.meta.get("params", VEO_PARAMS)
+            store.put(artifact_key(job.prompt, VEO_MODEL, params), output_file, job.prompt, VEO_MODEL, params)
 
         return output_file
@@ -0,0 +1,209 @@
+"""Lightweight tracing of pipeline stages to a JSONL file.
+
+Set AUTOGRAM_TRACE_FILE (or call `configure`) to record one JSON line per
+timed span: stage name, start time, duration, status, run id, topic and any
+extra attributes. When tracing is off, `span()` returns a shared no-op
+object, so instrumented code pays only a function call and a None check.
+
+`autogram stats [trace.jsonl]` turns a trace file into p50/p95/p99 latency
+per stage.
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Optional
+
+
+_writer = None
+_write_lock = threading.Lock()
+_run_id: Optional[str] = None
+_topic: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("autogram_topic", default=None)
+
+
+def configure(path: Optional[str]) -> None:
+    """Start writing spans to `path` (appending), or stop tracing if `path` is None."""
+    global _writer
+    with _write_lock:
+        if _writer is not None:
+            _writer.close()
+        _writer = open(path, "a", encoding="utf-8", buffering=1) if path else None
+
+
+def enabled() -> bool:
+    return _writer is not None
+
+
+def set_run(run_id: Optional[str] = None) -> str:
+    """Set the run id attached to every span from now on (shared by all threads)."""
+    global _run_id
+    _run_id = run_id or uuid.uuid4().hex[:12]
+    return _run_id
+
+
+def set_topic(topic: Optional[str]) -> None:
+    """Set the topic attached to spans recorded by the current thread/context."""
+    _topic.set(topic)
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        if _writer is not None:
+            _writer.write(line + "\n")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "_t0")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record = {
+            "name": self.name,
+            "start": self.start,
+            "duration": time.perf_counter() - self._t0,
+            "status": "error" if exc_type else "ok",
+            "run_id": _run_id,
+            "topic": _topic.get(),
+            "thread": threading.current_thread().name,
+        }
+        if exc_type:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        record.update(self.attrs)
+        _write(record)
+        return False
+
+    def set(self, **attrs) -> None:
+        """Attach attributes discovered while the span is open (e.g. cache hits)."""
+        self.attrs.update(attrs)
+
+
+def span(name: str, **attrs: Any):
+    """Context manager timing the enclosed block as stage `name`."""
+    if _writer is None:
+        return _NOOP
+    return Span(name, attrs)
+
+
+def record(name: str, duration: float, ok: bool = True, **attrs: Any) -> None:
+    """Record a span whose duration was measured elsewhere (e.g. a whole Veo job)."""
+    if _writer is None:
+        return
+    entry = {
+        "name": name,
+        "start": time.time() - duration,
+        "duration": duration,
+        "status": "ok" if ok else "error",
+        "run_id": _run_id,
+        "topic": _topic.get(),
+        "thread": threading.current_thread().name,
+    }
+    entry.update(attrs)
+    _write(entry)
+
+
+def traced(name: str):
+    """Decorator recording each call of the wrapped function as a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _writer is None:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (pos - lower)
+
+
+def load_stats(path: str, run_id: Optional[str] = None) -> dict[str, dict]:
+    """Aggregate a trace file into per-stage count, error count and latency percentiles."""
+    durations: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if run_id and record.get("run_id") != run_id:
+                continue
+            durations[record["name"]].append(float(record["duration"]))
+            if record.get("status") == "error":
+                errors[record["name"]] += 1
+
+    stats = {}
+    for name, values in durations.items():
+        values.sort()
+        stats[name] = {
+            "count": len(values),
+            "errors": errors[name],
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1],
+            "total": sum(values),
+        }
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> dict[str, dict]:
+    parser = argparse.ArgumentParser(prog="autogram stats", description="Latency percentiles per stage from a trace file.")
+    parser.add_argument("trace", nargs="?", default=os.environ.get("AUTOGRAM_TRACE_FILE", "autogram_trace.jsonl"))
+    parser.add_argument("--run", help="only include spans from this run id")
+    args = parser.parse_args(argv)
+
+    stats = load_stats(args.trace, args.run)
+    print(f"{'stage':<28} {'count':>6} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'total':>10}")
+    for name, s in sorted(stats.items(), key=lambda item: item[1]["total"], reverse=True):
+        print(
+            f"{name:<28} {s['count']:>6} {s['errors']:>6} {s['p50']:>8.3f}s {s['p95']:>8.3f}s "
+            f"{s['p99']:>8.3f}s {s['max']:>8.3f}s {s['total']:>9.1f}s"
+        )
+    return stats
+
+
+configure(os.environ.get("AUTOGRAM_TRACE_FILE"))
@@ -0,0 +1,227 @@
+"""Concurrent Veo job manager.
+
+Submits many `generate_videos` operations and polls all of them from one
+loop. Each job backs off on its own schedule (fast at first, slower the
+longer it runs), has an optional deadline, and can be cancelled. Jobs are
+yielded as they finish rather than in submission order.
+"""
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+
+from autogram import cassette, ratelimit
+from autogram.tracing import record, span
+
+
+VEO_MODEL = "veo-3.1-generate-preview"
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+
+@dataclass
+class VeoJob:
+    job_id: str
+    prompt: str
+    operation: Any
+    submitted: float
+    deadline: Optional[float]
+    interval: float
+    next_poll: float
+    status: str = PENDING
+    video: Any = None
+    error: Optional[str] = None
+    finished: Optional[float] = None
+    polls: int = 0
+    meta: dict = field(default_factory=dict)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.submitted
+
+
+class VeoJobManager:
+    """Tracks in-flight Veo operations for one `genai.Client`.
+
+    Polling starts every `initial_interval` seconds and grows by `backoff`
+    per poll up to `max_interval`. Cancelling a job stops tracking it locally;
+    the Gemini API offers no way to abort a running video operation.
+    """
+
+    def __init__(self, client, model: str = VEO_MODEL, initial_interval: float = 2.0,
+                 max_interval: float = 20.0, backoff: float = 1.5):
+        if cassette.replaying():
+            # Recorded status polls come back instantly, so there is nothing to wait for.
+            initial_interval = max_interval = 0.0
+        self.client = client
+        self.model = model
+        self.initial_interval = initial_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._jobs: dict[str, VeoJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # Notified whenever a job is submitted or finishes.
+        self._changed = threading.Condition(self._lock)
+        self._poll_lock = threading.Lock()
+
+    def submit(self, prompt: str, timeout: Optional[float] = None, config: Any = None, **meta) -> str:
+        """Start a generation and return its job id."""
+        kwargs = {"model": self.model, "prompt": prompt}
+        if config is not None:
+            kwargs["config"] = config
+        with span("veo.submit", model=self.model):
+            # A render is not idempotent, so only explicit throttling (429) is retried.
+            operation = ratelimit.call("veo", self.client.models.generate_videos, idempotent=False, **kwargs)
+
+        now = time.monotonic()
+        job = VeoJob(
+            job_id=f"veo-{next(self._ids)}",
+            prompt=prompt,
+            operation=operation,
+            submitted=now,
+            deadline=now + timeout if timeout else None,
+            interval=self.initial_interval,
+            next_poll=now + self.initial_interval,
+            meta=meta,
+        )
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._changed.notify_all()
+        return job.job_id
+
+    def cancel(self, job_id: str) -> None:
+        """Stop tracking `job_id`; a caller still waiting on it gets it back as cancelled."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+            if job is not None and job.status == PENDING:
+                self._finish(job, CANCELLED, error="cancelled")
+
+    def get(self, job_id: str) -> VeoJob:
+        return self._jobs[job_id]
+
+    def pending(self) -> list[VeoJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.status == PENDING]
+
+    def as_completed(self, job_ids: Iterable[str]) -> Iterator[VeoJob]:
+        """Poll until each of `job_ids` finishes and yield it as it does.
+
+        Only the given jobs are yielded, so callers sharing the manager never
+        see each other's jobs. Jobs that were cancelled or timed out are
+        yielded too, with their status set accordingly. A yielded job is no
+        longer tracked; if the caller stops iterating early, the jobs it has
+        not received yet are cancelled.
+        """
+        with self._lock:
+            remaining = [self._jobs[job_id] for job_id in job_ids]
+        try:
+            while remaining:
+                with self._lock:
+                    finished = [job for job in remaining if job.status != PENDING]
+                    for job in finished:
+                        self._jobs.pop(job.job_id, None)
+                remaining = [job for job in remaining if job not in finished]
+                yield from finished
+                if remaining:
+                    self._sleep(self._poll_or_wait())
+        finally:
+            for job in remaining:
+                self.cancel(job.job_id)
+
+    def wait(self, job_id: str) -> VeoJob:
+        """Block until `job_id` finishes, and stop tracking it.
+
+        Safe to call from several threads at once: only one of them polls at a
+        time (covering every due job), the others sleep until something changes.
+        """
+        job = self._jobs[job_id]
+        while job.status == PENDING:
+            self._sleep(self._poll_or_wait())
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        return job
+
+    def _poll_or_wait(self) -> Optional[float]:
+        """Poll due jobs unless another thread is already doing it; return how long to sleep."""
+        if not self._poll_lock.acquire(blocking=False):
+            return self.initial_interval
+        try:
+            return self._poll_due()
+        finally:
+            self._poll_lock.release()
+
+    def _poll_due(self) -> Optional[float]:
+        """Poll jobs whose next poll is due and expire overdue ones.
+
+        Returns the seconds until the next poll or deadline, or None if
+        nothing is pending.
+        """
+        now = time.monotonic()
+        for job in self.pending():
+            if job.deadline is not None and now >= job.deadline:
+                with self._lock:
+                    if job.status == PENDING:
+                        self._finish(job, TIMEOUT, error=f"timed out after {job.elapsed:.0f}s")
+            elif now >= job.next_poll:
+                self._poll(job)
+
+        with self._lock:
+            pending = [j for j in self._jobs.values() if j.status == PENDING]
+            waits = [j.next_poll for j in pending] + [j.deadline for j in pending if j.deadline is not None]
+        if not waits:
+            return None
+        return max(0.0, min(waits) - time.monotonic())
+
+    def _sleep(self, delay: Optional[float]) -> None:
+        if not delay:
+            return
+        with self._changed:
+            self._changed.wait(delay)
+
+    def _poll(self, job: VeoJob) -> None:
+        try:
+            with span("veo.poll", job_id=job.job_id, poll=job.polls + 1):
+                ratelimit.acquire("veo")
+                operation = self.client.operations.get(job.operation)
+        except Exception as e:
+            operation, poll_error = None, e
+        else:
+            poll_error = None
+
+        with self._lock:
+            if job.status != PENDING:
+                return
+            job.polls += 1
+            if operation is None:
+                # Transient poll failures just push the next attempt back.
+                job.error = f"poll failed: {poll_error}"
+            else:
+                job.operation = operation
+                if operation.done:
+                    error = getattr(operation, "error", None)
+                    response = getattr(operation, "response", None)
+                    videos = getattr(response, "generated_videos", None) if response else None
+                    if error or not videos:
+                        self._finish(job, FAILED, error=str(error or "no video returned"))
+                    else:
+                        job.video = videos[0].video
+                        self._finish(job, DONE)
+                    return
+            job.interval = min(job.interval * self.backoff, self.max_interval)
+            job.next_poll = time.monotonic() + job.interval
+
+    def _finish(self, job: VeoJob, status: str, error: Optional[str] = None) -> None:
+        # Caller holds self._lock.
+        job.status = status
+        job.finished = time.monotonic()
+        job.error = error
+        record("veo.render", job.elapsed, ok=status == DONE, job_id=job.job_id, job_status=status, polls=job.polls)
+        self._changed.notify_all()